@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """每个测试在临时目录中运行，日志写入临时文件且不输出到控制台"""
+    from wechat_logger import configure_logging, shutdown_logging
+
+    monkeypatch.chdir(tmp_path)
+    configure_logging(str(tmp_path / 'test.log'), console=False)
+    yield tmp_path
+    shutdown_logging()
+
+
+class FakeClock:
+    """模拟时钟：sleep 只推进时间"""
+
+    def __init__(self, start=1000.0):
+        self.now = start
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
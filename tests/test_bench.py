@@ -0,0 +1,29 @@
+import pytest
+
+from wechat_bench import run_benchmark
+
+
+def outcomes(result, step):
+    return result['metrics']['steps'][step]['outcomes']
+
+
+@pytest.mark.parametrize('policy', ['fixed', 'condition'])
+@pytest.mark.parametrize('file_mode', ['dialog', 'bulk'])
+def test_reported_results_match_deliveries(policy, file_mode):
+    result = run_benchmark(6, messages=1, files=1, policy=policy, file_mode=file_mode)
+    assert result['delivered_messages'] == 6
+    assert result['delivered_files'] == 6
+    step = 'send_file' if file_mode == 'dialog' else 'send_files_bulk'
+    assert outcomes(result, step) == {'ok': 6}
+    assert outcomes(result, 'send_message') == {'ok': 6}
+    assert result['metrics']['gauges']['campaign_fail'] == 0
+    assert result['pacing']['file']['failed'] == 0
+    assert result['pacing']['slowdown'] == 1.0
+
+
+@pytest.mark.parametrize('policy', ['fixed', 'condition'])
+def test_failed_sends_are_reported(policy):
+    result = run_benchmark(20, messages=1, files=1, policy=policy, file_mode='dialog', fail_rate=0.2, seed=3)
+    assert result['failed_sends'] > 0
+    reported_ok = outcomes(result, 'send_message').get('ok', 0) + outcomes(result, 'send_file').get('ok', 0)
+    assert reported_ok == result['delivered_messages'] + result['delivered_files']
@@ -0,0 +1,149 @@
+import ctypes
+import os
+import struct
+
+import pytest
+
+from wechat_clipboard import (CF_HDROP, CF_UNICODETEXT, DROPEFFECT_COPY, DROPFILES_FORMAT, DROPFILES_SIZE,
+                              MemoryClipboard, Win32Clipboard, build_dropfiles, written_sequence)
+
+
+class FakeUser32:
+    """模拟的 user32 剪贴板函数：每次清空和设置数据都让序列号加一（advance=False 时模拟写入未生效）"""
+
+    def __init__(self, sequence=100, advance=True):
+        self.sequence = sequence
+        self.advance = advance
+        self.data = {}
+        self.opened = False
+
+    def _changed(self):
+        if self.advance:
+            self.sequence += 1
+
+    def OpenClipboard(self, hwnd):
+        self.opened = True
+        return True
+
+    def CloseClipboard(self):
+        self.opened = False
+        return True
+
+    def EmptyClipboard(self):
+        assert self.opened
+        self.data.clear()
+        self._changed()
+        return True
+
+    def SetClipboardData(self, fmt, handle):
+        assert self.opened
+        self.data[fmt] = handle
+        self._changed()
+        return handle
+
+    def GetClipboardSequenceNumber(self):
+        return self.sequence
+
+    def RegisterClipboardFormatW(self, name):
+        return 0xC0DE
+
+
+class FakeKernel32:
+    """模拟的全局内存：句柄对应一块真实的 ctypes 缓冲区"""
+
+    def __init__(self):
+        self.memory = {}
+        self.freed = []
+
+    def GlobalAlloc(self, flags, size):
+        handle = len(self.memory) + 1
+        self.memory[handle] = ctypes.create_string_buffer(size)
+        return handle
+
+    def GlobalLock(self, handle):
+        return ctypes.addressof(self.memory[handle])
+
+    def GlobalUnlock(self, handle):
+        return True
+
+    def GlobalFree(self, handle):
+        self.freed.append(handle)
+
+    def read(self, handle):
+        return self.memory[handle].raw
+
+
+def fake_win32(user32):
+    """不加载Win32 DLL，直接注入模拟的API"""
+    clipboard = Win32Clipboard.__new__(Win32Clipboard)
+    clipboard._ctypes = ctypes
+    clipboard._user32 = user32
+    clipboard._kernel32 = FakeKernel32()
+    return clipboard
+
+
+@pytest.mark.parametrize('before, after, expected', [(5, 7, 7), (5, 5, None), (5, 0, None), (2 ** 32 - 1, 1, 1)])
+def test_written_sequence(before, after, expected):
+    assert written_sequence(before, after) == expected
+
+
+def test_copy_returns_new_sequence():
+    user32 = FakeUser32()
+    clipboard = fake_win32(user32)
+    assert clipboard.copy('你好') == 102
+    assert not user32.opened
+    data = clipboard._kernel32.read(user32.data[CF_UNICODETEXT])
+    assert data == '你好'.encode('utf-16-le') + b'\0\0'
+
+
+@pytest.mark.parametrize('sequence', [100, 0])
+def test_copy_without_sequence_change_is_unconfirmed(sequence):
+    # 序列号没有变化或无权读取序列号：返回None，调用方退回轮询读回
+    user32 = FakeUser32(sequence, advance=False)
+    assert fake_win32(user32).copy('你好') is None
+    assert not user32.opened
+
+
+def test_memory_clipboard_sequence_advances_per_write():
+    written = []
+    clipboard = MemoryClipboard(written.append)
+    assert clipboard.copy('a') == 1
+    assert clipboard.copy_files(['a.txt']) == 2
+    assert clipboard.sequence() == 2
+    assert clipboard.paste() is None
+    assert written == ['a', ('a.txt',)]
+
+
+def parse_dropfiles(data):
+    """按Windows读取CF_HDROP的方式解析：从pFiles偏移处读取宽字符路径，直到空路径为止"""
+    offset, x, y, nc, wide = struct.unpack_from(DROPFILES_FORMAT, data)
+    assert wide == 1
+    names = data[offset:].decode('utf-16-le')
+    assert names.endswith('\0\0')
+    return names[:-2].split('\0')
+
+
+def test_dropfiles_header_and_terminator(workdir):
+    paths = ['报表.xlsx', os.path.join('子目录', 'photo 1.jpg')]
+    data = build_dropfiles(paths)
+    assert DROPFILES_SIZE == 20
+    assert struct.unpack_from(DROPFILES_FORMAT, data) == (20, 0, 0, 0, 1)
+    # 路径为宽字符，列表以两个宽空字符（4个字节的0）结尾，且之前没有提前结束
+    assert (len(data) - DROPFILES_SIZE) % 2 == 0
+    assert data.endswith(b'\0\0\0\0')
+    assert b'\0\0\0\0' not in data[DROPFILES_SIZE:-4]
+    assert parse_dropfiles(data) == [os.path.abspath(path) for path in paths]
+
+
+def test_empty_dropfiles_is_only_header_and_terminator():
+    assert build_dropfiles([]) == struct.pack(DROPFILES_FORMAT, 20, 0, 0, 0, 1) + b'\0\0'
+
+
+def test_copy_files_writes_dropfiles_and_copy_effect(workdir):
+    user32 = FakeUser32()
+    clipboard = fake_win32(user32)
+    assert clipboard.copy_files(['a.txt', 'b.pdf']) == 103
+    kernel32 = clipboard._kernel32
+    assert parse_dropfiles(kernel32.read(user32.data[CF_HDROP])) == [os.path.abspath('a.txt'), os.path.abspath('b.pdf')]
+    assert kernel32.read(user32.data[0xC0DE]) == struct.pack('<I', DROPEFFECT_COPY)
+    assert kernel32.freed == []
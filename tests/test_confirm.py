@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from wechat_capture import set_capture_source
+from wechat_confirm import CONFIRM_SETTLE, ERROR_BANNERS, SendConfirmation
+from wechat_locator import ELEMENTS, TemplateLocator, to_gray
+
+# 聊天记录区域的屏幕坐标 (left, top, width, height)
+REGION = (100, 50, 600, 400)
+BACKGROUND = (245, 245, 245)
+
+
+class FrameSource:
+    """合成截图源：grab 返回当前画面，测试中直接修改 frame 模拟界面变化"""
+
+    def __init__(self):
+        self.frame = np.full((REGION[3], REGION[2], 3), BACKGROUND, dtype=np.uint8)
+
+    def grab(self, region):
+        assert region == REGION
+        return self.frame
+
+    def bubble(self, width=200, color=(149, 236, 105)):
+        """底部偏右出现一条发出的消息"""
+        cv2.rectangle(self.frame, (580 - width, 300), (580, 360), color, -1)
+
+    def error_icon(self):
+        """消息左侧出现红色感叹号（发送失败）"""
+        cv2.circle(self.frame, (340, 330), 20, (230, 60, 60), -1)
+        cv2.rectangle(self.frame, (337, 315), (343, 335), (255, 255, 255), -1)
+        cv2.rectangle(self.frame, (337, 339), (343, 345), (255, 255, 255), -1)
+
+
+@pytest.fixture
+def source():
+    source = FrameSource()
+    set_capture_source(source)
+    yield source
+    set_capture_source(None)
+
+
+@pytest.fixture
+def locator(workdir):
+    """templates/ 中只有“发送失败”图标的定位器，模板从合成画面中截取"""
+    icon = FrameSource()
+    icon.error_icon()
+    template_dir = workdir / 'templates'
+    template_dir.mkdir()
+    cv2.imwrite(str(template_dir / ELEMENTS['send_failed']['file']), to_gray(icon.frame[306:354, 316:364]))
+    return TemplateLocator(str(template_dir))
+
+
+def succeeded(confirm):
+    """按 check_send_success 的规则把结论映射为发送成功/失败"""
+    return confirm.finish() == 'sent'
+
+
+def test_only_banners_with_templates_are_checked(source, locator, clock):
+    confirm = SendConfirmation(REGION, locator, clock=clock)
+    assert confirm.banners == ['send_failed']
+
+
+def test_unchanged_frame_is_failure(source, locator, clock):
+    confirm = SendConfirmation(REGION, locator, clock=clock)
+    for _ in range(3):
+        assert not confirm()
+        clock.now += CONFIRM_SETTLE
+    assert confirm.changed == 0.0
+    assert confirm.finish() is None
+    assert not succeeded(confirm)
+
+
+def test_new_bubble_is_confirmed_after_settle(source, locator, clock):
+    confirm = SendConfirmation(REGION, locator, clock=clock)
+    source.bubble()
+    assert not confirm()
+    clock.now += CONFIRM_SETTLE / 2
+    assert not confirm()
+    clock.now += CONFIRM_SETTLE / 2 + 0.01
+    assert confirm()
+    assert confirm.result == 'sent' and confirm.error is None
+    assert succeeded(confirm)
+
+
+def test_moving_frame_delays_confirmation(source, locator, clock):
+    confirm = SendConfirmation(REGION, locator, clock=clock)
+    # 上传进度条一直在变化：画面稳定之前不能确认成功
+    for width in range(60, 200, 20):
+        source.bubble(width)
+        assert not confirm()
+        clock.now += CONFIRM_SETTLE
+    clock.now += CONFIRM_SETTLE
+    assert confirm()
+    assert succeeded(confirm)
+
+
+def test_error_icon_is_failure(source, locator, clock):
+    confirm = SendConfirmation(REGION, locator, clock=clock)
+    source.bubble()
+    assert not confirm()
+    # 转圈结束后消息旁出现红色感叹号，发生在确认成功之前
+    source.error_icon()
+    assert confirm()
+    assert confirm.result == 'failed'
+    assert confirm.error == ERROR_BANNERS['send_failed']
+    assert not succeeded(confirm)
+
+
+def test_change_without_settle_counts_as_sent_at_finish(source, locator, clock):
+    confirm = SendConfirmation(REGION, locator, clock=clock)
+    source.bubble()
+    assert succeeded(confirm)
+
+
+def test_change_outside_bubble_zone_is_ignored(source, locator, clock):
+    confirm = SendConfirmation(REGION, locator, clock=clock)
+    # 对方发来的消息在左侧，不算本次发出
+    cv2.rectangle(source.frame, (20, 300), (200, 360), (255, 255, 255), -1)
+    cv2.rectangle(source.frame, (20, 300), (200, 360), (30, 30, 30), 2)
+    clock.now += CONFIRM_SETTLE
+    assert confirm.finish() is None
+    assert not succeeded(confirm)
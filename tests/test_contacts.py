@@ -0,0 +1,54 @@
+import codecs
+
+from wechat_contacts import count_contacts, detect_encoding, iter_contacts, load_contacts, normalize_name
+
+
+def write(path, text, encoding='utf-8'):
+    with open(path, 'wb') as f:
+        f.write(text.encode(encoding))
+    return str(path)
+
+
+def test_normalize_name():
+    assert normalize_name(' 张​三  \t先生\x07 ') == '张三 先生'
+
+
+def test_detect_encoding(workdir):
+    assert detect_encoding(write(workdir / 'a.txt', '张三\n')) == 'utf-8'
+    assert detect_encoding(write(workdir / 'b.txt', '张三\n', 'gb18030')) == 'gb18030'
+    with open(workdir / 'c.txt', 'wb') as f:
+        f.write(codecs.BOM_UTF16_LE + '张三\n'.encode('utf-16-le'))
+    assert detect_encoding(str(workdir / 'c.txt')) == 'utf-16'
+
+
+def test_txt_dedupes_and_reports_issues(workdir):
+    path = write(workdir / 'list.txt', '张三\n\n李四\n张​三\n​\n王五\n', 'gb18030')
+    names, fields, issues, encoding, issue_count = load_contacts(path)
+    # 空行不算问题，只含不可见字符的行报告为空名称
+    assert names == ['张三', '李四', '王五']
+    assert fields == {}
+    assert encoding == 'gb18030'
+    assert [(issue.line, issue.reason) for issue in issues] == [(4, '重复的联系人: 张三'), (5, '联系人名称为空')]
+    assert issue_count == 2
+
+
+def test_csv_picks_name_column_and_keeps_fields(workdir):
+    path = write(workdir / 'list.csv', '城市,联系人\n上海,张三\n北京\n广州,李四\n', 'utf-8-sig')
+    names, fields, issues, _, _ = load_contacts(path)
+    assert names == ['张三', '李四']
+    assert fields['李四'] == {'城市': '广州', '联系人': '李四'}
+    assert issues[0].line == 3
+
+
+def test_jsonl_rows(workdir):
+    path = write(workdir / 'list.jsonl', '{"name": "张三", "积分": 10}\n[1]\n{"积分": 3}\nnot json\n')
+    rows = list(iter_contacts(path))
+    assert [(row.line, row.name, row.fields) for row in rows] == [(1, '张三', {'name': '张三', '积分': '10'})]
+    reported = []
+    list(iter_contacts(path, on_issue=reported.append))
+    assert [issue.line for issue in reported] == [2, 3, 4]
+
+
+def test_count_contacts_matches_load(workdir):
+    path = write(workdir / 'list.txt', '\n'.join(f'联系人{i % 50}' for i in range(120)))
+    assert count_contacts(path) == len(load_contacts(path)[0]) == 50
@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from wechat_fingerprint import (FINGERPRINT_VERSION, MATCH, MISMATCH, UNKNOWN, ContactVerifier, FingerprintCache,
+                                name_hash)
+
+
+def title_bar(name, shift=0, brightness=245):
+    """合成的聊天标题栏：浅色背景、左侧深色名称文字、右侧图标"""
+    frame = np.full((40, 600, 3), brightness, dtype=np.uint8)
+    cv2.putText(frame, name, (20 + shift, 27), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (30, 30, 30), 2)
+    cv2.rectangle(frame, (560, 10), (580, 30), (60, 60, 60), -1)
+    return frame
+
+
+@pytest.fixture
+def verifier(workdir):
+    return ContactVerifier(FingerprintCache(str(workdir / 'fingerprints.json')))
+
+
+def test_name_hash_is_stable_and_distinguishes_names():
+    assert name_hash(np.full((40, 600, 3), 245, dtype=np.uint8)) == 0
+    same = name_hash(title_bar('Zhang San')), name_hash(title_bar('Zhang San', shift=1, brightness=240))
+    other = name_hash(title_bar('Li Si'))
+    assert bin(same[0] ^ same[1]).count('1') < bin(same[0] ^ other).count('1')
+
+
+def test_unconfirmed_fingerprint_is_learned_after_send(verifier):
+    assert verifier.verify('Zhang San', title_bar('Zhang San'))[:2] == (True, UNKNOWN)
+    assert 'Zhang San' not in verifier.cache
+    assert verifier.learn('Zhang San')
+    assert verifier.verify('Zhang San', title_bar('Zhang San', shift=1))[:2] == (True, MATCH)
+    assert verifier.verify('Zhang San', title_bar('Li Si'))[:2] == (False, MISMATCH)
+
+
+def test_failed_send_does_not_learn(verifier):
+    verifier.verify('Zhang San', title_bar('Zhang San'))
+    # 发送失败时调用方不调用learn；下一次校验丢弃旧的候选
+    verifier.verify('Zhang San', title_bar('Zhang San'))
+    assert verifier.learn('Zhang San')
+    assert not verifier.learn('Zhang San')
+
+
+def test_fingerprint_of_another_contact_is_not_learned(verifier):
+    verifier.verify('Li Si', title_bar('Li Si'))
+    verifier.learn('Li Si')
+    # 搜索打开了Li Si的聊天，而目标是Zhang San：不能把Li Si的标题栏学成Zhang San
+    verifier.verify('Zhang San', title_bar('Li Si'))
+    assert not verifier.learn('Zhang San')
+    assert 'Zhang San' not in verifier.cache
+
+
+def test_slow_check_result_is_respected(workdir):
+    results = {'Zhang San': True, 'Li Si': False}
+    verifier = ContactVerifier(FingerprintCache(str(workdir / 'fingerprints.json')),
+                               lambda contact, frame: results[contact])
+    assert verifier.verify('Zhang San', title_bar('Zhang San'))[0]
+    assert 'Zhang San' in verifier.cache
+    assert not verifier.verify('Li Si', title_bar('Li Si'))[0]
+    assert not verifier.learn('Li Si')
+
+
+def test_cache_round_trips_and_drops_old_versions(workdir):
+    path = str(workdir / 'fingerprints.json')
+    verifier = ContactVerifier(FingerprintCache(path))
+    verifier.verify('Zhang San', title_bar('Zhang San'))
+    verifier.learn('Zhang San')
+    verifier.save()
+    assert 'Zhang San' in FingerprintCache(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': FINGERPRINT_VERSION - 1, 'contacts': {'Zhang San': ['ff']}}, f)
+    assert 'Zhang San' not in FingerprintCache(path)
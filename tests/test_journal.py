@@ -0,0 +1,158 @@
+import json
+import os
+
+import pytest
+
+import wechat_journal
+from wechat_journal import SendJournal, replay
+from wechat_records import SentRecordStore
+
+CAMPAIGN = '任务A'
+PAYLOAD = 'h1'
+CONTACTS = ['张三', '李四', '王五']
+MESSAGES = 2
+FILES = 1
+STEPS = [('message', i) for i in range(1, MESSAGES + 1)] + [('file', i) for i in range(1, FILES + 1)]
+
+
+class Crash(Exception):
+    """模拟进程在发送中途崩溃"""
+
+
+def run(journal, records, delivered, crash=None):
+    """按 run_campaign 的顺序写预写日志并“发送”；crash=(第几次发送, 崩溃位置) 时在该处崩溃"""
+    for contact in CONTACTS:
+        key = (CAMPAIGN, contact, PAYLOAD)
+        if records.is_sent(*key):
+            continue
+        progress = journal.progress(*key)
+        journal.begin(*key)
+        journal.searched(*key)
+        for kind, index in STEPS:
+            if progress and progress.completed(kind, index):
+                continue
+            journal.start(*key, kind, index)
+            if crash and crash == (len(delivered), 'before_send'):
+                raise Crash()
+            delivered.append((contact, kind, index))
+            if crash and crash == (len(delivered), 'after_send'):
+                raise Crash()
+            journal.sent(*key, kind, index)
+            if crash and crash == (len(delivered), 'torn_record'):
+                # 完成记录写到一半时崩溃
+                journal.sync()
+                raise Crash()
+        records.mark_sent(*key)
+        journal.done(*key)
+    records.commit()
+    journal.checkpoint()
+
+
+def crash_processes(journal, records, tear):
+    """进程崩溃：记录库未提交的记录丢失；tear 为True时日志最后一条记录只写了一半"""
+    journal.close()
+    records._conn.close()
+    if tear:
+        with open(journal.path, 'rb') as f:
+            data = f.read()
+        last = data.rstrip(b'\n').rfind(b'\n') + 1
+        with open(journal.path, 'wb') as f:
+            f.write(data[:last + (len(data) - last) // 2])
+
+
+def open_journal(workdir):
+    return SendJournal(str(workdir / 'journal.jsonl'), interval=0.001)
+
+
+def restart(workdir, delivered):
+    records = SentRecordStore(str(workdir / 'records.db'), commit_every=1000)
+    journal = open_journal(workdir)
+    journal.recover(records)
+    run(journal, records, delivered)
+    journal.close()
+    records.close()
+
+
+EVERYTHING = [(contact, kind, index) for contact in CONTACTS for kind, index in STEPS]
+
+
+@pytest.mark.parametrize('sends', range(1, len(EVERYTHING) + 1))
+@pytest.mark.parametrize('position', ['after_send', 'torn_record'])
+def test_crash_after_send_is_neither_repeated_nor_lost(workdir, sends, position):
+    delivered = []
+    records = SentRecordStore(str(workdir / 'records.db'), commit_every=1000)
+    journal = open_journal(workdir)
+    with pytest.raises(Crash):
+        run(journal, records, delivered, crash=(sends, position))
+    crash_processes(journal, records, tear=position == 'torn_record')
+    restart(workdir, delivered)
+    assert sorted(delivered) == sorted(EVERYTHING)
+
+
+def test_crash_between_contacts_resumes_from_records(workdir):
+    delivered = []
+    records = SentRecordStore(str(workdir / 'records.db'), commit_every=1000)
+    journal = open_journal(workdir)
+    with pytest.raises(Crash):
+        run(journal, records, delivered, crash=(len(STEPS), 'before_send'))
+    crash_processes(journal, records, tear=False)
+    # 记录库中的第一个联系人没有提交，由预写日志的 done 记录补写
+    records = SentRecordStore(str(workdir / 'records.db'))
+    journal = open_journal(workdir)
+    assert journal.recover(records) == (1, 1)
+    assert records.is_sent(CAMPAIGN, '张三', PAYLOAD)
+    journal.close()
+    records.close()
+
+
+def test_uncertain_step_follows_retry_setting(workdir, monkeypatch):
+    delivered = []
+    records = SentRecordStore(str(workdir / 'records.db'), commit_every=1000)
+    journal = open_journal(workdir)
+    with pytest.raises(Crash):
+        run(journal, records, delivered, crash=(0, 'before_send'))
+    crash_processes(journal, records, tear=False)
+    progress = replay(str(workdir / 'journal.jsonl'))[(CAMPAIGN, '张三', PAYLOAD)]
+    assert progress.uncertain == {('message', 1)}
+    # 默认按已发送处理，宁可漏发也不重复发送
+    assert progress.completed('message', 1)
+    monkeypatch.setattr(wechat_journal, 'RETRY_UNCERTAIN', True)
+    assert not progress.completed('message', 1)
+
+
+def test_replay_skips_torn_and_corrupt_lines(workdir):
+    path = workdir / 'journal.jsonl'
+    base = {'c': CAMPAIGN, 'n': '张三', 'p': PAYLOAD}
+    lines = [json.dumps(dict(base, op='begin')), json.dumps(dict(base, op='message_start', i=1)),
+             json.dumps(dict(base, op='message', i=1)), 'garbage', json.dumps(dict(base, op='message_start', i=2)),
+             json.dumps(dict(base, op='message', i=2))[:20]]
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    progress = replay(str(path))[(CAMPAIGN, '张三', PAYLOAD)]
+    assert progress.messages == {1}
+    assert progress.uncertain == {('message', 2)}
+    assert not progress.done
+
+
+def test_start_is_durable_before_sending(workdir):
+    journal = SendJournal(str(workdir / 'journal.jsonl'), interval=0.2)
+    journal.begin(CAMPAIGN, '张三', PAYLOAD)
+    journal.sync()
+    # 刚提交过一次，后台线程会等满合并间隔再写；开始记录仍然在返回前落盘
+    journal.start(CAMPAIGN, '张三', PAYLOAD, 'message', 1)
+    assert ('message', 1) in replay(journal.path)[(CAMPAIGN, '张三', PAYLOAD)].uncertain
+    journal.close()
+
+
+def test_checkpoint_keeps_only_unfinished_contacts(workdir):
+    journal = open_journal(workdir)
+    for contact in CONTACTS[:2]:
+        journal.begin(CAMPAIGN, contact, PAYLOAD)
+        journal.searched(CAMPAIGN, contact, PAYLOAD)
+    journal.sent(CAMPAIGN, '张三', PAYLOAD, 'message', 1)
+    journal.done(CAMPAIGN, '李四', PAYLOAD)
+    journal.checkpoint()
+    journal.close()
+    state = replay(journal.path)
+    assert list(state) == [(CAMPAIGN, '张三', PAYLOAD)]
+    assert state[(CAMPAIGN, '张三', PAYLOAD)].messages == {1}
+    assert os.path.getsize(journal.path) > 0
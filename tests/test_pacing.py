@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from wechat_pacing import MAX_SLOWDOWN, PACING_FILE, PACING_LIMITS, Pacer, TokenBucket, load_limits
+
+LIMITS = {
+    'message': {'rate': 60, 'period': 60, 'burst': 2},
+    'file': {'rate': 10, 'period': 60, 'burst': 1},
+    'contact': {'rate': 3, 'period': 86400, 'burst': 3},
+}
+
+
+def make_pacer(clock, limits=LIMITS):
+    return Pacer(limits, clock=clock, sleep=clock.sleep)
+
+
+def test_bucket_allows_burst_then_refills(clock):
+    bucket = TokenBucket(60, 60, burst=2, clock=clock)
+    for _ in range(2):
+        assert bucket.delay() == 0
+        bucket.take()
+    assert bucket.delay() == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.delay() == pytest.approx(0.5)
+    clock.now += 10
+    # 补充的令牌不超过容量
+    bucket.delay()
+    assert bucket.tokens == pytest.approx(2.0)
+
+
+def test_bucket_rejects_non_positive_rate(clock):
+    with pytest.raises(ValueError):
+        TokenBucket(0, 60, clock=clock)
+
+
+def test_acquire_waits_only_after_burst(clock):
+    pacer = make_pacer(clock)
+    assert pacer.acquire('message') == 0
+    assert pacer.acquire('message') == 0
+    assert pacer.acquire('message') == pytest.approx(1.0)
+    assert clock.slept == [pytest.approx(1.0)]
+    stats = pacer.stats()['message']
+    assert stats['waits'] == 1
+    assert stats['waited'] == pytest.approx(1.0)
+
+
+def test_unlimited_kind_never_waits(clock):
+    pacer = make_pacer(clock, {})
+    for _ in range(100):
+        assert pacer.acquire('message') == 0
+    assert clock.slept == []
+
+
+def test_failure_backs_off_only_its_own_kind(clock):
+    pacer = make_pacer(clock)
+    assert pacer.record('file', False) == 2.0
+    assert pacer.slowdowns['file'] == 2.0
+    assert 'message' not in pacer.slowdowns
+    # 失败清空了文件的突发额度，下一次按降低后的速率等待
+    assert pacer.wait_time('file') == pytest.approx(12.0)
+    assert pacer.wait_time('message') == 0
+    assert pacer.stats()['file']['slowdown'] == 2.0
+    assert pacer.slowdown == 2.0
+
+
+def test_success_recovers_and_slowdown_is_capped(clock):
+    pacer = make_pacer(clock)
+    for _ in range(10):
+        pacer.record('message', False)
+    assert pacer.slowdowns['message'] == MAX_SLOWDOWN
+    for _ in range(50):
+        pacer.record('message', True)
+    assert pacer.slowdowns['message'] == 1.0
+    assert pacer.buckets['message'].scale == 1.0
+
+
+def test_quota_kind_is_not_backed_off(clock):
+    pacer = make_pacer(clock)
+    assert pacer.record('contact', False) == 1.0
+    assert pacer.wait_time('contact') == 0
+    assert pacer.stats()['contact']['failed'] == 1
+
+
+def test_seed_uses_up_quota(clock):
+    pacer = make_pacer(clock)
+    pacer.seed('contact', 3)
+    assert pacer.wait_time('contact') == pytest.approx(86400 / 3)
+
+
+def test_configure_keeps_slowdown(clock):
+    pacer = make_pacer(clock)
+    pacer.record('message', False)
+    pacer.configure({'message': {'rate': 120, 'period': 60}})
+    assert pacer.buckets['message'].fill_rate == pytest.approx(1.0)
+    assert 'file' not in pacer.buckets
+
+
+def test_default_limits_are_conservative():
+    contact = PACING_LIMITS['contact']
+    assert contact['period'] == 86400 and contact['rate'] <= 1000
+    message = PACING_LIMITS['message']
+    assert message['rate'] * 60 / message['period'] <= 60
+
+
+def test_load_limits_overrides_only_listed_kinds(workdir):
+    assert load_limits() == PACING_LIMITS
+    with open(PACING_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'message': {'rate': 40, 'period': 60, 'burst': 10}, 'file': None,
+                   'contact': {'rate': 0, 'period': 86400}}, f)
+    limits = load_limits()
+    assert limits['message'] == {'rate': 40, 'period': 60, 'burst': 10}
+    assert limits['file'] is None
+    # 格式错误的类别保留默认值
+    assert limits['contact'] == PACING_LIMITS['contact']
+    assert 'file' not in Pacer(limits).buckets
+
+
+def test_load_limits_ignores_broken_file(workdir):
+    with open(PACING_FILE, 'w', encoding='utf-8') as f:
+        f.write('{not json')
+    assert load_limits() == PACING_LIMITS
@@ -0,0 +1,100 @@
+import pytest
+
+from wechat_planner import Planner, StepModel, StepSample, StepTimer, pacing_bounds, part_sizes
+
+# 一个联系人的日志：(相对秒数, 消息)
+CONTACT_LOG = [
+    (0, '=== 开始执行发送任务: 默认任务 ==='),
+    (1, '=== 开始向联系人 1/1: 张三 发送 ==='),
+    (2, '开始搜索联系人: 张三'),
+    (4, '确认当前聊天窗口的联系人是否是 张三'),
+    (5, '开始发送消息: 你好'),
+    (7, '节奏控制：message 等待1.0秒'),
+    (9, '=== 联系人 张三 发送完成 ==='),
+]
+
+
+def feed_all(timer, lines):
+    done = []
+    for ts, message in lines:
+        done += timer.feed(ts, message)
+    return done
+
+
+def test_step_timer_measures_steps_and_overhead():
+    timer = StepTimer()
+    done = feed_all(timer, CONTACT_LOG)
+    assert done == [
+        ('search', 2, None),
+        ('confirm', 1, None),
+        ('message', 2, None),
+        ('overhead', 2.0, None),
+    ]
+    assert timer.run == 1
+    assert timer.contact is None
+
+
+def test_step_timer_resumes_from_saved_state():
+    first = StepTimer()
+    done = feed_all(first, CONTACT_LOG[:4])
+    # 模拟只读取日志新增的部分：状态经过JSON保存后继续喂入
+    second = StepTimer(first.state())
+    done += feed_all(second, CONTACT_LOG[4:])
+    assert done == feed_all(StepTimer(), CONTACT_LOG)
+
+
+def test_step_timer_reset_drops_open_step():
+    timer = StepTimer()
+    feed_all(timer, CONTACT_LOG[:3])
+    timer.reset()
+    assert timer.feed(100, '=== 联系人 张三 发送完成 ===') == []
+
+
+def test_step_timer_ignores_interrupted_steps():
+    timer = StepTimer()
+    timer.feed(0, '开始搜索联系人: 张三')
+    assert timer.feed(10000, '=== 开始向联系人 1/1: 张三 发送 ===') == []
+
+
+def test_sized_step_is_fitted_per_mb():
+    samples = [StepSample(1.0 + 0.5 * mb, mb, 1) for mb in (1, 2, 4, 8)]
+    model = StepModel('file', samples)
+    assert model.per_mb == pytest.approx(0.5)
+    assert model.base == pytest.approx(1.0)
+    assert model.expect(10) == pytest.approx(6.0)
+
+
+def test_step_model_without_samples_uses_defaults():
+    model = StepModel('search', [])
+    assert model.default
+    assert model.mean == model.base > 0
+
+
+def test_pacing_bounds_counts_beyond_burst():
+    limits = {'message': {'rate': 10, 'period': 60, 'burst': 5}, 'file': None}
+    assert pacing_bounds({'message': 25, 'file': 3}, limits) == {'message': 120.0}
+
+
+def test_prediction_is_limited_by_pacing():
+    planner = Planner()
+    free = planner.predict(100, messages=1, limits={})
+    assert free['limited_by'] is None
+    assert free['low'] <= free['mean'] <= free['high']
+    assert free['mean'] == pytest.approx(free['per_contact'] * 100)
+    limited = planner.predict(100, messages=1, limits={'contact': {'rate': 10, 'period': 3600}})
+    assert limited['limited_by'] == 'contact'
+    assert limited['mean'] == pytest.approx(90 * 360)
+
+
+def test_plan_sessions_splits_until_deadline_fits():
+    planner = Planner()
+    one = planner.predict(1000, limits={})
+    sessions, prediction = planner.plan_sessions(1000, one['high'] / 3, limits={})
+    assert sessions is not None and 3 <= sessions <= 4
+    assert prediction['high'] <= one['high'] / 3
+    assert planner.plan_sessions(1000, 1, limits={}, max_sessions=5)[0] is None
+
+
+def test_part_sizes_are_balanced():
+    assert part_sizes(10, 3) == [4, 3, 3]
+    assert sum(part_sizes(12345, 7)) == 12345
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from wechat_records import DEFAULT_CAMPAIGN, SentRecordStore
+
+
+@pytest.fixture
+def store(workdir):
+    store = SentRecordStore(str(workdir / 'records.db'))
+    yield store
+    store.close()
+
+
+def test_records_are_scoped_by_campaign_and_payload(store):
+    store.mark_many([('任务A', '张三', 'h1')])
+    assert store.is_sent('任务A', '张三', 'h1')
+    assert not store.is_sent('任务A', '张三', 'h2')
+    assert not store.is_sent('任务B', '张三', 'h1')
+
+
+def test_legacy_records_bind_to_first_payload(store, workdir):
+    legacy = workdir / 'legacy.txt'
+    legacy.write_text('张三\n李四\n\n', encoding='utf-8')
+    assert store.import_legacy(str(legacy)) == 2
+    assert not legacy.exists() and os.path.exists(f'{legacy}.imported')
+    # 旧版没有发完的那次发送：已发过的联系人跳过
+    assert store.is_sent(DEFAULT_CAMPAIGN, '张三', 'old')
+    assert store.is_sent(DEFAULT_CAMPAIGN, '张三', 'old')
+    # 之后换了内容可以再次发送
+    assert not store.is_sent(DEFAULT_CAMPAIGN, '张三', 'new')
+    assert not store.is_sent(DEFAULT_CAMPAIGN, '王五', 'old')
+    # 导入的记录不计入限额周期内的发送数
+    assert store.count_since(1) == 0
@@ -0,0 +1,125 @@
+import gzip
+import json
+import os
+import shutil
+
+import pytest
+
+from wechat_logger import format_text
+from wechat_metrics import Histogram
+from wechat_report import DeliveryIndex, update_index
+
+START = 1700000000
+
+
+def contact_lines(index, name, ok=True, total=3):
+    lines = [f'=== 开始向联系人 {index}/{total}: {name} 发送 ===', f'开始发送消息: 你好{name}']
+    if ok:
+        lines += ['消息发送成功', f'=== 联系人 {name} 发送完成 ===']
+    else:
+        lines += [f'搜索联系人 {name} 失败，跳过']
+    return lines
+
+
+def append_log(path, messages, start):
+    with open(path, 'a', encoding='utf-8') as f:
+        for offset, message in enumerate(messages):
+            f.write(format_text(start + offset, 'INFO', message))
+    return start + len(messages)
+
+
+def rotate(path):
+    """与 AsyncLogWriter._rotate 相同：当前日志压缩为 .1.gz，旧备份后移"""
+    if os.path.exists(f'{path}.1.gz'):
+        os.replace(f'{path}.1.gz', f'{path}.2.gz')
+    with open(path, 'rb') as src, gzip.open(f'{path}.1.gz', 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+
+
+def statuses(index):
+    return [(row['contact'], row['status']) for row in index.contact_rows()]
+
+
+def test_histogram_quantile():
+    histogram = Histogram()
+    assert histogram.quantile(0.5) == 0.0
+    for value in (0.3, 0.3, 0.4, 0.4):
+        histogram.observe(value)
+    # 全部落在 (0.25, 0.5] 桶内，上界取实际最大值
+    assert histogram.quantile(0.5) == pytest.approx(0.325)
+    assert histogram.quantile(1.0) == pytest.approx(0.4)
+    histogram.observe(1000)
+    assert histogram.quantile(1.0) == 1000
+
+
+def test_delivery_index_classifies_contacts():
+    index = DeliveryIndex()
+    messages = ['=== 开始执行发送任务: 任务A ==='] + contact_lines(1, '张三') + contact_lines(2, '李四', ok=False)
+    messages += contact_lines(3, '王五')[:2]
+    for ts, message in enumerate(messages, START):
+        index.feed(ts, 'INFO', message)
+    assert statuses(index) == [('张三', 'sent'), ('李四', 'failed'), ('王五', 'in_progress')]
+    assert index.contacts[1]['reason'] == 'search'
+    assert index.runs[0]['sent'] == 1
+    assert [row['step'] for row in index.step_rows()] == ['message', 'overhead']
+
+
+def test_index_state_round_trips_through_json():
+    index = DeliveryIndex()
+    for ts, message in enumerate(['=== 开始执行发送任务: 任务A ==='] + contact_lines(1, '张三'), START):
+        index.feed(ts, 'INFO', message)
+    restored = DeliveryIndex(json.loads(json.dumps(index.state())))
+    assert restored.contact_rows() == index.contact_rows()
+    assert restored.step_rows() == index.step_rows()
+
+
+def test_update_index_reads_only_new_complete_lines(workdir):
+    path = str(workdir / 'send.log')
+    index, log_state = DeliveryIndex(), {}
+    ts = append_log(path, ['=== 开始执行发送任务: 任务A ==='] + contact_lines(1, '张三'), START)
+    assert update_index(index, log_state, path) == (5, [])
+    assert update_index(index, log_state, path) == (0, [])
+
+    ts = append_log(path, contact_lines(2, '李四'), ts)
+    # 写了一半的行留到下一次读取
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(format_text(ts, 'INFO', '=== 开始向联系人 3/3: 王五 发送 ===').rstrip('\n'))
+    assert update_index(index, log_state, path) == (4, [])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('\n')
+    assert update_index(index, log_state, path) == (1, [])
+    assert statuses(index) == [('张三', 'sent'), ('李四', 'sent'), ('王五', 'in_progress')]
+
+
+def test_update_index_follows_log_rotation(workdir):
+    path = str(workdir / 'send.log')
+    index, log_state = DeliveryIndex(), {}
+    ts = append_log(path, ['=== 开始执行发送任务: 任务A ==='] + contact_lines(1, '张三'), START)
+    update_index(index, log_state, path)
+
+    # 上次读取之后写入的内容在轮转时进入了备份，之后又轮转了一次
+    ts = append_log(path, contact_lines(2, '李四')[:2], ts)
+    rotate(path)
+    ts = append_log(path, contact_lines(2, '李四')[2:], ts)
+    rotate(path)
+    append_log(path, contact_lines(3, '王五'), ts)
+
+    lines, notes = update_index(index, log_state, path)
+    assert (lines, notes) == (8, [])
+    assert statuses(index) == [('张三', 'sent'), ('李四', 'sent'), ('王五', 'sent')]
+    # 跨文件未结束的步骤照常计时
+    assert index.steps['message'].count == 3
+
+
+def test_update_index_reports_lost_rotation(workdir):
+    path = str(workdir / 'send.log')
+    index, log_state = DeliveryIndex(), {}
+    ts = append_log(path, ['=== 开始执行发送任务: 任务A ==='] + contact_lines(1, '张三'), START)
+    update_index(index, log_state, path)
+    rotate(path)
+    os.remove(f'{path}.1.gz')
+    append_log(path, contact_lines(2, '李四'), ts)
+    lines, notes = update_index(index, log_state, path)
+    assert lines == 4
+    assert len(notes) == 1
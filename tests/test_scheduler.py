@@ -0,0 +1,186 @@
+from datetime import datetime
+
+import pytest
+
+from wechat_scheduler import (CronTrigger, JobStore, OnceTrigger, Scheduler, ScheduleError, parse_duration,
+                              parse_trigger, sleep_until, split_part)
+
+
+def ts(text):
+    return datetime.strptime(text, '%Y-%m-%d %H:%M').timestamp()
+
+
+def at(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+
+
+@pytest.mark.parametrize('expression, start, expected', [
+    ('0 9 * * 1-5', '2026-10-16 10:00', '2026-10-19 09:00'),      # 周五之后是下周一
+    ('0 9 * * 1-5', '2026-10-19 08:59', '2026-10-19 09:00'),
+    ('*/15 * * * *', '2026-10-19 08:59', '2026-10-19 09:00'),
+    ('0 0 31 * *', '2026-01-31 00:00', '2026-03-31 00:00'),       # 跳过没有31日的二月
+    ('0 12 29 2 *', '2026-01-01 00:00', '2028-02-29 12:00'),      # 闰年
+    ('30 8 * * 7', '2026-10-16 10:00', '2026-10-18 08:30'),       # 周日写作7
+    ('0 0 13 * 5', '2026-10-14 00:00', '2026-10-16 00:00'),       # 日和周都有限制时满足任意一个
+    ('0 0 13 * 5', '2026-11-06 00:00', '2026-11-13 00:00'),
+    ('@yearly', '2026-12-31 23:59', '2027-01-01 00:00'),
+    ('0 0 * 12 *', '2026-12-31 23:59', '2027-12-01 00:00'),
+])
+def test_cron_next_after(expression, start, expected):
+    assert at(CronTrigger(expression).next_after(ts(start))) == expected
+
+
+@pytest.mark.parametrize('expression', ['61 * * * *', '* * *', '0 0 30 2 *', '*/0 * * * *', 'a * * * *'])
+def test_invalid_cron(expression):
+    with pytest.raises(ScheduleError):
+        CronTrigger(expression).next_after(ts('2026-01-01 00:00'))
+
+
+def test_parse_trigger_and_duration():
+    now = ts('2026-10-19 10:00')
+    assert at(parse_trigger('09:30', now).at) == '2026-10-20 09:30'
+    assert at(parse_trigger('2026-11-11 08:00', now).at) == '2026-11-11 08:00'
+    assert isinstance(parse_trigger('0 9 * * *', now), CronTrigger)
+    assert parse_duration('2h') == 7200 and parse_duration('90') == 90
+    with pytest.raises(ScheduleError):
+        parse_duration('soon')
+
+
+def test_split_part_covers_all_items():
+    items = list(range(10))
+    parts = [split_part(items, part, 3) for part in range(3)]
+    assert parts == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+
+
+def test_sleep_until_sleeps_in_slices(clock):
+    sleep_until(clock.now + 100, clock, clock.sleep, max_sleep=30)
+    assert clock.slept == [30, 30, 30, 10]
+
+
+def make_scheduler(clock, workdir, calls):
+    def runner(job, part, parts):
+        calls.append((job['id'], part, parts, at(clock.now)))
+    return Scheduler(JobStore(str(workdir / 'schedule.json')), runner, clock, clock.sleep)
+
+
+@pytest.mark.parametrize('policy, expected', [('skip', 0), ('once', 1), ('all', 4)])
+def test_catch_up_policies(clock, workdir, policy, expected):
+    calls = []
+    clock.now = ts('2026-10-19 08:00')
+    scheduler = make_scheduler(clock, workdir, calls)
+    scheduler.add_job('0 9 * * *', 'jobs.json', catch_up=policy, job_id='daily')
+    # 错过了 19、20、21、22 日 9:00 的四次触发
+    clock.now = ts('2026-10-22 10:00')
+    assert scheduler.run_pending() == expected
+    assert len(calls) == expected
+    assert scheduler.stats['missed'] == 1
+    assert at(scheduler.store.jobs['daily']['next_run']) == '2026-10-23 09:00'
+    assert scheduler.run_pending() == 0
+
+
+def test_fire_within_grace_is_not_a_miss(clock, workdir):
+    calls = []
+    clock.now = ts('2026-10-19 08:00')
+    scheduler = make_scheduler(clock, workdir, calls)
+    scheduler.add_job('0 9 * * *', 'jobs.json', catch_up='skip', job_id='daily')
+    clock.now = ts('2026-10-19 09:00') + 30
+    assert scheduler.run_pending() == 1
+    assert scheduler.stats['missed'] == 0
+
+
+def test_spread_runs_parts_across_window(clock, workdir):
+    calls = []
+    clock.now = ts('2026-10-19 08:00')
+    scheduler = make_scheduler(clock, workdir, calls)
+    scheduler.add_job('0 9 * * *', 'jobs.json', spread=3600, parts=3, job_id='spread')
+    scheduler.run_forever(until=ts('2026-10-19 11:00'))
+    assert calls == [
+        ('spread', 0, 3, '2026-10-19 09:00'),
+        ('spread', 1, 3, '2026-10-19 09:20'),
+        ('spread', 2, 3, '2026-10-19 09:40'),
+    ]
+    assert scheduler.store.jobs['spread']['pending'] == []
+
+
+def test_pending_parts_survive_restart(clock, workdir):
+    calls = []
+    clock.now = ts('2026-10-19 09:00')
+    scheduler = make_scheduler(clock, workdir, calls)
+    scheduler.add_job('5 9 * * *', 'jobs.json', spread=1200, parts=2, job_id='spread')
+    clock.now = ts('2026-10-19 09:05')
+    scheduler.run_pending()
+    # 重启后从磁盘恢复，继续执行剩下的一份
+    restarted = make_scheduler(clock, workdir, calls)
+    clock.now = ts('2026-10-19 09:15')
+    assert restarted.run_pending() == 1
+    assert [part for _, part, _, _ in calls] == [0, 1]
+
+
+def test_once_job_is_removed_after_run(clock, workdir):
+    calls = []
+    clock.now = ts('2026-10-19 08:00')
+    scheduler = make_scheduler(clock, workdir, calls)
+    scheduler.add_job(OnceTrigger(ts('2026-10-19 08:30')), 'jobs.json', job_id='once')
+    scheduler.run_forever()
+    assert calls == [('once', 0, 1, '2026-10-19 08:30')]
+    assert 'once' not in JobStore(str(workdir / 'schedule.json')).jobs
+    with pytest.raises(ScheduleError):
+        scheduler.add_job(OnceTrigger(ts('2026-10-19 08:00')), 'jobs.json')
+
+
+def test_runner_failure_is_counted(clock, workdir):
+    clock.now = ts('2026-10-19 08:00')
+
+    def runner(job, part, parts):
+        raise RuntimeError('微信未启动')
+    scheduler = Scheduler(JobStore(str(workdir / 'schedule.json')), runner, clock, clock.sleep)
+    scheduler.add_job('0 9 * * *', 'jobs.json', job_id='daily')
+    scheduler.run_forever(until=ts('2026-10-19 09:01'))
+    assert scheduler.stats == {'runs': 0, 'failures': 1, 'missed': 0, 'suspends': 0}
+
+
+def test_suspend_is_detected_and_caught_up(clock, workdir):
+    calls = []
+    clock.now = ts('2026-10-19 08:00')
+    scheduler = make_scheduler(clock, workdir, calls)
+    scheduler.add_job('0 9 * * *', 'jobs.json', catch_up='once', job_id='daily')
+    suspended = []
+
+    def sleep(seconds):
+        # 第一次休眠时电脑睡眠到第二天中午
+        clock.now = ts('2026-10-20 12:00') if not suspended else clock.now + seconds
+        suspended.append(seconds)
+    scheduler.sleep = sleep
+    scheduler.run_forever(until=ts('2026-10-20 12:30'))
+    assert scheduler.stats['suspends'] == 1
+    assert scheduler.stats['missed'] == 1
+    assert calls == [('daily', 0, 1, '2026-10-20 12:00')]
+
+
+def test_clock_jump_backwards_is_detected(clock, workdir):
+    calls = []
+    clock.now = ts('2026-10-19 08:00')
+    scheduler = make_scheduler(clock, workdir, calls)
+    scheduler.add_job('0 9 * * *', 'jobs.json', job_id='daily')
+    jumped = []
+
+    def sleep(seconds):
+        clock.now += -600 if not jumped else seconds
+        jumped.append(seconds)
+    scheduler.sleep = sleep
+    scheduler.run_forever(until=ts('2026-10-19 09:01'))
+    assert scheduler.stats['suspends'] == 1
+    assert calls == [('daily', 0, 1, '2026-10-19 09:00')]
+
+
+def test_jobs_added_by_another_process_are_picked_up(clock, workdir):
+    calls = []
+    clock.now = ts('2026-10-19 08:00')
+    scheduler = make_scheduler(clock, workdir, calls)
+    other = make_scheduler(clock, workdir, [])
+    other.add_job('0 9 * * *', 'jobs.json', job_id='added')
+    # 模拟文件修改时间变化
+    scheduler.store._mtime = None
+    clock.now = ts('2026-10-19 09:00')
+    assert scheduler.run_pending() == 1
+    assert calls[0][0] == 'added'
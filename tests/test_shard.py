@@ -0,0 +1,78 @@
+import pytest
+
+from wechat_shard import ShardQueue
+
+ITEMS = [('任务A', name) for name in ('张三', '李四', '王五', '赵六')]
+
+
+@pytest.fixture
+def queue(workdir):
+    queue = ShardQueue(str(workdir / 'queue.db'), max_attempts=2)
+    queue.enqueue(ITEMS)
+    yield queue
+    queue.close()
+
+
+def names(rows):
+    return [contact for _, contact, _ in rows]
+
+
+def test_enqueue_ignores_known_contacts(queue):
+    assert queue.enqueue(ITEMS[:2] + [('任务A', '孙七')]) == 1
+    assert queue.remaining() == 5
+
+
+def test_claim_in_order_and_complete(queue):
+    assert names(queue.claim('w1', 2)) == ['张三', '李四']
+    assert names(queue.claim('w2', 5)) == ['王五', '赵六']
+    assert queue.claim('w3', 5) == []
+    assert queue.complete('w1', '任务A', '张三', True)
+    totals, per_worker = queue.stats()
+    assert totals['done'] == 1 and totals['leased'] == 3
+    assert per_worker['w1'] == {'done': 1, 'leased': 1}
+
+
+def test_failed_contact_goes_to_another_worker_first(queue):
+    queue.claim('w1', 1)
+    assert queue.complete('w1', '任务A', '张三', False)
+    # 其他工作进程按顺序先领取失败的联系人；失败的工作进程只在没有别的联系人时重试
+    assert names(queue.claim('w1', 5)) == ['李四', '王五', '赵六']
+    assert names(queue.claim('w1', 5)) == ['张三']
+
+
+def test_expired_lease_is_taken_over(queue):
+    queue.claim('w1', 1, lease=-1)
+    assert queue.claim('w2', 1) == [('任务A', '张三', 'w1')]
+    # 原持有者的租约已被接管，结果不再生效
+    assert not queue.complete('w1', '任务A', '张三', True)
+    assert queue.complete('w2', '任务A', '张三', True)
+
+
+def test_renew_keeps_lease(queue):
+    queue.register('w1')
+    queue.claim('w1', 1, lease=-1)
+    assert queue.renew('w1') == 1
+    assert names(queue.claim('w2', 1)) == ['李四']
+
+
+def test_contact_fails_after_max_attempts(queue):
+    queue.claim('w1', 1, lease=-1)
+    assert names(queue.claim('w2', 1, lease=-1)) == ['张三']
+    # 第二次领取后租约又过期，达到领取上限，不再分发
+    assert names(queue.claim('w3', 5)) == ['李四', '王五', '赵六']
+    assert queue.stats()[0]['failed'] == 1
+    assert queue.remaining() == 3
+
+
+def test_failure_at_max_attempts_is_final(queue):
+    for worker in ('w1', 'w2'):
+        assert names(queue.claim(worker, 1)) == ['张三']
+        queue.complete(worker, '任务A', '张三', False)
+    assert queue.stats()[0]['failed'] == 1
+
+
+def test_register_releases_stale_leases(queue):
+    queue.claim('w1', 2)
+    queue.register('w1')
+    assert queue.stats()[0]['pending'] == 4
+    assert names(queue.claim('w2', 1)) == ['张三']
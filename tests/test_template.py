@@ -0,0 +1,37 @@
+import pytest
+
+from wechat_template import (MessageTemplate, RenderError, TemplateError, compile_message, has_templates,
+                             render_messages, validate_messages)
+
+
+def test_render_fields_and_name():
+    template = MessageTemplate('{name}您好，您的订单{订单号}已发货，{name}请查收')
+    assert template.fields == ('name', '订单号')
+    assert template.render('张三', {'订单号': 'A100'}) == '张三您好，您的订单A100已发货，张三请查收'
+
+
+def test_missing_value_raises_render_error():
+    template = MessageTemplate('订单{订单号}')
+    with pytest.raises(RenderError):
+        template.render('张三', {'订单号': ''})
+    with pytest.raises(RenderError):
+        template.render('张三')
+
+
+@pytest.mark.parametrize('source', ['{}', '{金额:.2f}', '{name!r}', '{未闭合'])
+def test_invalid_templates(source):
+    with pytest.raises(TemplateError):
+        MessageTemplate(source)
+
+
+def test_compile_message_keeps_plain_text():
+    assert compile_message('你好') == '你好'
+    assert compile_message('{{你好}}') == '{你好}'
+    assert isinstance(compile_message('{name}你好'), MessageTemplate)
+
+
+def test_validate_and_render_messages():
+    messages = [compile_message('你好'), compile_message('{name} {城市}'), compile_message('{等级}{城市}')]
+    assert has_templates(messages)
+    assert validate_messages(messages, ['城市']) == ['等级']
+    assert render_messages(messages, '张三', {'城市': '上海', '等级': 'VIP'}) == ['你好', '张三 上海', 'VIP上海']
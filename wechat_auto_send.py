@@ -1,17 +1,25 @@
 import time
-import pyautogui
-import pyperclip
-import win32api
-import win32con
 import os
-import re
+import sys
 from datetime import datetime
-import base64
-from io import BytesIO
-from PIL import Image
-import winreg
-import tkinter as tk
-from tkinter import filedialog
+from wechat_clipboard import get_clipboard
+from wechat_confirm import SendConfirmation
+from wechat_contacts import CONTACT_FILE_TYPES, load_contacts
+from wechat_fingerprint import FINGERPRINT_FILE, ContactVerifier, FingerprintCache
+from wechat_input import press
+from wechat_journal import JOURNAL_FILE, SendJournal
+from wechat_locator import get_locator
+from wechat_logger import LOG_FILE, write_log, flush_logs
+from wechat_metrics import get_metrics, start_export, stop_export, timed
+from wechat_pacing import STATS_LOG_EVERY, get_pacer
+from wechat_preflight import check_files, get_file_cache
+from wechat_prefetch import ContactPrefetcher
+from wechat_records import DEFAULT_CAMPAIGN, LEGACY_RECORDS_FILE, RECORDS_DB, RecordStoreError, SentRecordStore
+from wechat_scheduler import sleep_until
+from wechat_capture import capture_region, dump_debug, title_region, search_region, chat_region, input_region
+from wechat_window import get_window_tracker
+from wechat_template import MessageTemplate, TemplateError, compile_message, validate_messages
+from wechat_wait import wait_step, window_focused, foreground_changed, region_changed, clipboard_holds
 
 """
 微信自动发送消息和文件脚本
@@ -30,9 +38,6 @@ from tkinter import filedialog
 3. 执行过程中电脑不能息屏
 """
 
-# 日志文件路径
-LOG_FILE = 'wechat_auto_send.log'
-
 # 微信默认路径
 DEFAULT_WECHAT_PATHS = [
     r"C:\Program Files\Tencent\Weixin\Weixin.exe",
@@ -41,8 +46,18 @@ DEFAULT_WECHAT_PATHS = [
     r"D:\Program Files (x86)\Tencent\Weixin\Weixin.exe"
 ]
 
+# 文件发送方式：'bulk' 把联系人的全部文件作为一个文件列表一次粘贴发送，
+# 剪贴板不支持文件列表时自动退回 'dialog'（逐个文件通过Ctrl+O对话框发送）
+FILE_SEND_MODE = 'bulk'
+
+# 设置完成后在控制台显示的联系人数量上限
+CONTACT_PREVIEW = 50
+
 def open_file_dialog(title, filetypes):
     """打开文件选择对话框"""
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()  # 隐藏主窗口
     root.attributes('-topmost', True)  # 对话框置顶
@@ -58,6 +73,9 @@ def open_file_dialog(title, filetypes):
 
 def open_directory_dialog(title):
     """打开目录选择对话框"""
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()  # 隐藏主窗口
     root.attributes('-topmost', True)  # 对话框置顶
@@ -70,18 +88,11 @@ def open_directory_dialog(title):
     root.destroy()
     return directory
 
-def write_log(message, level='INFO'):
-    """写入日志"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_entry = f"[{timestamp}] [{level}] {message}\n"
-    print(log_entry.strip())
-    with open(LOG_FILE, 'a', encoding='utf-8') as f:
-        f.write(log_entry)
-
 def get_wechat_path():
     """获取微信路径"""
     # 尝试从注册表获取
     try:
+        import winreg
         key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Tencent\WeChat")
         wechat_path, _ = winreg.QueryValueEx(key, "InstallPath")
         wechat_exe = os.path.join(wechat_path, "Weixin.exe")
@@ -117,10 +128,10 @@ def get_wechat_path():
             print("路径不存在，请重新选择！")
 
 def get_chat_list():
-    """获取联系人列表"""
+    """获取联系人列表，返回 (联系人列表, 联系人 -> 该行各列的字典)"""
     print('请选择联系人列表输入方式：')
     print('1. 手动输入联系人')
-    print('2. 从文件读取联系人（.txt文件，每行一个联系人）')
+    print('2. 从文件读取联系人（.txt每行一个联系人，或带表头的.csv、.jsonl）')
     print('\n')
     
     try:
@@ -141,6 +152,7 @@ def get_chat_list():
         exit()
     
     chat_list = []
+    contact_fields = {}
     
     if choice == '1':
         # 手动输入联系人
@@ -165,7 +177,7 @@ def get_chat_list():
         while True:
             file_path = open_file_dialog(
                 title="选择联系人列表文件",
-                filetypes=[("文本文件", "*.txt"), ("所有文件", "*")]
+                filetypes=CONTACT_FILE_TYPES
             )
             
             if not file_path:
@@ -176,74 +188,56 @@ def get_chat_list():
                 print('文件不存在，请重新选择！')
                 continue
             
-            if not file_path.endswith('.txt'):
-                print('请选择.txt文件！')
+            if not file_path.lower().endswith(('.txt', '.csv', '.jsonl', '.ndjson')):
+                print('请选择.txt、.csv或.jsonl文件！')
                 continue
             
             try:
-                # 首先尝试使用UTF-8-sig编码读取（默认支持BOM）
-                try:
-                    with open(file_path, 'r', encoding='utf-8-sig') as f:
-                        lines = f.readlines()
-                        chat_list = [line.strip() for line in lines if line.strip()]
-                    
-                    if not chat_list:
-                        print('文件中没有联系人，请检查文件内容！')
-                        continue
-                    
-                    print('使用UTF-8-sig编码成功读取文件')
-                    write_log(f'从文件 {file_path} 读取联系人列表，共{len(chat_list)}个联系人，使用编码 UTF-8-sig')
-                    break
-                    
-                except Exception:
-                    # 如果UTF-8-sig失败，尝试其他编码
-                    encodings = ['utf-8', 'gbk', 'gb18030', 'ansi', 'utf-16', 'utf-16-le', 'utf-16-be']
-                    success = False
-                    
-                    for encoding in encodings:
-                        try:
-                            with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-                                lines = f.readlines()
-                                chat_list = [line.strip() for line in lines if line.strip()]
-                            
-                            if not chat_list:
-                                print('文件中没有联系人，请检查文件内容！')
-                                success = False
-                                break
-                            
-                            print(f'使用编码 {encoding} 成功读取文件')
-                            write_log(f'从文件 {file_path} 读取联系人列表，共{len(chat_list)}个联系人，使用编码 {encoding}')
-                            success = True
-                            break
-                            
-                        except Exception:
-                            continue
-                    
-                    if success:
-                        break
-                    else:
-                        print('无法读取文件，请检查文件编码格式！')
-                        continue
-                
+                # 根据BOM和样本判断编码，流式读取一遍，同时规范化和去重
+                chat_list, contact_fields, issues, encoding, issue_count = load_contacts(file_path)
             except Exception as e:
                 print(f'读取文件失败：{e}')
                 write_log(f'读取联系人文件失败：{e}', 'ERROR')
                 continue
+            
+            if issue_count:
+                print(f'文件中有{issue_count}行被跳过：')
+                for issue in issues[:20]:
+                    print(f'  第{issue.line}行：{issue.reason}')
+                    write_log(f'联系人文件第{issue.line}行被跳过：{issue.reason}', 'WARNING')
+                if issue_count > 20:
+                    print(f'  ……其余{issue_count - 20}行详见日志')
+            
+            if not chat_list:
+                print('文件中没有联系人，请检查文件内容！')
+                continue
+            
+            print(f'使用编码 {encoding} 成功读取文件')
+            write_log(f'从文件 {file_path} 读取联系人列表，共{len(chat_list)}个联系人，使用编码 {encoding}，跳过{issue_count}行')
+            break
     
     else:
         print('输入错误，请重新选择！')
         return get_chat_list()
     
     print(f'\n联系人列表设置完成，共{len(chat_list)}个联系人：')
-    for i, contact in enumerate(chat_list, 1):
+    for i, contact in enumerate(chat_list[:CONTACT_PREVIEW], 1):
         print(f'{i}. {contact}')
+    if len(chat_list) > CONTACT_PREVIEW:
+        print(f'……共{len(chat_list)}个联系人，仅显示前{CONTACT_PREVIEW}个')
     print('\n')
     write_log(f'联系人列表设置完成，共{len(chat_list)}个联系人')
-    return chat_list
+    return chat_list, contact_fields
+
+def get_chat_message(columns=()):
+    """获取消息内容
 
-def get_chat_message():
-    """获取消息内容"""
+    消息中可以用 {列名} 引用联系人文件中的列、{name} 引用联系人名称，
+    输入结束时按columns校验，引用了不存在的列需要重新输入。
+    """
     print('请输入消息内容（输入完成后，输入"end"结束输入，输入"back"重新输入，输入q退出）：')
+    if columns:
+        print(f'可用 {{列名}} 插入联系人文件中的列：{"、".join(["name"] + list(columns))}')
     print('\n')
     message_lines = []
     exit_flag = ['q', 'Q']
@@ -268,16 +262,29 @@ def get_chat_message():
             if not message_lines:
                 print('消息列表不能为空，请至少输入一条消息！')
                 continue
+            # 将所有行合并成一条消息，保持换行；包含占位符时编译成模板并校验列名
+            message = '\n'.join(message_lines)
+            try:
+                message = compile_message(message)
+                missing = validate_messages([message], columns)
+            except TemplateError as e:
+                missing = None
+                print(f'{e}（字面大括号请写成 {{{{ 和 }}}}），请重新输入\n')
+            if missing:
+                print(f'消息引用了联系人列表中不存在的列：{"、".join(missing)}，请重新输入\n')
+            if missing is None or missing:
+                message_lines = []
+                continue
             break
         message_lines.append(line)
     
-    # 将所有行合并成一条消息，保持换行
-    message = '\n'.join(message_lines)
-    
     print('\n消息设置完成：')
     print(message)
     print('\n')
-    write_log(f'消息设置完成，消息长度：{len(message)}字符')
+    if isinstance(message, MessageTemplate):
+        write_log(f'消息模板设置完成，模板长度：{len(str(message))}字符，引用字段：{"、".join(message.fields)}')
+    else:
+        write_log(f'消息设置完成，消息长度：{len(message)}字符')
     return [message]
 
 def get_file_path():
@@ -300,66 +307,122 @@ def get_file_path():
             file_list = []
             print('重新输入\n')
             continue
-        if not os.path.exists(file_path):
-            write_log(f"文件不存在: {file_path}", "WARNING")
-            print("文件不存在，请重新输入！")
+        info = get_file_cache().inspect(file_path)
+        if info.problem:
+            write_log(f"文件 {file_path} {info.problem}", "WARNING")
+            print(f"文件{info.problem}，请重新输入！")
             continue
         file_list.append(file_path)
         nums -= 1
     print('\n')
     return file_list
 
+def wait_for(step, probe=None, size=0, per_mb=None):
+    """执行命名等待步骤，超时时记录警告；size为该步骤处理的字节数，per_mb为每MB增加的等待时长"""
+    if not wait_step(step, probe, size, per_mb):
+        write_log(f"等待步骤 {step} 超时，继续执行", "WARNING")
+        return False
+    return True
+
+def wait_upload(step, probe, size):
+    """等待文件出现在聊天记录中：超时按文件大小和实测上传速度计算，并用本次耗时更新上传速度"""
+    cache = get_file_cache()
+    clock = get_metrics().clock
+    start = clock()
+    confirmed = wait_for(step, probe, size, cache.upload_per_mb())
+    if probe is not None:
+        cache.observe_upload(size, clock() - start, confirmed)
+    return confirmed
+
+def make_probe(factory, *args):
+    """创建就绪探针，失败时返回None（退回最小稳定等待）"""
+    try:
+        return factory(*args)
+    except Exception:
+        return None
+
+def get_wechat_rect():
+    """获取微信窗口区域(left, top, width, height)，找不到时返回None"""
+    try:
+        return get_window_tracker().rect()
+    except Exception:
+        return None
+
+def copy_to_clipboard(text, step):
+    """写入剪贴板；写入已由序列号确认时立即返回，否则按等待步骤轮询读回"""
+    if get_clipboard().copy(text) is None:
+        wait_for(step, make_probe(clipboard_holds, text))
+
 def input_content(content):
     """输入内容并发送"""
-    pyperclip.copy(content)
-    time.sleep(0.5)
+    copy_to_clipboard(content, 'content_clipboard')
     # 模拟Ctrl+V
-    win32api.keybd_event(17, 0, 0, 0)    # Ctrl
-    win32api.keybd_event(86, 0, 0, 0)    # V
-    win32api.keybd_event(17, 0, win32con.KEYEVENTF_KEYUP, 0)
-    win32api.keybd_event(86, 0, win32con.KEYEVENTF_KEYUP, 0)
-    time.sleep(1)
+    press('ctrl', 'v')
+    wait_for('content_paste')
     # 模拟Enter
-    win32api.keybd_event(13, 0, 0, 0)    # Enter
-    win32api.keybd_event(13, 0, win32con.KEYEVENTF_KEYUP, 0)
-    time.sleep(1)
+    press('enter')
+    wait_for('content_enter')
+
+def confirm_contact_slow(chat_name, frame):
+    """较慢的联系人确认：识别标题栏中的联系人名称
 
+    返回 True/False 表示确认是/不是目标联系人，None 表示无法确认（发送全部确认成功后才记录指纹）。
+    """
+    # 这里可以添加更复杂的图像识别逻辑
+    # 例如：识别聊天窗口标题栏中的联系人名称
+    # 由于复杂度较高，这里暂时使用简单的实现
+    # 实际应用中可以使用OCR技术识别屏幕文字
+    
+    # 简单实现：无法确认，按目标联系人处理，但不把这次截图当作确认过的指纹
+    write_log(f"屏幕视觉识别：无法确认，假设当前联系人是 {chat_name}")
+    return None
+
+# 联系人确认器（指纹缓存在整个运行期间复用）
+_contact_verifier = None
+
+def get_contact_verifier():
+    """获取联系人确认器"""
+    global _contact_verifier
+    if _contact_verifier is None:
+        _contact_verifier = ContactVerifier(FingerprintCache(FINGERPRINT_FILE), confirm_contact_slow)
+    return _contact_verifier
+
+@timed('check_current_contact')
 def check_current_contact(chat_name):
     """确认当前聊天窗口的联系人是否是目标联系人"""
     write_log(f"确认当前聊天窗口的联系人是否是 {chat_name}")
     
     try:
-        # 获取屏幕截图
-        screenshot = pyautogui.screenshot()
-        
-        # 保存截图用于调试
-        screenshot.save('debug_contact_screenshot.png')
-        write_log("已保存联系人确认截图用于调试")
-        
-        # 这里可以添加更复杂的图像识别逻辑
-        # 例如：识别聊天窗口标题栏中的联系人名称
-        # 由于复杂度较高，这里暂时使用简单的实现
-        # 实际应用中可以使用OCR技术识别屏幕文字
+        # 只截取聊天标题栏区域
+        rect = get_wechat_rect()
+        if not rect:
+            write_log("未找到微信窗口，跳过联系人确认", "WARNING")
+            return True
+        frame = capture_region('title', title_region(rect))
+        if dump_debug('contact', frame):
+            write_log("已提交联系人确认截图用于调试")
         
-        # 简单实现：假设是目标联系人
-        write_log(f"屏幕视觉识别：假设当前联系人是 {chat_name}")
-        return True
+        # 先比较缓存的标题栏指纹，没有缓存或结果模糊时再做较慢的确认
+        confirmed, result, distance = get_contact_verifier().verify(chat_name, frame)
+        write_log(f"联系人指纹校验: {result}" + (f"，汉明距离 {distance}" if distance is not None else ""))
+        return confirmed
         
     except Exception as e:
         write_log(f"联系人确认失败: {e}", "WARNING")
         return True  # 出错时默认认为是目标联系人
 
+@timed('check_message_sent', judge=False)
 def check_message_sent(chat_name, message):
     """检查是否已经给联系人发送过消息"""
     write_log(f"检查是否已经给联系人 {chat_name} 发送过消息")
     
     try:
-        # 获取屏幕截图
-        screenshot = pyautogui.screenshot()
-        
-        # 保存截图用于调试
-        screenshot.save('debug_message_screenshot.png')
-        write_log("已保存消息检查截图用于调试")
+        # 只截取聊天记录区域
+        rect = get_wechat_rect()
+        if rect:
+            frame = capture_region('message', chat_region(rect))
+            if dump_debug('message', frame):
+                write_log("已提交消息检查截图用于调试")
         
         # 这里可以添加更复杂的图像识别逻辑
         # 例如：识别聊天记录中的消息内容
@@ -374,33 +437,30 @@ def check_message_sent(chat_name, message):
         write_log(f"屏幕视觉识别失败: {e}", "WARNING")
         return False
 
+@timed('seek_for_contacts')
 def seek_for_contacts(chat_name):
     """搜索联系人"""
     write_log(f"开始搜索联系人: {chat_name}")
     
     try:
         # 模拟Ctrl+F打开搜索框
-        win32api.keybd_event(17, 0, 0, 0)    # Ctrl
-        win32api.keybd_event(70, 0, 0, 0)    # F
-        win32api.keybd_event(17, 0, win32con.KEYEVENTF_KEYUP, 0)
-        win32api.keybd_event(70, 0, win32con.KEYEVENTF_KEYUP, 0)
-        time.sleep(1)
+        rect = get_wechat_rect()
+        open_probe = make_probe(region_changed, search_region(rect)) if rect else None
+        press('ctrl', 'f')
+        wait_for('search_box_open', open_probe)
         
         # 输入联系人名称并按Enter
-        pyperclip.copy(chat_name)
-        time.sleep(0.5)
+        copy_to_clipboard(chat_name, 'search_clipboard')
         
-        # 粘贴联系人名称
-        win32api.keybd_event(17, 0, 0, 0)    # Ctrl
-        win32api.keybd_event(86, 0, 0, 0)    # V
-        win32api.keybd_event(17, 0, win32con.KEYEVENTF_KEYUP, 0)
-        win32api.keybd_event(86, 0, win32con.KEYEVENTF_KEYUP, 0)
-        time.sleep(1)
+        # 粘贴联系人名称，等待搜索框显示内容
+        paste_probe = make_probe(region_changed, search_region(rect)) if rect else None
+        press('ctrl', 'v')
+        wait_for('search_paste', paste_probe)
         
-        # 按Enter确认搜索
-        win32api.keybd_event(13, 0, 0, 0)    # Enter
-        win32api.keybd_event(13, 0, win32con.KEYEVENTF_KEYUP, 0)
-        time.sleep(3)  # 等待搜索结果
+        # 按Enter确认搜索，等待聊天记录区域切换到目标联系人
+        result_probe = make_probe(region_changed, chat_region(rect)) if rect else None
+        press('enter')
+        wait_for('search_result', result_probe)
         
         write_log(f"联系人搜索完成: {chat_name}")
         return True
@@ -409,65 +469,94 @@ def seek_for_contacts(chat_name):
         write_log(f"搜索联系人失败: {e}", "ERROR")
         return False
 
+def locate_element(name, rect):
+    """模板匹配定位界面元素，没有模板或未找到时返回None"""
+    try:
+        return get_locator().locate_in_window(name, rect)
+    except Exception as e:
+        write_log(f"模板匹配定位 {name} 失败: {e}", "WARNING")
+        return None
+
+class FallbackPosition(tuple):
+    """没有找到微信窗口或定位出错时使用的默认发送框位置，按 (x, y) 元组使用"""
+
+@timed('locate_wechat_elements', judge=lambda position: 'fail' if isinstance(position, FallbackPosition) else 'ok')
 def locate_wechat_elements():
-    """定位微信界面元素"""
+    """定位微信界面元素，返回发送框位置；定位失败时返回 FallbackPosition（计时记为失败）"""
+    import pyautogui
+
     write_log("开始定位微信界面元素")
     
     try:
-        # 查找微信窗口
-        wechat_windows = pyautogui.getWindowsWithTitle('微信')
-        if wechat_windows:
-            wechat_window = wechat_windows[0]
-            wechat_window.activate()
-            write_log(f"找到微信窗口: {wechat_window.title}")
+        # 查找微信窗口（句柄和窗口区域由跟踪器缓存）
+        tracker = get_window_tracker()
+        rect = tracker.rect()
+        if rect:
+            if not tracker.is_focused():
+                tracker.activate()
+                tracker.invalidate()
+                write_log("微信窗口失去焦点，已重新激活")
+            
+            # 窗口没有移动、缩放或失去焦点时直接使用缓存的发送框位置
+            cached_position = tracker.get_element('send_box')
+            if cached_position:
+                write_log(f"使用缓存的发送框位置: {cached_position}")
+                return cached_position
+            
+            tracker.activate()
+            write_log(f"找到微信窗口: {tracker.window.title}")
             
             # 获取微信窗口位置和大小
-            window_left = wechat_window.left
-            window_top = wechat_window.top
-            window_width = wechat_window.width
-            window_height = wechat_window.height
+            window_left, window_top, window_width, window_height = rect
             
             write_log(f"微信窗口位置: ({window_left}, {window_top}), 大小: {window_width}x{window_height}")
             
-            # 方法1：基于微信窗口的相对位置定位
-            # 发送框通常在窗口底部
-            send_box_x = window_left + window_width // 2
-            send_box_y = window_top + window_height - 100
-            
-            write_log(f"基于窗口定位发送框: ({send_box_x}, {send_box_y})")
+            # 方法1：在窗口底部区域用模板匹配定位输入框
+            match = locate_element('input_box', (window_left, window_top, window_width, window_height))
+            if match:
+                send_box_x, send_box_y = match.x, match.y
+                write_log(f"模板匹配定位发送框: ({send_box_x}, {send_box_y})，得分 {match.score:.2f}")
+            else:
+                # 方法2：基于微信窗口的相对位置定位
+                # 发送框通常在窗口底部
+                send_box_x = window_left + window_width // 2
+                send_box_y = window_top + window_height - 100
+                
+                write_log(f"基于窗口定位发送框: ({send_box_x}, {send_box_y})")
             
             # 移动到发送框位置
             pyautogui.moveTo(send_box_x, send_box_y)
-            time.sleep(1)
+            wait_for('locate_hover')
             
             # 点击发送框位置
             pyautogui.click(send_box_x, send_box_y)
             write_log("已点击发送框位置")
             
+            tracker.set_element('send_box', (send_box_x, send_box_y))
             return (send_box_x, send_box_y)
         
-        # 方法2：如果找不到微信窗口，使用屏幕相对位置
+        # 方法3：如果找不到微信窗口，使用屏幕相对位置
         screen_width, screen_height = pyautogui.size()
         send_box_x = screen_width // 2
         send_box_y = screen_height - 150
         
-        write_log(f"使用屏幕相对位置: ({send_box_x}, {send_box_y})")
+        write_log(f"未找到微信窗口，使用屏幕相对位置: ({send_box_x}, {send_box_y})", "WARNING")
         
         # 移动到发送框位置
         pyautogui.moveTo(send_box_x, send_box_y)
-        time.sleep(1)
+        wait_for('locate_hover')
         
         # 点击发送框位置
         pyautogui.click(send_box_x, send_box_y)
         write_log("已点击发送框位置")
         
-        return (send_box_x, send_box_y)
+        return FallbackPosition((send_box_x, send_box_y))
         
     except Exception as e:
         write_log(f"定位微信元素失败: {e}", "ERROR")
         # 返回默认位置
         screen_width, screen_height = pyautogui.size()
-        default_position = (screen_width // 2, screen_height - 150)
+        default_position = FallbackPosition((screen_width // 2, screen_height - 150))
         write_log(f"使用默认位置: {default_position}")
         
         # 点击默认位置
@@ -476,59 +565,69 @@ def locate_wechat_elements():
         
         return default_position
 
-def check_send_success():
-    """检查发送是否成功"""
+def check_send_success(confirm=None):
+    """检查发送是否成功
+
+    confirm 为按Enter之前创建的发送确认探针（wechat_confirm.SendConfirmation）：聊天记录出现新的
+    发出消息时立即确认成功，出现“发送失败”等错误提示或超时仍未出现新消息时确认失败。
+    没有探针（找不到微信窗口或截图失败）时按旧版等待后假设发送成功。
+    """
     write_log("开始检查发送状态")
-    # 这里实现一个简单的检查机制
-    # 实际应用中可能需要更复杂的验证
-    time.sleep(2)  # 等待发送完成
-    
-    # 检查是否有错误提示
-    try:
-        # 查找常见错误提示
-        error_messages = ["发送失败", "文件不存在", "无法发送"]
-        # 这里使用一种简单的方法，实际应用中可能需要图像识别
+    if confirm is None:
+        wait_for('send_confirm')  # 等待发送完成
         write_log("发送操作已执行，假设发送成功")
         return True
+    
+    # 轮询聊天记录区域（文件上传的等待已经轮询过时立即返回）；固定策略下按旧版时长等待后再比较一次
+    wait_for('send_confirm', confirm)
+    try:
+        confirm.finish()
     except Exception as e:
         write_log(f"检查发送状态失败: {e}", "WARNING")
-        return True  # 默认认为成功
+        return True  # 无法截图时默认认为成功
+    if confirm.result == 'sent':
+        write_log("聊天记录出现新消息，确认发送成功")
+        return True
+    if confirm.result == 'failed':
+        write_log(f"检测到错误提示: {confirm.error}", "ERROR")
+    else:
+        write_log("聊天记录未出现新消息，发送失败", "ERROR")
+    return False
 
+@timed('send_message')
 def send_message(message, textbox_position):
     """发送单条消息"""
+    import pyautogui
+
     write_log(f"开始发送消息: {message[:20]}...")
     try:
         # 点击发送框
         pyautogui.click(textbox_position)
-        time.sleep(1)
+        wait_for('textbox_focus')
         
         # 输入消息内容
-        pyperclip.copy(message)
-        time.sleep(0.5)
+        copy_to_clipboard(message, 'message_clipboard')
+        rect = get_wechat_rect()
         
-        # 模拟Ctrl+V粘贴消息
-        win32api.keybd_event(17, 0, 0, 0)    # Ctrl
-        win32api.keybd_event(86, 0, 0, 0)    # V
-        win32api.keybd_event(17, 0, win32con.KEYEVENTF_KEYUP, 0)
-        win32api.keybd_event(86, 0, win32con.KEYEVENTF_KEYUP, 0)
-        time.sleep(2)
+        # 模拟Ctrl+V粘贴消息，等待输入框出现内容
+        paste_probe = make_probe(region_changed, input_region(rect)) if rect else None
+        press('ctrl', 'v')
+        wait_for('message_paste', paste_probe)
         
-        # 方法1：模拟Enter键发送
+        # 方法1：模拟Enter键发送，等待输入框被清空
         write_log("使用Enter键发送消息")
-        win32api.keybd_event(13, 0, 0, 0)    # Enter
-        win32api.keybd_event(13, 0, win32con.KEYEVENTF_KEYUP, 0)
-        time.sleep(2)
+        enter_probe = make_probe(region_changed, input_region(rect)) if rect else None
+        confirm = make_probe(SendConfirmation, chat_region(rect)) if rect else None
+        press('enter')
+        wait_for('message_enter', enter_probe)
         
         # 方法2：模拟Ctrl+Enter发送（备用）
         # write_log("使用Ctrl+Enter发送消息")
-        # win32api.keybd_event(17, 0, 0, 0)    # Ctrl
-        # win32api.keybd_event(13, 0, 0, 0)    # Enter
-        # win32api.keybd_event(17, 0, win32con.KEYEVENTF_KEYUP, 0)
-        # win32api.keybd_event(13, 0, win32con.KEYEVENTF_KEYUP, 0)
+        # press('ctrl', 'enter')
         # time.sleep(2)
         
         # 检查发送状态
-        if check_send_success():
+        if check_send_success(confirm):
             write_log(f"消息发送成功: {message[:20]}...")
             return True
         else:
@@ -538,27 +637,38 @@ def send_message(message, textbox_position):
         write_log(f"发送消息异常: {e}", "ERROR")
         return False
 
-def send_file(file_path, textbox_position):
-    """发送单个文件"""
+@timed('send_file')
+def send_file(file_path, textbox_position, size=None):
+    """发送单个文件；size为文件字节数（未提供时现场读取），用于计算上传等待时长"""
+    import pyautogui
+
     write_log(f"开始发送文件: {file_path}")
     try:
         # 点击发送框
         pyautogui.click(textbox_position)
-        time.sleep(0.5)
+        wait_for('file_textbox_focus')
+        rect = get_wechat_rect()
+        confirm = make_probe(SendConfirmation, chat_region(rect)) if rect else None
         
-        # 模拟Ctrl+O打开文件选择器
-        win32api.keybd_event(17, 0, 0, 0)    # Ctrl
-        win32api.keybd_event(79, 0, 0, 0)    # O
-        win32api.keybd_event(17, 0, win32con.KEYEVENTF_KEYUP, 0)
-        win32api.keybd_event(79, 0, win32con.KEYEVENTF_KEYUP, 0)
-        time.sleep(2)
+        # 模拟Ctrl+O打开文件选择器，等待对话框成为前台窗口
+        dialog_probe = make_probe(foreground_changed)
+        press('ctrl', 'o')
+        wait_for('file_dialog_open', dialog_probe)
         
-        # 输入文件路径并确认
+        # 输入文件路径并确认，等待对话框关闭、微信回到前台
         input_content(file_path)
-        time.sleep(2)
+        wait_for('file_dialog_close', make_probe(window_focused))
+        
+        # 等待文件出现在聊天记录且上传完成（画面稳定），超时视为发送失败
+        # 比较的基准是打开对话框之前的聊天记录（confirm），对话框关闭时文件已经显示也能确认
+        if size is None:
+            size = os.path.getsize(file_path)
+        if not wait_upload('file_upload', confirm, size):
+            write_log(f"文件上传超时: {file_path}", "ERROR")
+            return False
         
         # 检查发送状态
-        if check_send_success():
+        if check_send_success(confirm):
             write_log(f"文件发送成功: {file_path}")
             return True
         else:
@@ -568,168 +678,459 @@ def send_file(file_path, textbox_position):
         write_log(f"发送文件异常: {e}", "ERROR")
         return False
 
-def main(chat_list, message_info, files_info):
-    """主函数"""
-    write_log("=== 开始执行微信自动发送任务 ===")
+@timed('send_files_bulk')
+def send_files_bulk(file_paths, textbox_position, total_size=None):
+    """把多个文件作为一个文件列表粘贴到输入框，一次发送
+
+    剪贴板不支持文件列表时返回None（尚未执行任何操作，调用方可退回对话框流程），
+    否则返回是否发送成功。等待时长按文件总大小（total_size，未提供时现场读取）而不是文件个数计算。
+    """
+    import pyautogui
+
+    if total_size is None:
+        total_size = sum(os.path.getsize(path) for path in file_paths)
+    write_log(f"开始批量发送{len(file_paths)}个文件，共{total_size / 1024 / 1024:.1f}MB")
+    if get_clipboard().copy_files(file_paths) is None:
+        write_log("剪贴板不支持文件列表，改用文件对话框逐个发送", "WARNING")
+        return None
+    try:
+        # 点击发送框
+        pyautogui.click(textbox_position)
+        wait_for('file_textbox_focus')
+        rect = get_wechat_rect()
+        
+        # 粘贴文件列表，等待输入框出现全部文件
+        paste_probe = make_probe(region_changed, input_region(rect)) if rect else None
+        press('ctrl', 'v')
+        wait_for('files_paste', paste_probe, total_size)
+        
+        # Enter发送，等待聊天记录出现文件且上传完成（画面稳定），超时视为发送失败
+        confirm = make_probe(SendConfirmation, chat_region(rect)) if rect else None
+        press('enter')
+        if not wait_upload('files_send', confirm, total_size):
+            write_log(f"批量发送文件上传超时: {len(file_paths)}个，共{total_size / 1024 / 1024:.1f}MB", "ERROR")
+            return False
+        
+        # 检查发送状态
+        if check_send_success(confirm):
+            write_log(f"批量发送文件成功: {len(file_paths)}个")
+            return True
+        write_log(f"批量发送文件失败: {len(file_paths)}个", "ERROR")
+        return False
+    except Exception as e:
+        write_log(f"批量发送文件异常: {e}", "ERROR")
+        return False
+
+def launch_wechat(wechat_path):
+    """启动微信并等待窗口就绪"""
+    write_log(f"打开微信: {wechat_path}")
+    os.startfile(wechat_path)
+    wait_for('wechat_startup', make_probe(window_focused))  # 等待微信完全打开
+
+def open_session(wechat_path=None):
+    """打开发送会话：打开发送记录库并启动微信
+
+    返回的会话在多个任务之间共用，微信只启动一次；窗口跟踪器、元素定位器和
+    联系人指纹本来就是进程内共享的，后续任务直接沿用已预热的状态。
+    """
+    session = {'records': None, 'journal': None, 'results': []}
     
-    # 发送记录文件
-    SENT_RECORDS_FILE = 'wechat_sent_records.txt'
+    # 定期把各步骤耗时写入指标文件
+    try:
+        start_export()
+    except Exception as e:
+        write_log(f"启动指标输出失败: {e}", "WARNING")
     
-    # 读取已发送记录
-    sent_contacts = set()
+    # 打开发送记录库，按 (任务, 联系人, 内容哈希) 判断是否已发送；
+    # 记录库无法使用时无法去重，在启动微信之前中止，而不是重复发送
     try:
-        if os.path.exists(SENT_RECORDS_FILE):
-            with open(SENT_RECORDS_FILE, 'r', encoding='utf-8') as f:
-                for line in f:
-                    contact = line.strip()
-                    if contact:
-                        sent_contacts.add(contact)
-            write_log(f"读取已发送记录，共{len(sent_contacts)}个联系人")
+        records = SentRecordStore(RECORDS_DB)
+        imported = records.import_legacy(LEGACY_RECORDS_FILE)
+        if imported:
+            write_log(f"已导入旧版发送记录，共{imported}个联系人")
     except Exception as e:
-        write_log(f"读取发送记录失败: {e}", "WARNING")
+        write_log(f"打开发送记录库失败，任务中止: {e}", "ERROR")
+        print(f"无法打开发送记录库 {RECORDS_DB}：{e}，为避免重复发送，任务已中止")
+        stop_export()
+        raise RecordStoreError(f"无法打开发送记录库 {RECORDS_DB}: {e}") from e
+    write_log(f"打开发送记录库: {RECORDS_DB}")
+    session['records'] = records
+    
+    # 限额周期内已经发送过的联系人计入联系人限额
+    try:
+        contact_bucket = get_pacer().buckets.get('contact')
+        if contact_bucket:
+            used = records.count_since(time.time() - contact_bucket.period)
+            get_pacer().seed('contact', used)
+            write_log(f"联系人限额周期内已发送{used}个联系人")
+    except Exception as e:
+        write_log(f"统计联系人限额失败: {e}", "WARNING")
+    
+    # 重放预写日志：补写已完成的联系人，未完成的联系人稍后从中断的步骤继续
+    try:
+        journal = SendJournal(JOURNAL_FILE)
+        recovered, interrupted = journal.recover(session['records'])
+        if recovered or interrupted:
+            write_log(f"重放发送日志：补写{recovered}个已完成的联系人，{interrupted}个联系人发送中断，将从中断处继续")
+        session['journal'] = journal
+    except Exception as e:
+        write_log(f"打开发送日志失败: {e}", "WARNING")
     
     # 获取微信路径
-    wechat_path = get_wechat_path()
+    if not wechat_path:
+        wechat_path = get_wechat_path()
     
     # 打开微信
-    write_log(f"打开微信: {wechat_path}")
-    os.startfile(wechat_path)
-    time.sleep(5)  # 等待微信完全打开
+    launch_wechat(wechat_path)
+    return session
+
+def close_session(session, lock=True):
+    """结束发送会话：保存发送记录和联系人指纹，按需给微信上锁"""
+    records = session.get('records')
+    if records:
+        try:
+            records.close()
+        except Exception as e:
+            write_log(f"保存发送记录失败: {e}", "WARNING")
+        session['records'] = None
+    
+    journal = session.get('journal')
+    if journal:
+        try:
+            journal.checkpoint()
+            journal.close()
+        except Exception as e:
+            write_log(f"保存发送日志失败: {e}", "WARNING")
+        session['journal'] = None
+    
+    try:
+        get_contact_verifier().save()
+    except Exception as e:
+        write_log(f"保存联系人指纹失败: {e}", "WARNING")
+    
+    try:
+        get_file_cache().save()
+    except Exception as e:
+        write_log(f"保存文件缓存失败: {e}", "WARNING")
+    
+    try:
+        profiler = stop_export()
+        if profiler and profiler.samples:
+            write_log("采样分析：" + "，".join(f"{name} {share:.0%}" for name, share in profiler.top(5)))
+    except Exception as e:
+        write_log(f"写入指标文件失败: {e}", "WARNING")
+    
+    if not lock:
+        return
+    
+    # 微信上锁
+    write_log("执行微信上锁操作")
+    try:
+        press('ctrl', 'l')
+        write_log("微信已自动上锁")
+    except Exception as e:
+        write_log(f"微信上锁失败: {e}", "WARNING")
+
+def update_progress(metrics, done, success, fail, skipped):
+    """更新任务进度仪表值，指标文件下次刷新时写出"""
+    metrics.gauge('campaign_contacts_done', done)
+    metrics.gauge('campaign_success', success)
+    metrics.gauge('campaign_fail', fail)
+    metrics.gauge('campaign_skipped', skipped)
+    metrics.gauge('pacing_slowdown', get_pacer().slowdown)
+
+def run_campaign(session, chat_list, message_info, files_info, campaign=DEFAULT_CAMPAIGN, contact_fields=None):
+    """在已打开的会话中执行一个发送任务，返回统计结果字典
+
+    message_info 中可以包含 MessageTemplate，按 contact_fields 中该联系人的列逐个渲染。
+    结果中的 outcomes 记录每个联系人的结果：sent、skipped 或 failed。
+    """
+    write_log(f"=== 开始执行发送任务: {campaign} ===")
+    records = session.get('records')
+    journal = session.get('journal')
+    pacer = get_pacer()
+    metrics = get_metrics()
+    metrics.gauge('campaign_contacts_total', len(chat_list))
     
     # 统计发送结果
+    sent_count = 0
     total_success = 0
     total_fail = 0
     skipped_contacts = 0
+    # 每个联系人的结果：sent（本次发送成功）、skipped（之前已发送）、failed
+    outcomes = {}
     
-    # 对每个联系人执行发送操作
-    for contact_index, chat_name in enumerate(chat_list, 1):
-        write_log(f"=== 开始向联系人 {contact_index}/{len(chat_list)}: {chat_name} 发送 ===")
-        
-        # 检查是否已发送过
-        if chat_name in sent_contacts:
-            write_log(f"联系人 {chat_name} 已发送过消息，跳过")
-            print(f"\n联系人 {chat_name} 已发送过消息，跳过")
-            skipped_contacts += 1
-            continue
-        
-        try:
-            # 搜索联系人
-            if not seek_for_contacts(chat_name):
-                write_log(f"搜索联系人 {chat_name} 失败，跳过")
-                print(f"\n搜索联系人 {chat_name} 失败，跳过")
-                total_fail += len(message_info) + len(files_info)
-                continue
+    with ContactPrefetcher(chat_list, message_info, files_info, campaign, contact_fields, records) as prefetcher:
+        # 对每个联系人执行发送操作：个性化消息渲染、内容哈希、发送记录查询和文件检查
+        # 在后台线程中提前完成，这里只执行界面操作
+        for plan in prefetcher:
+            contact_index, chat_name = plan.index, plan.name
+            write_log(f"=== 开始向联系人 {contact_index}/{len(chat_list)}: {chat_name} 发送 ===")
+            update_progress(metrics, contact_index - 1, total_success, total_fail, skipped_contacts)
             
-            # 定位发送框
-            textbox_position = locate_wechat_elements()
-            
-            # 屏幕视觉识别：确认当前联系人
-            if not check_current_contact(chat_name):
-                write_log(f"屏幕视觉识别：当前联系人不是 {chat_name}，跳过")
-                print(f"\n屏幕视觉识别：当前联系人不是 {chat_name}，跳过")
+            # 缺少字段的联系人只跳过，不中断任务
+            if plan.error:
+                write_log(f"{plan.error}，跳过", "WARNING")
+                print(f"\n{plan.error}，跳过")
                 total_fail += len(message_info) + len(files_info)
+                outcomes[chat_name] = 'failed'
                 continue
+            messages = plan.messages
+            contact_payload = plan.payload
             
-            # 屏幕视觉识别：检查是否已经发送过消息
-            if message_info:
-                for message in message_info:
-                    if check_message_sent(chat_name, message):
-                        write_log(f"屏幕视觉识别：已给联系人 {chat_name} 发送过相同消息，跳过")
-                        print(f"\n屏幕视觉识别：已给联系人 {chat_name} 发送过相同消息，跳过")
-                        skipped_contacts += 1
-                        continue_flag = True
-                        break
-                else:
-                    continue_flag = False
-                
-                if continue_flag:
-                    continue
+            # 检查是否已发送过
+            if plan.sent:
+                write_log(f"联系人 {chat_name} 已发送过消息，跳过")
+                print(f"\n联系人 {chat_name} 已发送过消息，跳过")
+                skipped_contacts += 1
+                outcomes[chat_name] = 'skipped'
+                continue
             
-            # 统计当前联系人的发送结果
-            contact_success = 0
-            contact_fail = 0
+            # 上次运行在该联系人中途中断时，从中断的步骤继续
+            key = (campaign, chat_name, contact_payload)
+            progress = journal.progress(*key) if journal else None
+            if progress:
+                write_log(f"联系人 {chat_name} 上次发送中断（已发送{len(progress.messages)}条消息、{len(progress.files)}个文件），从中断处继续")
             
-            # 发送消息
-            if message_info:
-                write_log(f"开始发送{len(message_info)}条消息")
-                for i, message in enumerate(message_info, 1):
-                    write_log(f"发送第{i}条消息")
-                    if send_message(message, textbox_position):
-                        contact_success += 1
-                    else:
-                        contact_fail += 1
+            # 按联系人限额取令牌，超出时等待
+            pacer.acquire('contact')
+            if contact_index % STATS_LOG_EVERY == 0:
+                write_log(f"节奏统计: {pacer.summary()}")
             
-            # 发送文件
-            if files_info:
-                write_log(f"开始发送{len(files_info)}个文件")
-                for i, file_path in enumerate(files_info, 1):
-                    write_log(f"发送第{i}个文件")
-                    if send_file(file_path, textbox_position):
-                        contact_success += 1
+            try:
+                if journal:
+                    journal.begin(*key)
+                
+                # 搜索联系人
+                if not seek_for_contacts(chat_name):
+                    write_log(f"搜索联系人 {chat_name} 失败，跳过")
+                    print(f"\n搜索联系人 {chat_name} 失败，跳过")
+                    total_fail += len(message_info) + len(files_info)
+                    outcomes[chat_name] = 'failed'
+                    continue
+                if journal:
+                    journal.searched(*key)
+                
+                # 定位发送框
+                textbox_position = locate_wechat_elements()
+                
+                # 屏幕视觉识别：确认当前联系人
+                if not check_current_contact(chat_name):
+                    write_log(f"屏幕视觉识别：当前联系人不是 {chat_name}，跳过")
+                    print(f"\n屏幕视觉识别：当前联系人不是 {chat_name}，跳过")
+                    total_fail += len(message_info) + len(files_info)
+                    outcomes[chat_name] = 'failed'
+                    continue
+                
+                # 屏幕视觉识别：检查是否已经发送过消息（中断续发时以发送日志为准）
+                if messages and not progress:
+                    for message in messages:
+                        if check_message_sent(chat_name, message):
+                            write_log(f"屏幕视觉识别：已给联系人 {chat_name} 发送过相同消息，跳过")
+                            print(f"\n屏幕视觉识别：已给联系人 {chat_name} 发送过相同消息，跳过")
+                            skipped_contacts += 1
+                            outcomes[chat_name] = 'skipped'
+                            continue_flag = True
+                            break
                     else:
-                        contact_fail += 1
-            
-            # 更新总统计
-            total_success += contact_success
-            total_fail += contact_fail
-            
-            # 如果发送成功，记录到已发送列表
-            if contact_success > 0:
-                sent_contacts.add(chat_name)
-                try:
-                    with open(SENT_RECORDS_FILE, 'a', encoding='utf-8') as f:
-                        f.write(f"{chat_name}\n")
-                    write_log(f"已记录联系人 {chat_name} 到发送记录")
-                except Exception as e:
-                    write_log(f"记录发送状态失败: {e}", "WARNING")
-            
-            write_log(f"=== 联系人 {chat_name} 发送完成 ===")
-            write_log(f"当前联系人发送数: {contact_success + contact_fail}")
-            write_log(f"当前联系人成功数: {contact_success}")
-            write_log(f"当前联系人失败数: {contact_fail}")
-            
-            print(f"\n联系人 {chat_name} 发送完成！")
-            print(f"发送数: {contact_success + contact_fail}")
-            print(f"成功数: {contact_success}")
-            print(f"失败数: {contact_fail}")
-            print('\n')
-            
+                        continue_flag = False
+                    
+                    if continue_flag:
+                        continue
+                
+                # 统计当前联系人的发送结果
+                contact_success = 0
+                contact_fail = 0
+                
+                # 发送消息
+                if messages:
+                    write_log(f"开始发送{len(messages)}条消息")
+                    for i, message in enumerate(messages, 1):
+                        if progress and progress.completed('message', i):
+                            write_log(f"第{i}条消息在上次运行中已发送，跳过")
+                            contact_success += 1
+                            continue
+                        write_log(f"发送第{i}条消息")
+                        pacer.acquire('message')
+                        if journal:
+                            journal.start(*key, 'message', i)
+                        sent = send_message(message, textbox_position)
+                        pacer.record('message', sent)
+                        if journal:
+                            (journal.sent if sent else journal.failed)(*key, 'message', i)
+                        if sent:
+                            contact_success += 1
+                        else:
+                            contact_fail += 1
+                
+                # 发送文件
+                if files_info:
+                    write_log(f"开始发送{len(files_info)}个文件")
+                    pending_files = []
+                    for i, info in enumerate(plan.files, 1):
+                        if progress and progress.completed('file', i):
+                            write_log(f"第{i}个文件在上次运行中已发送，跳过")
+                            contact_success += 1
+                        elif info.problem:
+                            write_log(f"文件 {info.path} {info.problem}，跳过", "WARNING")
+                            contact_fail += 1
+                        else:
+                            pending_files.append((i, info.path, info.size))
+                    
+                    # 批量模式：全部文件一次粘贴发送，不支持时退回逐个文件的对话框流程
+                    files_paced = False
+                    if FILE_SEND_MODE == 'bulk' and pending_files:
+                        pacer.acquire('file', len(pending_files))
+                        files_paced = True
+                        if journal:
+                            for i, _, _ in pending_files:
+                                journal.start(*key, 'file', i)
+                        sent = send_files_bulk([path for _, path, _ in pending_files], textbox_position,
+                                               sum(size for _, _, size in pending_files))
+                        if sent is not None:
+                            pacer.record('file', sent)
+                            if journal:
+                                for i, _, _ in pending_files:
+                                    (journal.sent if sent else journal.failed)(*key, 'file', i)
+                            if sent:
+                                contact_success += len(pending_files)
+                            else:
+                                contact_fail += len(pending_files)
+                            pending_files = []
+                        elif journal:
+                            for i, _, _ in pending_files:
+                                journal.failed(*key, 'file', i)
+                    
+                    for i, file_path, size in pending_files:
+                        write_log(f"发送第{i}个文件")
+                        if not files_paced:
+                            pacer.acquire('file')
+                        if journal:
+                            journal.start(*key, 'file', i)
+                        sent = send_file(file_path, textbox_position, size)
+                        pacer.record('file', sent)
+                        if journal:
+                            (journal.sent if sent else journal.failed)(*key, 'file', i)
+                        if sent:
+                            contact_success += 1
+                        else:
+                            contact_fail += 1
+                
+                # 更新总统计
+                total_success += contact_success
+                total_fail += contact_fail
+                outcomes[chat_name] = 'sent' if contact_success > 0 else 'failed'
+                
+                # 发送全部确认成功，说明打开的是可以发送的聊天，记录本次未能确认的标题栏指纹
+                if contact_success > 0 and not contact_fail:
+                    try:
+                        if get_contact_verifier().learn(chat_name):
+                            write_log(f"已记录联系人 {chat_name} 的标题栏指纹")
+                    except Exception as e:
+                        write_log(f"记录联系人指纹失败: {e}", "WARNING")
+                
+                # 如果发送成功，记录到已发送列表
+                if contact_success > 0:
+                    sent_count += 1
+                    try:
+                        if records:
+                            records.mark_sent(campaign, chat_name, contact_payload)
+                        if journal:
+                            journal.done(*key)
+                        write_log(f"已记录联系人 {chat_name} 到发送记录")
+                    except Exception as e:
+                        write_log(f"记录发送状态失败: {e}", "WARNING")
+                
+                write_log(f"=== 联系人 {chat_name} 发送完成 ===")
+                write_log(f"当前联系人发送数: {contact_success + contact_fail}")
+                write_log(f"当前联系人成功数: {contact_success}")
+                write_log(f"当前联系人失败数: {contact_fail}")
+                
+                print(f"\n联系人 {chat_name} 发送完成！")
+                print(f"发送数: {contact_success + contact_fail}")
+                print(f"成功数: {contact_success}")
+                print(f"失败数: {contact_fail}")
+                print('\n')
+                
+            except Exception as e:
+                write_log(f"向联系人 {chat_name} 发送失败: {e}", "ERROR")
+                total_fail += len(message_info) + len(files_info)
+                outcomes[chat_name] = 'failed'
+                print(f"\n向联系人 {chat_name} 发送时发生错误: {e}")
+                print('\n')
+    
+    write_log(f"节奏统计: {pacer.summary()}")
+    update_progress(metrics, len(chat_list), total_success, total_fail, skipped_contacts)
+    
+    # 任务提交后落盘，后续任务中断时不会丢失本任务的记录；记录提交后整理发送日志
+    if records:
+        try:
+            records.commit()
+            if journal:
+                journal.checkpoint()
         except Exception as e:
-            write_log(f"向联系人 {chat_name} 发送失败: {e}", "ERROR")
-            total_fail += len(message_info) + len(files_info)
-            print(f"\n向联系人 {chat_name} 发送时发生错误: {e}")
-            print('\n')
+            write_log(f"保存发送记录失败: {e}", "WARNING")
     
-    # 微信上锁
-    write_log("执行微信上锁操作")
+    result = {
+        'campaign': campaign,
+        'contacts': len(chat_list),
+        'sent': sent_count,
+        'skipped': skipped_contacts,
+        'total': (len(chat_list) - skipped_contacts) * (len(message_info) + len(files_info)),
+        'success': total_success,
+        'fail': total_fail,
+        'outcomes': outcomes,
+    }
+    session['results'].append(result)
+    return result
+
+def report_result(result, title='全部发送任务完成'):
+    """输出发送结果统计"""
+    write_log(f"=== {title} ===")
+    write_log(f"总联系人: {result['contacts']}")
+    write_log(f"本次已发送联系人: {result['sent']}")
+    write_log(f"跳过联系人: {result['skipped']}")
+    write_log(f"总发送数: {result['total']}")
+    write_log(f"总成功数: {result['success']}")
+    write_log(f"总失败数: {result['fail']}")
+    
+    print(f"\n{title}！")
+    print(f"总联系人: {result['contacts']}")
+    print(f"本次已发送联系人: {result['sent']}")
+    print(f"跳过联系人: {result['skipped']}")
+    print(f"总发送数: {result['total']}")
+    print(f"总成功数: {result['success']}")
+    print(f"总失败数: {result['fail']}")
+    print(f"详细日志请查看: {LOG_FILE}")
+    print(f"发送记录库: {RECORDS_DB}")
+
+def preflight_files(files_info):
+    """文件预检：启动微信之前检查全部附件，有问题的文件在每个联系人中都不发送"""
+    if not files_info:
+        return
+    checked, problems = check_files(files_info)
+    for info in problems:
+        write_log(f"文件预检未通过：{info.path} {info.problem}，不会发送", "ERROR")
+        print(f"文件 {info.path} {info.problem}，不会发送")
+    total_size = sum(info.size for info in checked if not info.problem)
+    write_log(f"文件预检：{len(files_info)}个文件，共{total_size / 1024 / 1024:.1f}MB，{len(problems)}个不能发送")
+
+def main(chat_list, message_info, files_info, campaign=DEFAULT_CAMPAIGN, contact_fields=None):
+    """主函数：启动微信，执行一个发送任务后上锁
+
+    message_info 中可以包含 MessageTemplate，按 contact_fields 中该联系人的列逐个渲染。
+    """
+    write_log("=== 开始执行微信自动发送任务 ===")
+    preflight_files(files_info)
+    session = open_session()
     try:
-        win32api.keybd_event(17, 0, 0, 0)    # Ctrl
-        win32api.keybd_event(76, 0, 0, 0)    # L
-        win32api.keybd_event(17, 0, win32con.KEYEVENTF_KEYUP, 0)
-        win32api.keybd_event(76, 0, win32con.KEYEVENTF_KEYUP, 0)
-        write_log("微信已自动上锁")
-    except Exception as e:
-        write_log(f"微信上锁失败: {e}", "WARNING")
+        result = run_campaign(session, chat_list, message_info, files_info, campaign, contact_fields)
+    finally:
+        close_session(session)
     
     # 发送结果统计
-    total_count = (len(chat_list) - skipped_contacts) * (len(message_info) + len(files_info))
-    write_log(f"=== 全部发送任务完成 ===")
-    write_log(f"总联系人: {len(chat_list)}")
-    write_log(f"已发送联系人: {len(sent_contacts)}")
-    write_log(f"跳过联系人: {skipped_contacts}")
-    write_log(f"总发送数: {total_count}")
-    write_log(f"总成功数: {total_success}")
-    write_log(f"总失败数: {total_fail}")
-    
-    print(f"\n全部发送完成！")
-    print(f"总联系人: {len(chat_list)}")
-    print(f"已发送联系人: {len(sent_contacts)}")
-    print(f"跳过联系人: {skipped_contacts}")
-    print(f"总发送数: {total_count}")
-    print(f"总成功数: {total_success}")
-    print(f"总失败数: {total_fail}")
-    print(f"详细日志请查看: {LOG_FILE}")
-    print(f"发送记录文件: {SENT_RECORDS_FILE}")
+    report_result(result)
+    return result
 
 def schedule_send():
     """定时发送功能"""
@@ -739,8 +1140,11 @@ def schedule_send():
     print('\n')
     
     # 获取发送信息
-    chat_list = get_chat_list()
-    message_info = get_chat_message()
+    chat_list, contact_fields = get_chat_list()
+    columns = []
+    for fields in contact_fields.values():
+        columns.extend(c for c in fields if c not in columns)
+    message_info = get_chat_message(columns)
     files_info = get_file_path()
     
     # 定时设置
@@ -762,15 +1166,42 @@ def schedule_send():
             write_log(f"定时发送设置: {target_datetime.strftime('%Y-%m-%d %H:%M')}")
             print(f'\n将在 {target_datetime.strftime("%Y-%m-%d %H:%M")} 发送消息')
             print(f'等待 {wait_seconds:.0f} 秒...')
-            time.sleep(wait_seconds)
+            # 分段休眠并重新读取墙上时钟，电脑休眠后也能按时发送
+            sleep_until(target_datetime.timestamp())
         except Exception as e:
             write_log(f"定时设置失败: {e}", "ERROR")
             print("定时设置失败，将立即发送")
     
     # 执行发送
-    main(chat_list, message_info, files_info)
+    main(chat_list, message_info, files_info, contact_fields=contact_fields)
+
+def run_subcommand(argv):
+    """命令行子命令：同一个可执行文件提供批量发送和定时任务入口，不需要交互时不加载界面相关的模块
+
+        wechat_auto_send batch jobs.json [--check] [--no-lock]
+        wechat_auto_send schedule add|list|remove|run ...
+        wechat_auto_send shard run|worker|status ...
+
+    不是子命令时返回None，由调用方进入交互流程。
+    """
+    if not argv:
+        return None
+    if argv[0] == 'batch':
+        import wechat_batch
+        return wechat_batch.main(argv[1:])
+    if argv[0] == 'schedule':
+        import wechat_scheduler
+        return wechat_scheduler.main(argv[1:])
+    if argv[0] == 'shard':
+        import wechat_shard
+        return wechat_shard.main(argv[1:])
+    return None
+
 
 if __name__ == '__main__':
+    code = run_subcommand(sys.argv[1:])
+    if code is not None:
+        sys.exit(code)
     try:
         schedule_send()
     except Exception as e:
@@ -779,6 +1210,7 @@ if __name__ == '__main__':
         print(error_msg)
     finally:
         write_log("程序退出")
+        flush_logs()
         try:
             input('按任意键退出...')
         except:
@@ -0,0 +1,58 @@
+# -*- mode: python ; coding: utf-8 -*-
+# 单目录打包：pyinstaller wechat_auto_send_onedir.spec
+# 输出 dist/wechat_auto_send/，启动时不再把全部文件解压到临时目录；
+# 不使用UPX（启动时解压DLL较慢，也容易被杀毒软件误报），排除用不到的大型库。
+# 同一个可执行文件提供子命令：wechat_auto_send.exe batch jobs.json / schedule run
+
+
+a = Analysis(
+    ['wechat_auto_send.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[
+        # 科学计算、绘图和交互环境（opencv只需要numpy）
+        'matplotlib', 'scipy', 'pandas', 'IPython', 'jupyter', 'notebook',
+        # 其他GUI框架（只用tkinter选择文件）
+        'PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'wx', 'PIL.ImageQt',
+        # 打包和开发工具
+        'setuptools', 'pkg_resources', 'distutils', 'lib2to3', 'pytest', 'pydoc', 'pydoc_data',
+        # 标准库中用不到的部分
+        'test', 'tkinter.test', 'idlelib', 'xmlrpc', 'ftplib', 'turtle', 'turtledemo',
+    ],
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='wechat_auto_send',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='wechat_auto_send',
+)
@@ -0,0 +1,207 @@
+"""
+多任务批量发送
+
+从任务文件读取多个发送任务，在同一个微信会话中依次执行：微信只启动一次、
+最后只上锁一次，窗口跟踪器、元素定位器、联系人指纹和发送记录库在任务之间共用。
+所有任务在启动微信之前先完成校验（联系人文件、模板列名、待发送文件的存在和大小），
+任何一个任务有问题都不会开始发送。
+
+任务文件为JSON，相对路径相对于任务文件所在目录：
+
+    {
+      "wechat_path": "D:/WeChat/Weixin.exe",
+      "lock": true,
+      "pacing": {"message": {"rate": 20, "period": 60, "burst": 5}},
+      "campaigns": [
+        {"campaign": "双十一通知", "contacts": "customers.csv",
+         "messages": ["{name}您好，您的订单{订单号}已发货"], "files": ["说明.pdf"]},
+        {"campaign": "群发提醒", "contacts": ["张三", "李四"], "messages": ["明天开会"]}
+      ]
+    }
+
+用法：python wechat_batch.py jobs.json [--check] [--no-lock]
+"""
+import argparse
+import json
+import os
+import sys
+from collections import namedtuple
+
+from wechat_contacts import load_contacts, normalize_name
+from wechat_logger import flush_logs, write_log
+from wechat_preflight import check_files
+from wechat_records import DEFAULT_CAMPAIGN
+from wechat_template import TemplateError, compile_message, validate_messages
+
+# 一个发送任务：任务名、联系人列表、消息、文件、联系人 -> 该行各列
+Job = namedtuple('Job', ['campaign', 'chat_list', 'messages', 'files', 'contact_fields'])
+
+
+class BatchError(ValueError):
+    """任务文件格式错误或任务校验失败"""
+
+
+def _resolve(base_dir, path):
+    path = os.path.expanduser(path)
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def _load_job(spec, index, base_dir):
+    """校验并加载一个任务"""
+    if not isinstance(spec, dict):
+        raise BatchError(f"第{index}个任务不是JSON对象")
+    campaign = str(spec.get('campaign') or (DEFAULT_CAMPAIGN if index == 1 else f'{DEFAULT_CAMPAIGN}-{index}'))
+    label = f"任务 {campaign}"
+
+    # 联系人：文件路径或名称列表
+    contacts = spec.get('contacts')
+    contact_fields = {}
+    if isinstance(contacts, str):
+        path = _resolve(base_dir, contacts)
+        if not os.path.exists(path):
+            raise BatchError(f"{label}: 联系人文件不存在: {path}")
+        chat_list, contact_fields, issues, encoding, issue_count = load_contacts(path, spec.get('name_column'))
+        for issue in issues:
+            write_log(f"{label}: 联系人文件第{issue.line}行被跳过：{issue.reason}", "WARNING")
+        write_log(f"{label}: 从文件 {path} 读取{len(chat_list)}个联系人，使用编码 {encoding}，跳过{issue_count}行")
+    elif isinstance(contacts, list):
+        chat_list = []
+        for name in contacts:
+            name = normalize_name(str(name))
+            if name and name not in chat_list:
+                chat_list.append(name)
+    else:
+        raise BatchError(f"{label}: contacts 必须是联系人文件路径或名称列表")
+    if not chat_list:
+        raise BatchError(f"{label}: 联系人列表为空")
+
+    # 消息：编译模板并按联系人文件的列校验
+    messages = spec.get('messages', [])
+    if isinstance(messages, str):
+        messages = [messages]
+    try:
+        messages = [compile_message(str(m)) for m in messages]
+    except TemplateError as e:
+        raise BatchError(f"{label}: {e}")
+    columns = []
+    for fields in contact_fields.values():
+        columns.extend(c for c in fields if c not in columns)
+    missing = validate_messages(messages, columns)
+    if missing:
+        raise BatchError(f"{label}: 消息引用了联系人列表中不存在的列：{'、'.join(missing)}")
+
+    # 文件：必须都存在且在微信的大小限制内（在打开会话、启动微信之前检查）
+    files = [_resolve(base_dir, f) for f in spec.get('files', [])]
+    _, problems = check_files(files)
+    if problems:
+        raise BatchError(f"{label}: " + "；".join(f"文件 {info.path} {info.problem}" for info in problems))
+
+    if not messages and not files:
+        raise BatchError(f"{label}: 没有要发送的消息或文件")
+    return Job(campaign, chat_list, messages, files, contact_fields)
+
+
+def load_jobs(path):
+    """读取任务文件，返回 (任务列表, 选项字典)，任何任务校验失败都抛出BatchError"""
+    try:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BatchError(f"读取任务文件失败: {e}")
+    if isinstance(data, list):
+        data = {'campaigns': data}
+    specs = data.get('campaigns') if isinstance(data, dict) else None
+    if not specs:
+        raise BatchError("任务文件中没有任务（campaigns）")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = [_load_job(spec, i, base_dir) for i, spec in enumerate(specs, 1)]
+    names = [job.campaign for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise BatchError(f"任务名重复: {'、'.join(duplicates)}")
+
+    options = {
+        'wechat_path': _resolve(base_dir, data['wechat_path']) if data.get('wechat_path') else None,
+        'lock': bool(data.get('lock', True)),
+        'pacing': data.get('pacing'),
+    }
+    if options['pacing'] is not None and not isinstance(options['pacing'], dict):
+        raise BatchError("pacing 必须是 {类别: {rate, period, burst}} 形式的对象")
+    return jobs, options
+
+
+def merge_results(results):
+    """汇总多个任务的统计结果"""
+    total = {'campaign': '全部任务', 'contacts': 0, 'sent': 0, 'skipped': 0, 'total': 0, 'success': 0, 'fail': 0}
+    for result in results:
+        for key in ('contacts', 'sent', 'skipped', 'total', 'success', 'fail'):
+            total[key] += result[key]
+    return total
+
+
+def run_batch(jobs, wechat_path=None, lock=True, pacing=None):
+    """在一个微信会话中依次执行所有任务，返回每个任务的统计结果
+
+    某个任务出错只记录日志并继续下一个任务，会话结束时统一保存记录并上锁。
+    pacing 为限速设置（格式同 wechat_pacing.PACING_LIMITS），按类别覆盖默认限速，所有任务共用同一个限速器。
+    """
+    import wechat_auto_send as app
+    from wechat_pacing import get_pacer, load_limits
+
+    if pacing is not None:
+        get_pacer().configure(dict(load_limits(), **pacing))
+
+    write_log(f"=== 开始批量发送，共{len(jobs)}个任务 ===")
+    session = app.open_session(wechat_path)
+    try:
+        for index, job in enumerate(jobs, 1):
+            write_log(f"=== 批量任务 {index}/{len(jobs)}: {job.campaign} ===")
+            print(f"\n=== 任务 {index}/{len(jobs)}: {job.campaign}（{len(job.chat_list)}个联系人） ===")
+            try:
+                result = app.run_campaign(session, job.chat_list, job.messages, job.files,
+                                          job.campaign, job.contact_fields)
+            except Exception as e:
+                write_log(f"任务 {job.campaign} 执行失败: {e}", "ERROR")
+                print(f"任务 {job.campaign} 执行失败: {e}")
+                continue
+            app.report_result(result, f"任务 {job.campaign} 完成")
+    finally:
+        app.close_session(session, lock=lock)
+
+    results = session['results']
+    if len(results) > 1:
+        app.report_result(merge_results(results), "全部批量任务完成")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='按任务文件在同一个微信会话中批量发送')
+    parser.add_argument('jobs', help='任务文件（JSON）')
+    parser.add_argument('--check', action='store_true', help='只校验任务文件，不发送')
+    parser.add_argument('--no-lock', action='store_true', help='全部任务完成后不锁定微信')
+    args = parser.parse_args(argv)
+
+    try:
+        jobs, options = load_jobs(args.jobs)
+    except BatchError as e:
+        write_log(f"任务文件校验失败: {e}", "ERROR")
+        flush_logs()
+        return 1
+
+    for job in jobs:
+        print(f"任务 {job.campaign}: {len(job.chat_list)}个联系人，{len(job.messages)}条消息，{len(job.files)}个文件")
+    if args.check:
+        flush_logs()
+        return 0
+
+    try:
+        results = run_batch(jobs, options['wechat_path'], options['lock'] and not args.no_lock, options['pacing'])
+    finally:
+        write_log("程序退出")
+        flush_logs()
+    return 0 if len(results) == len(jobs) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
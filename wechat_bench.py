@@ -0,0 +1,679 @@
+"""
+发送流程吞吐量基准测试
+
+在模拟的微信界面状态机上运行 wechat_auto_send.main()，不需要真实登录的微信，
+可在Linux上运行。模拟界面覆盖搜索、打开聊天、粘贴、发送和文件对话框，
+各环节响应延迟可配置。时间使用模拟时钟推进，10万联系人也能在几分钟内跑完。
+
+输出每个步骤和每个联系人的耗时分位数、整个任务的模拟总时长，
+以及脚本本身的CPU开销（真实耗时），用于在正式运行前发现发送循环的吞吐量回退。
+
+用法：
+    python wechat_bench.py --sizes 10,100,1000 --messages 1 --files 1
+    python wechat_bench.py --sizes 100000 --policy fixed --json bench.json
+    python wechat_bench.py --startup      # 冷启动时长和最慢的导入
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+# 模拟微信界面的默认响应延迟（秒）
+DEFAULT_LATENCIES = {
+    'startup': 3.0,           # 微信启动到窗口出现
+    'clipboard': 0.01,        # 剪贴板写入生效
+    'search_open': 0.15,      # Ctrl+F 打开搜索框
+    'search_input': 0.05,     # 搜索框显示粘贴的内容
+    'chat_open': 0.4,         # Enter 打开搜索结果的聊天窗口
+    'paste': 0.05,            # 输入框显示粘贴的内容
+    'send': 0.2,              # Enter 发送后消息出现在聊天记录
+    'file_dialog': 0.5,       # Ctrl+O 打开文件对话框
+    'file_dialog_close': 0.3, # 对话框确认后关闭
+    'upload_per_mb': 0.05,    # 粘贴的文件发送时每MB的上传时间
+}
+
+# 统计的发送流程步骤
+BENCH_STEPS = [
+    'seek_for_contacts',
+    'locate_wechat_elements',
+    'check_current_contact',
+    'check_message_sent',
+    'send_message',
+    'send_file',
+    'send_files_bulk',
+]
+
+# 启动基准测试：各入口模块，启动时不应加载的界面/系统依赖，以及启动时长预算（秒）
+STARTUP_MODULES = ['wechat_auto_send', 'wechat_batch', 'wechat_scheduler']
+LAZY_MODULES = ['pyautogui', 'pyperclip', 'PIL', 'tkinter', 'cv2', 'numpy', 'win32gui', 'win32api', 'winreg']
+STARTUP_BUDGET = 1.0
+
+WECHAT_HWND = 1
+DIALOG_HWND = 2
+
+
+class SimClock:
+    """模拟时钟：sleep只推进模拟时间，不真正等待
+
+    speed 为倍速时同时按比例真实等待，例如 speed=50 表示模拟50秒真实等待1秒，
+    用于多进程模拟中让各进程的进度与真实时间对应。
+    """
+
+    def __init__(self, speed=None):
+        self.now = 0.0
+        self.speed = speed
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+            if self.speed:
+                time.sleep(seconds / self.speed)
+
+
+class FakeImage:
+    """模拟截图，只提供发送流程用到的接口"""
+
+    def __init__(self, data):
+        self._data = data
+
+    def tobytes(self):
+        return self._data
+
+    def __array__(self, dtype=None, copy=None):
+        # 由画面内容确定的伪随机灰度图：内容相同则像素相同
+        import zlib
+        import numpy as np
+        rng = np.random.default_rng(zlib.crc32(self._data))
+        return rng.integers(0, 256, (60, 200), dtype=np.uint8).astype(dtype or np.uint8)
+
+    def save(self, path):
+        pass
+
+
+class FakeWindow:
+    """模拟的微信窗口"""
+
+    def __init__(self, wechat):
+        self._wechat = wechat
+        self.title = '微信'
+
+    left = property(lambda self: self._wechat.rect[0])
+    top = property(lambda self: self._wechat.rect[1])
+    width = property(lambda self: self._wechat.rect[2])
+    height = property(lambda self: self._wechat.rect[3])
+
+    @property
+    def isActive(self):
+        return self._wechat.foreground == WECHAT_HWND
+
+    def activate(self):
+        self._wechat.foreground = WECHAT_HWND
+
+
+class FakeWeChat:
+    """模拟的微信界面状态机
+
+    状态：chat（聊天窗口）、search（搜索框已打开）、dialog（文件对话框已打开）、locked（已上锁）。
+    按键由记录输入驱动的监听器送入，界面变化按配置的延迟在模拟时间上生效。
+    fail_rate 为输入框发送（Enter）失败的概率：输入框清空，但聊天记录不出现新消息。
+    """
+
+    def __init__(self, clock, latencies=None, jitter=0.0, seed=0, fail_rate=0.0):
+        self.clock = clock
+        self.latencies = dict(DEFAULT_LATENCIES)
+        self.latencies.update(latencies or {})
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.rect = (100, 100, 1000, 800)
+        self.state = 'chat'
+        self.running = False
+        self.foreground = WECHAT_HWND
+        self.current_chat = None
+        self.query = ''
+        self.input_text = ''
+        self.input_files = ()
+        self.dialog_path = ''
+        self.sent_messages = []
+        self.sent_files = []
+        self.failed_sends = 0
+        self.versions = {'search': 0, 'chat': 0, 'input': 0}
+        self._clipboard = ''
+        self._events = []
+
+    # ---------- 时间推进 ----------
+
+    def _delay(self, name):
+        base = self.latencies[name]
+        if self.jitter:
+            base *= 1 + self.random.uniform(-self.jitter, self.jitter)
+        return max(base, 0.0)
+
+    def _schedule(self, name, action):
+        """action在延迟后生效，返回生效的时间点"""
+        due = self.clock.now + self._delay(name)
+        self._events.append((due, action))
+        return due
+
+    def _apply_due(self):
+        # 事件只在下一次截图或按键时才执行；执行中安排的后续事件按原本的时间点计算，已到期的一并执行
+        now = self.clock.now
+        while self._events:
+            due = [e for e in self._events if e[0] <= now]
+            if not due:
+                return
+            self._events = [e for e in self._events if e[0] > now]
+            for _, action in sorted(due, key=lambda e: e[0]):
+                action()
+
+    # ---------- 微信进程 ----------
+
+    def launch(self, wechat_path):
+        def ready():
+            self.running = True
+            self.foreground = WECHAT_HWND
+        self._schedule('startup', ready)
+        # 与真实启动流程一样等待窗口就绪
+        from wechat_wait import wait_until
+        wait_until(lambda: self._apply_due() or self.running, self.latencies['startup'] * 3)
+
+    # ---------- 按键 ----------
+
+    def on_hotkey(self, name):
+        self._apply_due()
+        if self.state == 'locked':
+            return
+        if name == 'ctrl+l':
+            self.state = 'locked'
+        elif name == 'ctrl+f' and self.state == 'chat':
+            def open_search():
+                self.state = 'search'
+                self.query = ''
+                self.versions['search'] += 1
+            self._schedule('search_open', open_search)
+        elif name == 'ctrl+o' and self.state == 'chat':
+            def open_dialog():
+                self.state = 'dialog'
+                self.dialog_path = ''
+                self.foreground = DIALOG_HWND
+            self._schedule('file_dialog', open_dialog)
+        elif name == 'ctrl+v':
+            text = self._clipboard
+            if isinstance(text, tuple):
+                # 文件列表只能粘贴到聊天输入框
+                if self.state == 'chat':
+                    def attached():
+                        self.input_files += text
+                        self.versions['input'] += 1
+                    self._schedule('paste', attached)
+            elif self.state == 'search':
+                def typed():
+                    self.query = text
+                    self.versions['search'] += 1
+                self._schedule('search_input', typed)
+            elif self.state == 'dialog':
+                self.dialog_path = text
+            elif self.state == 'chat':
+                def pasted():
+                    self.input_text += text
+                    self.versions['input'] += 1
+                self._schedule('paste', pasted)
+        elif name == 'enter':
+            if self.state == 'search':
+                query = self.query
+
+                def open_chat():
+                    self.state = 'chat'
+                    self.versions['search'] += 1
+                    if query != self.current_chat:
+                        self.current_chat = query
+                        self.versions['chat'] += 1
+                self._schedule('chat_open', open_chat)
+            elif self.state == 'dialog':
+                path = self.dialog_path
+
+                def close_dialog():
+                    self.state = 'chat'
+                    self.foreground = WECHAT_HWND
+
+                    # 对话框关闭后开始上传（从关闭的时间点算起），上传完成时文件出现在聊天记录
+                    def uploaded():
+                        self.sent_files.append((chat, path))
+                        self.versions['chat'] += 1
+                    chat = self.current_chat
+                    size = os.path.getsize(path) if os.path.exists(path) else 0
+                    upload = self.latencies['upload_per_mb'] * size / (1024 * 1024)
+                    self._events.append((closed + self._delay('send') + upload, uploaded))
+                closed = self._schedule('file_dialog_close', close_dialog)
+            elif self.state == 'chat' and (self.input_text or self.input_files):
+                text = self.input_text
+                files = self.input_files
+
+                def sent():
+                    self.input_text = ''
+                    self.input_files = ()
+                    self.versions['input'] += 1
+                    if self.fail_rate and self.random.random() < self.fail_rate:
+                        # 发送失败：输入框已清空，但聊天记录没有出现新消息
+                        self.failed_sends += 1
+                        return
+                    if text:
+                        self.sent_messages.append((self.current_chat, text))
+                    self.sent_files.extend((self.current_chat, path) for path in files)
+                    self.versions['chat'] += 1
+                size = sum(os.path.getsize(path) for path in files if os.path.exists(path))
+                upload = self.latencies['upload_per_mb'] * size / (1024 * 1024)
+                self._events.append((self.clock.now + self._delay('send') + upload, sent))
+
+    # ---------- 剪贴板（模拟pyperclip） ----------
+
+    def copy(self, text):
+        def written():
+            self._clipboard = text
+        self._schedule('clipboard', written)
+
+    def paste(self):
+        self._apply_due()
+        return self._clipboard
+
+    def set_clipboard(self, content):
+        """内存剪贴板的监听器：原生剪贴板写入是同步的，立即生效；content为文本或文件路径元组"""
+        self._clipboard = content
+
+    # ---------- 屏幕与窗口（模拟pyautogui / win32gui） ----------
+
+    def get_windows_with_title(self, title):
+        self._apply_due()
+        if self.running and title in '微信':
+            return [FakeWindow(self)]
+        return []
+
+    def screenshot(self, region=None):
+        self._apply_due()
+        left, top, width, height = self.rect
+        if region is None:
+            data = repr((self.state, self.versions))
+        elif region[1] == top and region[3] <= 60 and region[0] >= left + width // 3:
+            data = repr(('title', self.current_chat))
+        elif region[1] >= top + height - 150:
+            data = repr(('input', region, self.versions['input']))
+        elif region[0] + region[2] <= left + width // 3:
+            data = repr(('search', region, self.versions['search']))
+        else:
+            data = repr(('chat', region, self.versions['chat']))
+        return FakeImage(data.encode('utf-8'))
+
+    def get_foreground_window(self):
+        self._apply_due()
+        return self.foreground
+
+    def get_window_text(self, hwnd):
+        return {WECHAT_HWND: '微信', DIALOG_HWND: '打开'}.get(hwnd, '')
+
+    def modules(self):
+        """模拟的界面相关模块，替换 pyautogui / pyperclip / win32gui"""
+        fake_pyautogui = types.ModuleType('pyautogui')
+        fake_pyautogui.getWindowsWithTitle = self.get_windows_with_title
+        fake_pyautogui.screenshot = self.screenshot
+        fake_pyautogui.size = lambda: (1920, 1080)
+        fake_pyautogui.moveTo = lambda *args, **kwargs: None
+        fake_pyautogui.click = lambda *args, **kwargs: self._apply_due()
+
+        fake_pyperclip = types.ModuleType('pyperclip')
+        fake_pyperclip.copy = self.copy
+        fake_pyperclip.paste = self.paste
+
+        fake_win32gui = types.ModuleType('win32gui')
+        fake_win32gui.GetForegroundWindow = self.get_foreground_window
+        fake_win32gui.GetWindowText = self.get_window_text
+
+        return {'pyautogui': fake_pyautogui, 'pyperclip': fake_pyperclip, 'win32gui': fake_win32gui}
+
+
+class StepRecorder:
+    """包装发送流程的各步骤，按模拟时钟记录耗时"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.steps = {name: [] for name in BENCH_STEPS}
+        self.contacts = []
+        self._contact_start = None
+
+    def wrap(self, name, func):
+        def wrapper(*args, **kwargs):
+            if name == 'seek_for_contacts':
+                self.finish_contact()
+                self._contact_start = self.clock.now
+            start = self.clock.now
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.steps[name].append(self.clock.now - start)
+        return wrapper
+
+    def finish_contact(self):
+        if self._contact_start is not None:
+            self.contacts.append(self.clock.now - self._contact_start)
+            self._contact_start = None
+
+
+def percentiles(values):
+    """计算 p50 / p90 / p99 / max / mean"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    n = len(ordered)
+
+    def pick(q):
+        return ordered[min(n - 1, int(q * n))]
+    return {
+        'count': n,
+        'mean': sum(ordered) / n,
+        'p50': pick(0.50),
+        'p90': pick(0.90),
+        'p99': pick(0.99),
+        'max': ordered[-1],
+    }
+
+
+@contextlib.contextmanager
+def simulated_wechat(fake, clock, pacing=True):
+    """在模拟界面上下文中导入并打补丁主脚本，退出时恢复
+
+    pacing 为 True 时使用默认限速（与实际发送相同），为 False 时不限速，也可以传入按类别覆盖默认限速的字典。
+    """
+    import wechat_capture
+    import wechat_clipboard
+    import wechat_input
+    import wechat_metrics
+    import wechat_pacing
+    import wechat_preflight
+    import wechat_window
+    import wechat_wait
+
+    saved_modules = {}
+    for name, module in fake.modules().items():
+        saved_modules[name] = sys.modules.get(name)
+        sys.modules[name] = module
+
+    wechat_capture.set_capture_source(None)
+    wechat_wait.set_clock(clock.time, clock.sleep)
+    wechat_input.set_input_driver(wechat_input.RecordingInputDriver(listener=fake.on_hotkey))
+    wechat_clipboard.set_clipboard(wechat_clipboard.MemoryClipboard(listener=fake.set_clipboard))
+    limits = {} if pacing is False else (None if pacing is True else dict(wechat_pacing.PACING_LIMITS, **pacing))
+    wechat_pacing.set_pacer(wechat_pacing.Pacer(limits, clock=clock.time, sleep=clock.sleep))
+    wechat_metrics.set_metrics(wechat_metrics.Metrics(clock=clock.time))
+    # 文件缓存和实测上传速度从当前目录重新加载，各次运行互不影响
+    wechat_preflight.set_file_cache(None)
+    try:
+        app = importlib.import_module('wechat_auto_send')
+        saved_attrs = {name: getattr(app, name) for name in
+                       ['get_wechat_path', 'launch_wechat'] + BENCH_STEPS}
+        app.get_wechat_path = lambda: 'Weixin.exe'
+        app.launch_wechat = fake.launch
+        app._contact_verifier = None
+        wechat_window.set_window_tracker(None)
+        try:
+            yield app
+        finally:
+            for name, value in saved_attrs.items():
+                setattr(app, name, value)
+    finally:
+        wechat_wait.set_clock()
+        wechat_input.set_input_driver(None)
+        wechat_clipboard.set_clipboard(None)
+        wechat_pacing.set_pacer(None)
+        wechat_metrics.set_metrics(None)
+        wechat_preflight.set_file_cache(None)
+        for name, module in saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+def run_benchmark(size, messages=1, files=0, latencies=None, jitter=0.0, policy='condition', seed=0,
+                  personalized=False, pacing=True, file_mode='bulk', file_size=100 * 1024, fail_rate=0.0):
+    """在模拟微信上执行一次完整发送任务，返回统计结果
+
+    file_mode 为 'bulk'（一次粘贴全部文件）或 'dialog'（逐个文件通过对话框发送），
+    file_size 为每个附件的字节数，附件在临时目录中真实创建；fail_rate 见 FakeWeChat。
+    """
+    import wechat_logger
+    import wechat_metrics
+    import wechat_pacing
+    import wechat_template
+    import wechat_wait
+
+    clock = SimClock()
+    fake = FakeWeChat(clock, latencies, jitter, seed, fail_rate)
+    recorder = StepRecorder(clock)
+    chat_list = [f'联系人{i:06d}' for i in range(size)]
+    message_info = [f'测试消息{i}' for i in range(1, messages + 1)]
+    contact_fields = None
+    if personalized:
+        # 个性化模板：每个联系人按列渲染
+        message_info = [wechat_template.compile_message(f'{{name}}您好，订单{{订单号}}的测试消息{i}')
+                        for i in range(1, messages + 1)]
+        contact_fields = {name: {'订单号': f'NO{i:08d}'} for i, name in enumerate(chat_list)}
+    old_policy = wechat_wait.WAIT_POLICY
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w', encoding='utf-8') as devnull:
+        os.chdir(workdir)
+        files_info = []
+        for i in range(1, files + 1):
+            path = os.path.join(workdir, f'附件{i}.pdf')
+            with open(path, 'wb') as f:
+                f.truncate(file_size)
+            files_info.append(path)
+        try:
+            wechat_logger.configure_logging(os.path.join(workdir, wechat_logger.LOG_FILE), console=False)
+            wechat_wait.set_wait_policy(policy)
+            with simulated_wechat(fake, clock, pacing) as app:
+                old_file_mode = app.FILE_SEND_MODE
+                app.FILE_SEND_MODE = file_mode
+                for name in BENCH_STEPS:
+                    setattr(app, name, recorder.wrap(name, getattr(app, name)))
+                real_start = time.perf_counter()
+                with contextlib.redirect_stdout(devnull):
+                    app.main(chat_list, message_info, files_info, contact_fields=contact_fields)
+                real_elapsed = time.perf_counter() - real_start
+                recorder.finish_contact()
+                pacing_stats = wechat_pacing.get_pacer().stats() if pacing else None
+                metrics = wechat_metrics.get_metrics().snapshot()
+                app.FILE_SEND_MODE = old_file_mode
+        finally:
+            wechat_logger.shutdown_logging()
+            wechat_wait.set_wait_policy(old_policy)
+            os.chdir(old_cwd)
+
+    total = clock.now
+    return {
+        'size': size,
+        'messages': messages,
+        'files': files,
+        'file_mode': file_mode if files else None,
+        'policy': policy,
+        'personalized': personalized,
+        'pacing': pacing_stats,
+        'campaign_seconds': total,
+        'contacts_per_hour': size * 3600 / total if total else None,
+        'real_seconds': real_elapsed,
+        'overhead_ms_per_contact': real_elapsed * 1000 / size if size else None,
+        'delivered_messages': len(fake.sent_messages),
+        'delivered_files': len(fake.sent_files),
+        'failed_sends': fake.failed_sends,
+        'per_contact': percentiles(recorder.contacts),
+        'steps': {name: percentiles(values) for name, values in recorder.steps.items() if values},
+        'metrics': metrics,
+    }
+
+
+def format_duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rest, 60)
+    return f'{hours}h{minutes:02d}m{secs:02d}s'
+
+
+def print_report(result):
+    print(f"=== 联系人数: {result['size']}  消息数: {result['messages']}  文件数: {result['files']}  等待策略: {result['policy']}"
+          + (f"  文件发送: {result['file_mode']}" if result['file_mode'] else "")
+          + ("  个性化模板" if result['personalized'] else "")
+          + ("" if result['pacing'] else "  不限速") + " ===")
+    print(f"模拟总时长: {format_duration(result['campaign_seconds'])} ({result['campaign_seconds']:.1f}s)")
+    print(f"吞吐量: {result['contacts_per_hour']:.0f} 联系人/小时")
+    print(f"送达: 消息 {result['delivered_messages']}，文件 {result['delivered_files']}"
+          + (f"，模拟发送失败 {result['failed_sends']}" if result['failed_sends'] else ""))
+    if result['pacing']:
+        print(f"节奏控制: 降速倍数 {result['pacing']['slowdown']:g}，"
+              + "，".join(f"{kind} 等待{info['waits']}次共{info['waited']:.0f}s"
+                         for kind, info in result['pacing'].items() if kind != 'slowdown'))
+    print(f"脚本开销: 真实耗时 {result['real_seconds']:.2f}s，每联系人 {result['overhead_ms_per_contact']:.2f}ms")
+    print(f"{'步骤':<24}{'次数':>8}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    rows = [('per_contact', result['per_contact'])] + list(result['steps'].items())
+    for name, stats in rows:
+        if not stats:
+            continue
+        print(f"{name:<24}{stats['count']:>8}{stats['mean']:>9.3f}{stats['p50']:>9.3f}"
+              f"{stats['p90']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}")
+    print()
+
+
+def _time_command(command, runs):
+    """运行命令runs次（先运行一次预热，生成字节码缓存），返回每次的真实耗时"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _parse_importtime(output):
+    """解析 -X importtime 的输出，返回 [(模块名, 自身耗时ms, 累计耗时ms), ...]"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+        except ValueError:
+            # 表头行
+            continue
+    return modules
+
+
+def measure_startup(target, runs=10, command=None, top=5):
+    """测量冷启动时长
+
+    target 为入口模块名时测量 python -c "import 模块" 的耗时，并用 -X importtime 找出最慢的导入、
+    检查启动时是否加载了应当懒加载的模块；传入 command 时只测量该命令（例如打包后的可执行文件）。
+    """
+    if command is None:
+        command = [sys.executable, '-c', f'import {target}']
+    elif isinstance(command, str):
+        command = shlex.split(command, posix=os.name != 'nt')
+    times = sorted(_time_command(command, runs))
+    result = {
+        'target': target,
+        'runs': runs,
+        'median': times[len(times) // 2],
+        'min': times[0],
+        'max': times[-1],
+        'budget': STARTUP_BUDGET,
+        'slowest_imports': [],
+        'eager_modules': [],
+    }
+    if command[:2] == [sys.executable, '-c']:
+        output = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                encoding='utf-8', errors='replace').stderr
+        modules = _parse_importtime(output)
+        result['slowest_imports'] = [(name, ms) for name, ms, _ in sorted(modules, key=lambda m: -m[1])[:top]]
+        result['eager_modules'] = sorted({name.split('.')[0] for name, _, _ in modules} & set(LAZY_MODULES))
+    return result
+
+
+def print_startup_report(result):
+    verdict = '通过' if result['median'] <= result['budget'] else '超出预算'
+    print(f"=== 启动: {result['target']}  {result['runs']}次 ===")
+    print(f"中位数 {result['median']:.3f}s（最小 {result['min']:.3f}s，最大 {result['max']:.3f}s），"
+          f"预算 {result['budget']:g}s：{verdict}")
+    if result['slowest_imports']:
+        print("最慢的导入: " + "，".join(f"{name} {ms:.1f}ms" for name, ms in result['slowest_imports']))
+    if result['eager_modules']:
+        print("警告：启动时加载了应当懒加载的模块: " + "、".join(result['eager_modules']))
+    print()
+
+
+def parse_latencies(items):
+    latencies = {}
+    for item in items or []:
+        name, _, value = item.partition('=')
+        if name not in DEFAULT_LATENCIES:
+            raise SystemExit(f'未知的延迟项: {name}，可选: {", ".join(DEFAULT_LATENCIES)}')
+        latencies[name] = float(value)
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='微信自动发送吞吐量基准测试（模拟微信）')
+    parser.add_argument('--sizes', default='10,100,1000', help='联系人数量列表，逗号分隔（10 ~ 100000）')
+    parser.add_argument('--messages', type=int, default=1, help='每个联系人发送的消息数')
+    parser.add_argument('--files', type=int, default=0, help='每个联系人发送的文件数')
+    parser.add_argument('--policy', choices=['condition', 'fixed'], default='condition', help='等待策略')
+    parser.add_argument('--latency', action='append', metavar='NAME=SECONDS', help='覆盖模拟界面的响应延迟')
+    parser.add_argument('--jitter', type=float, default=0.0, help='延迟随机抖动比例，例如0.2表示±20%%')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--personalized', action='store_true', help='使用个性化消息模板')
+    parser.add_argument('--file-mode', choices=['bulk', 'dialog'], default='bulk', help='文件发送方式')
+    parser.add_argument('--file-size', type=int, default=100, help='每个附件的大小（KB）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='模拟Enter发送失败的概率，例如0.05')
+    parser.add_argument('--no-pacing', action='store_true', help='不限速（默认按 wechat_pacing.PACING_LIMITS 限速，与实际发送相同）')
+    parser.add_argument('--startup', action='store_true', help='测量各入口模块的冷启动时长，不运行发送流程')
+    parser.add_argument('--startup-cmd', action='append', metavar='CMD',
+                        help='测量该命令的启动时长，例如打包后的 "dist\\wechat_auto_send\\wechat_auto_send.exe schedule list"')
+    parser.add_argument('--startup-runs', type=int, default=10, help='启动测量的次数')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.startup or args.startup_cmd:
+        targets = [(name, None) for name in STARTUP_MODULES] if args.startup else []
+        targets += [(command, command) for command in args.startup_cmd or []]
+        for target, command in targets:
+            result = measure_startup(target, args.startup_runs, command)
+            print_startup_report(result)
+            results.append(result)
+    else:
+        latencies = parse_latencies(args.latency)
+        for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+            result = run_benchmark(size, args.messages, args.files, latencies, args.jitter, args.policy, args.seed,
+                                   args.personalized, not args.no_pacing, args.file_mode, args.file_size * 1024,
+                                   args.fail_rate)
+            print_report(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
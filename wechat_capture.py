@@ -0,0 +1,190 @@
+"""
+区域截图子系统
+
+只截取由微信窗口位置推算出的区域（标题栏、聊天记录、输入框），
+不再每个联系人截两次全屏并写PNG。每个命名区域的帧保存在可复用的缓冲区中，
+调试截图默认关闭，开启后按采样率在后台线程中写盘。
+
+- ScreenCaptureSource：真实屏幕
+- FileCaptureSource：从保存的截图文件中裁剪，可在Linux上测试
+"""
+import os
+import queue
+import random
+import threading
+import time
+
+# 调试截图目录
+DEBUG_DIR = 'debug_screenshots'
+
+
+# ---------------- 区域推算 ----------------
+# rect 为微信窗口 (left, top, width, height)，返回 (left, top, width, height)
+
+def title_region(rect):
+    """聊天标题栏区域：窗口右侧顶部，显示当前联系人名称"""
+    left, top, width, height = rect
+    return (left + width // 3, top, width - width // 3, 60)
+
+
+def search_region(rect):
+    """搜索框区域：窗口左侧顶部"""
+    left, top, width, height = rect
+    return (left, top, width // 3, 80)
+
+
+def chat_region(rect):
+    """聊天记录区域：窗口右侧，标题栏与输入框之间"""
+    left, top, width, height = rect
+    return (left + width // 3, top + 60, width - width // 3, max(height - 230, 1))
+
+
+def input_region(rect):
+    """输入框区域：窗口右侧底部"""
+    left, top, width, height = rect
+    return (left + width // 3, top + height - 150, width - width // 3, 150)
+
+
+# ---------------- 截图源 ----------------
+
+class ScreenCaptureSource:
+    """屏幕截图源：只截取指定区域"""
+
+    def grab(self, region):
+        import pyautogui
+        return pyautogui.screenshot(region=tuple(int(v) for v in region))
+
+
+class FileCaptureSource:
+    """文件截图源：从保存的截图中裁剪区域
+
+    paths 为一个或多个截图文件，origin 为截图左上角对应的屏幕坐标。
+    每次调用 advance() 切换到下一张截图，用于模拟界面变化。
+    """
+
+    def __init__(self, paths, origin=(0, 0)):
+        from PIL import Image
+        if isinstance(paths, str):
+            paths = [paths]
+        self.frames = [Image.open(path).convert('RGB') for path in paths]
+        self.origin = origin
+        self.index = 0
+
+    def advance(self):
+        self.index = min(self.index + 1, len(self.frames) - 1)
+
+    def grab(self, region):
+        left, top, width, height = region
+        x = left - self.origin[0]
+        y = top - self.origin[1]
+        return self.frames[self.index].crop((x, y, x + width, y + height))
+
+
+# ---------------- 帧缓冲 ----------------
+
+class FrameBuffers:
+    """按区域名复用的帧缓冲
+
+    同一区域尺寸不变时复用同一块内存，返回的数组在下次截取同名区域时会被覆盖，
+    需要保留时请自行copy()。
+    """
+
+    def __init__(self, source=None):
+        self.source = source
+        self._buffers = {}
+
+    def capture(self, name, region):
+        import numpy as np
+        source = self.source or get_capture_source()
+        frame = np.asarray(source.grab(region))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+            buffer = self._buffers[name] = np.empty_like(frame)
+        np.copyto(buffer, frame)
+        return buffer
+
+    def last(self, name):
+        """最近一次截取的帧，没有时返回None"""
+        return self._buffers.get(name)
+
+
+# ---------------- 调试截图 ----------------
+
+class DebugDumper:
+    """调试截图：默认关闭，按采样率在后台线程写PNG，写不过来时直接丢弃"""
+
+    def __init__(self, directory=DEBUG_DIR, sample_rate=0.0, max_pending=8):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def maybe_dump(self, name, frame):
+        """按采样率提交一帧，返回是否提交"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait((name, frame.copy(), time.time()))
+        except queue.Full:
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='wechat-debug-dump', daemon=True)
+            self._thread.start()
+        return True
+
+    def _run(self):
+        from PIL import Image
+        while True:
+            name, frame, timestamp = self._queue.get()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(timestamp))
+                path = os.path.join(self.directory, f"{name}_{stamp}_{int(timestamp * 1000) % 1000:03d}.png")
+                Image.fromarray(frame).save(path)
+            except Exception:
+                pass
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """等待已提交的调试截图写完"""
+        self._queue.join()
+
+
+_source = None
+_buffers = FrameBuffers()
+_dumper = DebugDumper()
+
+
+def get_capture_source():
+    """获取当前截图源，默认真实屏幕"""
+    global _source
+    if _source is None:
+        _source = ScreenCaptureSource()
+    return _source
+
+
+def set_capture_source(source):
+    """设置截图源，传入None恢复真实屏幕"""
+    global _source
+    _source = source
+
+
+def capture_region(name, region):
+    """截取命名区域到复用缓冲区"""
+    return _buffers.capture(name, region)
+
+
+def configure_debug_dumps(sample_rate=0.0, directory=DEBUG_DIR):
+    """开启调试截图：sample_rate为采样比例（0关闭，1每次都保存）"""
+    _dumper.sample_rate = sample_rate
+    _dumper.directory = directory
+
+
+def dump_debug(name, frame):
+    """按配置的采样率异步保存调试截图"""
+    return _dumper.maybe_dump(name, frame)
@@ -0,0 +1,236 @@
+"""
+剪贴板后端：写入后立即确认，粘贴前不再固定等待
+
+- Win32Clipboard：通过ctypes直接调用Win32剪贴板API。先在剪贴板外准备好全局内存，
+  打开剪贴板后只做清空和设置数据，立即关闭；用剪贴板序列号确认写入已生效
+- PyperclipClipboard：非Windows平台的兜底方案，写入后读回比较确认
+- MemoryClipboard：内存中的剪贴板，用于Linux上的测试和基准测试
+
+copy(text) 返回写入后的序列号，无法确认时返回None，调用方再退回到轮询读回。
+copy_files(paths) 把多个文件作为一个文件列表（CF_HDROP）写入剪贴板，
+粘贴到微信输入框即可一次发送；后端不支持时返回None，调用方退回逐个文件的对话框流程。
+"""
+import os
+import struct
+import sys
+import time
+
+CF_UNICODETEXT = 13
+CF_HDROP = 15
+GMEM_MOVEABLE = 0x0002
+DROPEFFECT_COPY = 1
+# DROPFILES结构：pFiles（路径列表的偏移）, pt.x, pt.y, fNC, fWide（路径为宽字符）
+DROPFILES_FORMAT = '<IiiII'
+DROPFILES_SIZE = struct.calcsize(DROPFILES_FORMAT)
+
+# 剪贴板被其他程序占用时的重试次数和间隔（秒）
+OPEN_RETRIES = 10
+OPEN_RETRY_DELAY = 0.01
+
+
+class ClipboardError(OSError):
+    """剪贴板无法打开或写入"""
+
+
+def written_sequence(before, after):
+    """写入前后的剪贴板序列号：序列号变化说明写入已生效，返回新序列号；
+    没有变化或为0（无权访问剪贴板）时返回None，调用方退回轮询读回"""
+    if after and after != before:
+        return after
+    return None
+
+
+def build_dropfiles(paths):
+    """文件列表（CF_HDROP）的数据：DROPFILES结构之后是宽字符绝对路径，每个路径以空字符结尾，
+    列表再以一个空字符结尾"""
+    names = ''.join(os.path.abspath(path) + '\0' for path in paths) + '\0'
+    return struct.pack(DROPFILES_FORMAT, DROPFILES_SIZE, 0, 0, 0, 1) + names.encode('utf-16-le')
+
+
+class Win32Clipboard:
+    """Win32剪贴板：只在需要时短暂打开剪贴板，用序列号确认写入"""
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        self._ctypes = ctypes
+        user32 = ctypes.WinDLL('user32', use_last_error=True)
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        user32.OpenClipboard.argtypes = (wintypes.HWND,)
+        user32.OpenClipboard.restype = wintypes.BOOL
+        user32.CloseClipboard.restype = wintypes.BOOL
+        user32.EmptyClipboard.restype = wintypes.BOOL
+        user32.SetClipboardData.argtypes = (wintypes.UINT, wintypes.HANDLE)
+        user32.SetClipboardData.restype = wintypes.HANDLE
+        user32.GetClipboardData.argtypes = (wintypes.UINT,)
+        user32.GetClipboardData.restype = wintypes.HANDLE
+        user32.GetClipboardSequenceNumber.restype = wintypes.DWORD
+        user32.RegisterClipboardFormatW.argtypes = (wintypes.LPCWSTR,)
+        user32.RegisterClipboardFormatW.restype = wintypes.UINT
+        kernel32.GlobalAlloc.argtypes = (wintypes.UINT, ctypes.c_size_t)
+        kernel32.GlobalAlloc.restype = wintypes.HGLOBAL
+        kernel32.GlobalLock.argtypes = (wintypes.HGLOBAL,)
+        kernel32.GlobalLock.restype = ctypes.c_void_p
+        kernel32.GlobalUnlock.argtypes = (wintypes.HGLOBAL,)
+        kernel32.GlobalFree.argtypes = (wintypes.HGLOBAL,)
+        self._user32 = user32
+        self._kernel32 = kernel32
+
+    def _open(self):
+        for attempt in range(OPEN_RETRIES):
+            if self._user32.OpenClipboard(None):
+                return
+            time.sleep(OPEN_RETRY_DELAY)
+        raise ClipboardError(f"剪贴板被其他程序占用: {self._ctypes.get_last_error()}")
+
+    def _alloc(self, data):
+        handle = self._kernel32.GlobalAlloc(GMEM_MOVEABLE, len(data))
+        if not handle:
+            raise self._ctypes.WinError(self._ctypes.get_last_error())
+        pointer = self._kernel32.GlobalLock(handle)
+        if not pointer:
+            error = self._ctypes.get_last_error()
+            self._kernel32.GlobalFree(handle)
+            raise self._ctypes.WinError(error)
+        self._ctypes.memmove(pointer, data, len(data))
+        self._kernel32.GlobalUnlock(handle)
+        return handle
+
+    def _set(self, items):
+        """写入 [(格式, 数据), ...]，返回写入后的序列号，序列号没有变化时返回None"""
+        # 在打开剪贴板之前准备好数据，缩短占用剪贴板的时间
+        handles = []
+        try:
+            for fmt, data in items:
+                handles.append((fmt, self._alloc(data)))
+            self._open()
+        except Exception:
+            # 句柄还没有交给剪贴板，由自己释放
+            for _, handle in handles:
+                self._kernel32.GlobalFree(handle)
+            raise
+        try:
+            # 剪贴板打开期间其他程序无法写入，此时的序列号只会因本次写入而变化
+            before = self._user32.GetClipboardSequenceNumber()
+            self._user32.EmptyClipboard()
+            for index, (fmt, handle) in enumerate(handles):
+                if not self._user32.SetClipboardData(fmt, handle):
+                    error = self._ctypes.get_last_error()
+                    # 设置成功的句柄归剪贴板所有，只释放剩下的
+                    for _, rest in handles[index:]:
+                        self._kernel32.GlobalFree(rest)
+                    raise self._ctypes.WinError(error)
+        finally:
+            self._user32.CloseClipboard()
+        return written_sequence(before, self._user32.GetClipboardSequenceNumber())
+
+    def copy(self, text):
+        return self._set([(CF_UNICODETEXT, text.encode('utf-16-le') + b'\0\0')])
+
+    def copy_files(self, paths):
+        """写入文件列表（CF_HDROP），同时标记为复制操作"""
+        effect_format = self._user32.RegisterClipboardFormatW('Preferred DropEffect')
+        items = [(CF_HDROP, build_dropfiles(paths))]
+        if effect_format:
+            items.append((effect_format, struct.pack('<I', DROPEFFECT_COPY)))
+        return self._set(items)
+
+    def paste(self):
+        self._open()
+        try:
+            handle = self._user32.GetClipboardData(CF_UNICODETEXT)
+            if not handle:
+                return None
+            pointer = self._kernel32.GlobalLock(handle)
+            try:
+                return self._ctypes.wstring_at(pointer)
+            finally:
+                self._kernel32.GlobalUnlock(handle)
+        finally:
+            self._user32.CloseClipboard()
+
+    def sequence(self):
+        return self._user32.GetClipboardSequenceNumber()
+
+
+class PyperclipClipboard:
+    """pyperclip兜底后端：写入后读回一次确认，没有系统序列号时用本地计数代替"""
+
+    def __init__(self):
+        import pyperclip
+        self._pyperclip = pyperclip
+        self._sequence = 0
+
+    def copy(self, text):
+        self._pyperclip.copy(text)
+        self._sequence += 1
+        return self._sequence if self.paste() == text else None
+
+    def copy_files(self, paths):
+        # pyperclip只支持文本
+        return None
+
+    def paste(self):
+        return self._pyperclip.paste()
+
+    def sequence(self):
+        return self._sequence
+
+
+class MemoryClipboard:
+    """内存剪贴板：写入立即生效
+
+    listener(content) 在每次写入后被调用，content 为文本或文件路径元组。
+    """
+
+    def __init__(self, listener=None):
+        self.listener = listener
+        self.text = None
+        self.files = None
+        self.history = []
+        self._sequence = 0
+
+    def _write(self, content):
+        self.history.append(content)
+        self._sequence += 1
+        if self.listener:
+            self.listener(content)
+        return self._sequence
+
+    def copy(self, text):
+        self.text, self.files = text, None
+        return self._write(text)
+
+    def copy_files(self, paths):
+        self.text, self.files = None, tuple(paths)
+        return self._write(self.files)
+
+    def paste(self):
+        return self.text
+
+    def sequence(self):
+        return self._sequence
+
+
+_clipboard = None
+
+
+def get_clipboard():
+    """获取当前剪贴板后端，未设置时Windows下使用Win32后端，其他平台依次尝试pyperclip和内存剪贴板"""
+    global _clipboard
+    if _clipboard is None:
+        if sys.platform == 'win32':
+            _clipboard = Win32Clipboard()
+        else:
+            try:
+                _clipboard = PyperclipClipboard()
+            except ImportError:
+                _clipboard = MemoryClipboard()
+    return _clipboard
+
+
+def set_clipboard(clipboard):
+    """设置剪贴板后端，传入None恢复默认"""
+    global _clipboard
+    _clipboard = clipboard
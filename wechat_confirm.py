@@ -0,0 +1,128 @@
+"""
+发送确认：比较聊天记录区域的降采样画面，判断消息是否已经发出
+
+按Enter之前截取一帧聊天记录区域作为基准，之后轮询截图：
+- 画面先缩小为灰度小图（COARSE_FACTOR），逐格比较亮度差，只统计发出消息所在的区域
+  （聊天记录底部偏右，BUBBLE_ZONE），变化的格数超过 MIN_CHANGED 即认为出现了新的发出消息
+- 出现新消息后继续轮询：如果 templates/ 中有错误提示的模板（ERROR_BANNERS），每次都在原分辨率
+  画面上匹配，出现“发送失败”等提示时确认失败；画面保持不变 CONFIRM_SETTLE 秒（发送中的转圈、
+  文件上传进度条都会让画面一直变化）后才确认成功
+- 每次轮询只做一次区域截图、一次缩放和一次差值比较
+
+文件上传的等待也使用同一个探针：画面稳定即上传完成，之后的发送确认直接沿用结果。
+
+    confirm = SendConfirmation(chat_region(rect))   # 按Enter（或打开文件对话框）之前创建
+    press('enter')
+    wait_step('send_confirm', confirm)
+    confirm.finish()   # 'sent' / 'failed' / None（等待结束仍未看到新消息）
+"""
+
+# 错误提示的模板（templates/ 目录，见 wechat_locator.ELEMENTS）及对应的提示文字
+ERROR_BANNERS = {
+    'send_failed': '发送失败',
+    'cannot_send': '无法发送',
+    'file_missing': '文件不存在',
+}
+
+# 比较前的缩小比例
+COARSE_FACTOR = 0.25
+# 发出消息所在区域（相对聊天记录区域的比例 left, top, width, height）：底部偏右
+BUBBLE_ZONE = (0.4, 0.6, 0.6, 0.4)
+# 单格亮度差超过该值视为变化（0~255），忽略光标闪烁和抗锯齿噪声
+PIXEL_DELTA = 12
+# 发出消息区域内变化格数的比例超过该值视为出现新消息
+MIN_CHANGED = 0.01
+# 出现新消息后画面保持不变多少秒才确认成功，期间出现的错误提示仍能检测到
+CONFIRM_SETTLE = 0.3
+
+
+def shrink(frame):
+    """把帧缩小为灰度小图（有符号整数，便于相减）"""
+    import cv2
+    import numpy as np
+    from wechat_locator import to_gray
+    gray = to_gray(np.asarray(frame))
+    small = cv2.resize(gray, None, fx=COARSE_FACTOR, fy=COARSE_FACTOR, interpolation=cv2.INTER_AREA)
+    return small.astype(np.int16)
+
+
+def bubble_zone(shape):
+    """发出消息区域在小图中的切片"""
+    height, width = shape[:2]
+    left, top, zone_width, zone_height = BUBBLE_ZONE
+    x0, y0 = int(width * left), int(height * top)
+    x1 = max(min(int(width * (left + zone_width)), width), x0 + 1)
+    y1 = max(min(int(height * (top + zone_height)), height), y0 + 1)
+    return slice(y0, y1), slice(x0, x1)
+
+
+def changed_fraction(baseline, small):
+    """发出消息区域内变化的格数比例；画面尺寸变化（窗口缩放）时视为全部变化"""
+    import numpy as np
+    if baseline.shape != small.shape:
+        return 1.0
+    rows, cols = bubble_zone(small.shape)
+    diff = np.abs(small[rows, cols] - baseline[rows, cols])
+    return float(np.count_nonzero(diff > PIXEL_DELTA)) / diff.size
+
+
+def frame_moved(previous, small):
+    """与上一次轮询相比，发出消息区域内是否还有任何变化"""
+    return previous is None or changed_fraction(previous, small) > 0
+
+
+class SendConfirmation:
+    """发送确认探针：创建时截取基准帧，调用时返回是否已有结论（result 为 'sent' 或 'failed'）
+
+    clock 默认为等待引擎的时钟（基准测试中为模拟时钟）。
+    """
+
+    def __init__(self, region, locator=None, settle=CONFIRM_SETTLE, clock=None):
+        from wechat_capture import capture_region
+        from wechat_locator import get_locator
+        from wechat_wait import now
+
+        self.region = region
+        self.settle = settle
+        self._clock = clock or now
+        self.locator = locator or get_locator()
+        # 只检查已经截取了模板的错误提示
+        self.banners = [name for name in ERROR_BANNERS if self.locator.has_template(name)]
+        self.baseline = shrink(capture_region('confirm', region))
+        self.result = None
+        self.error = None
+        self.changed = 0.0
+        self._previous = None
+        self._stable_since = None
+
+    def __call__(self):
+        from wechat_capture import capture_region
+
+        if self.result:
+            return True
+        now = self._clock()
+        frame = capture_region('confirm', self.region)
+        small = shrink(frame)
+        self.changed = changed_fraction(self.baseline, small)
+        if self.changed < MIN_CHANGED:
+            self._previous, self._stable_since = None, None
+            return False
+        for name in self.banners:
+            if self.locator.locate(name, frame, origin=self.region[:2]):
+                self.result, self.error = 'failed', ERROR_BANNERS[name]
+                return True
+        # 新消息已出现，等画面稳定（转圈、进度条结束）后再确认成功
+        if frame_moved(self._previous, small):
+            self._stable_since = now
+        self._previous = small
+        if now - self._stable_since >= self.settle:
+            self.result = 'sent'
+            return True
+        return False
+
+    def finish(self):
+        """等待结束时给出结论：再检查一次，出现过新消息且没有错误提示即视为成功"""
+        if not self():
+            if self.changed >= MIN_CHANGED:
+                self.result = 'sent'
+        return self.result
@@ -0,0 +1,207 @@
+"""
+流式联系人列表读取
+
+根据BOM和文件开头的有限样本判断编码，只读一遍文件，逐行产出联系人，
+读取时同时完成名称规范化和去重，格式错误的行带行号报告。
+支持 .txt（每行一个联系人）、.csv（带表头）和 .jsonl（每行一个JSON对象）。
+"""
+import codecs
+import csv
+import json
+import os
+import re
+from collections import namedtuple
+
+# 编码探测读取的样本大小
+SAMPLE_SIZE = 64 * 1024
+
+# CSV/JSONL中联系人名称列的候选列名（按顺序匹配，不区分大小写）
+NAME_COLUMNS = ('联系人', '名称', '昵称', 'name', 'contact', 'nickname')
+
+# 支持的文件格式
+CONTACT_FILE_TYPES = [
+    ("联系人文件", "*.txt *.csv *.jsonl *.ndjson"),
+    ("文本文件", "*.txt"),
+    ("CSV文件", "*.csv"),
+    ("JSON Lines文件", "*.jsonl *.ndjson"),
+    ("所有文件", "*"),
+]
+
+# 一条联系人记录：行号、规范化后的名称、该行的所有列（txt格式为空字典）
+ContactRow = namedtuple('ContactRow', ['line', 'name', 'fields'])
+# 一条读取问题：行号、原因、原始内容
+LoadIssue = namedtuple('LoadIssue', ['line', 'reason', 'raw'])
+
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 零宽字符和控制字符
+_INVISIBLE = re.compile('[\u200b-\u200f\u202a-\u202e\u2060\ufeff\x00-\x08\x0b-\x1f\x7f]')
+_SPACES = re.compile(r'\s+')
+
+
+def detect_encoding(path, sample_size=SAMPLE_SIZE):
+    """根据BOM和文件开头的样本判断编码"""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    # 样本可能在多字节字符中间截断，使用增量解码器忽略末尾不完整的字符
+    for encoding in ('utf-8', 'gb18030'):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'gb18030'
+
+
+def normalize_name(name):
+    """规范化联系人名称：去掉零宽和控制字符，合并连续空白，去掉首尾空白"""
+    return _SPACES.sub(' ', _INVISIBLE.sub('', name)).strip()
+
+
+def detect_format(path):
+    """根据扩展名判断文件格式：txt / csv / jsonl"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return 'txt'
+
+
+def _pick_name_column(columns, name_column=None):
+    if name_column:
+        return name_column if name_column in columns else None
+    lowered = {c.strip().lower(): c for c in columns if c}
+    for candidate in NAME_COLUMNS:
+        if candidate.lower() in lowered:
+            return lowered[candidate.lower()]
+    return columns[0] if columns else None
+
+
+def _iter_txt(f):
+    for line_no, line in enumerate(f, 1):
+        yield line_no, line, line, {}
+
+
+def _iter_csv(f, name_column, issues):
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [normalize_name(h) for h in header]
+    column = _pick_name_column(header, name_column)
+    if column is None:
+        issues(LoadIssue(1, f'表头中没有联系人列: {name_column}', ','.join(header)))
+        return
+    index = header.index(column)
+    for row in reader:
+        line_no = reader.line_num
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) != len(header):
+            issues(LoadIssue(line_no, f'列数为{len(row)}，表头为{len(header)}列', ','.join(row)))
+            continue
+        yield line_no, row[index], ','.join(row), dict(zip(header, row))
+
+
+def _iter_jsonl(f, name_column, issues):
+    column = None
+    for line_no, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            issues(LoadIssue(line_no, f'JSON格式错误: {e}', line.strip()))
+            continue
+        if not isinstance(record, dict):
+            issues(LoadIssue(line_no, '不是JSON对象', line.strip()))
+            continue
+        if column is None or column not in record:
+            column = _pick_name_column(list(record), name_column)
+        value = record.get(column) if column else None
+        if not isinstance(value, str):
+            issues(LoadIssue(line_no, '缺少联系人名称', line.strip()))
+            continue
+        yield line_no, value, line, {k: '' if v is None else str(v) for k, v in record.items()}
+
+
+def iter_contacts(path, name_column=None, encoding=None, on_issue=None, dedupe=True):
+    """逐行产出 ContactRow，文件只读一遍
+
+    on_issue(LoadIssue) 接收格式错误、空名称和重复的行；
+    去重按规范化后的名称本身比较，只保存已出现的名称（与产出的名称是同一个字符串对象）。
+    """
+    encoding = encoding or detect_encoding(path)
+    fmt = detect_format(path)
+    report = on_issue or (lambda issue: None)
+    seen = set()
+    with open(path, 'r', encoding=encoding, errors='replace', newline='') as f:
+        if fmt == 'csv':
+            rows = _iter_csv(f, name_column, report)
+        elif fmt == 'jsonl':
+            rows = _iter_jsonl(f, name_column, report)
+        else:
+            rows = _iter_txt(f)
+        for line_no, raw_name, raw, fields in rows:
+            if '\ufffd' in raw_name:
+                report(LoadIssue(line_no, '包含无法解码的字符', raw.strip()))
+                continue
+            name = raw_name.strip()
+            # 常见的干净名称直接使用，只有含不可见字符或连续空白时才做完整规范化
+            if not name.isprintable() or '  ' in name:
+                name = normalize_name(name)
+            if not name:
+                if fmt != 'txt' or raw.strip():
+                    report(LoadIssue(line_no, '联系人名称为空', raw.strip()))
+                continue
+            if dedupe:
+                if name in seen:
+                    report(LoadIssue(line_no, f'重复的联系人: {name}', raw.strip()))
+                    continue
+                seen.add(name)
+            yield ContactRow(line_no, name, fields)
+
+
+def _issue_collector(max_issues):
+    """返回 (on_issue, 问题列表, 问题计数)，问题列表最多保留max_issues条"""
+    issues = []
+    counter = [0]
+
+    def on_issue(issue):
+        counter[0] += 1
+        if len(issues) < max_issues:
+            issues.append(issue)
+    return on_issue, issues, counter
+
+
+def load_contacts(path, name_column=None, max_issues=100):
+    """读取联系人文件，返回 (联系人名称列表, {名称: 列}, 问题列表, 编码, 问题总数)
+
+    不保留每一行的记录，只保留发送需要的名称，以及csv/jsonl中个性化消息需要的列；
+    问题列表最多保留max_issues条，避免错误很多的大文件占用大量内存。
+    只需要统计或逐行处理时使用 iter_contacts / count_contacts，内存不随文件大小增长（去重集合除外）。
+    """
+    encoding = detect_encoding(path)
+    on_issue, issues, counter = _issue_collector(max_issues)
+    names = []
+    fields = {}
+    for row in iter_contacts(path, name_column, encoding, on_issue):
+        names.append(row.name)
+        if row.fields:
+            fields[row.name] = row.fields
+    return names, fields, issues, encoding, counter[0]
+
+
+def count_contacts(path, name_column=None):
+    """流式统计联系人文件中（去重后）的联系人数"""
+    return sum(1 for _ in iter_contacts(path, name_column))
@@ -0,0 +1,194 @@
+"""
+联系人确认的视觉指纹缓存
+
+先在聊天标题栏左侧（NAME_ZONE）找出联系人名称文字所在的最小矩形，把文字像素（与背景亮度
+相差超过TEXT_DELTA）缩放到 HASH_WIDTH x HASH_HEIGHT 的网格，每格文字密度高于平均值记为1，
+得到1024位指纹。只对名称文字计算，标题栏的背景和右侧图标不参与；先二值化再缩放，
+截图噪声和亮度变化不会翻转位。某个联系人第一次确认通过后，把指纹写入磁盘缓存；
+之后的运行只需比较汉明距离（微秒级）即可确认，只有没有缓存或距离落在模糊区间时才退回较慢的确认方式。
+
+确认来源有两种：较慢的确认函数明确返回True，或者较慢的确认无法判断、但随后在这个聊天窗口中
+的发送全部确认成功（learn）。与其他联系人已缓存的指纹相同的截图不会记录，避免把搜索打开的
+错误聊天学成目标联系人。
+"""
+import json
+import os
+import threading
+
+# 指纹缓存文件
+FINGERPRINT_FILE = 'wechat_fingerprints.json'
+# 指纹算法版本，与缓存文件中的不一致时丢弃旧指纹重新学习
+FINGERPRINT_VERSION = 2
+
+# 名称文字所在区域（标题栏左侧的比例），排除右侧的窗口按钮和菜单图标
+NAME_ZONE = 0.6
+# 与背景亮度相差超过该值的像素视为文字
+TEXT_DELTA = 40
+# 文字矩形四周保留的像素
+TEXT_PADDING = 2
+# 名称文字的指纹网格，共 HASH_WIDTH*HASH_HEIGHT 位
+HASH_WIDTH = 64
+HASH_HEIGHT = 16
+
+# 汉明距离阈值：不超过MATCH_DISTANCE视为同一联系人，不小于MISMATCH_DISTANCE视为不同联系人，
+# 中间为模糊区间。按合成标题栏（17px字体）实测：同一名称在±1像素偏移、±5亮度和噪声下最大距离为9，
+# 只差一个字母的不同名称（Hu Jun / He Jun）最小距离为40，其余不同名称在130以上
+MATCH_DISTANCE = 16
+MISMATCH_DISTANCE = 36
+# 每个联系人最多保留的指纹数（主题、缩放变化时会产生新指纹）
+MAX_FINGERPRINTS = 3
+
+# 校验结果
+MATCH = 'match'
+MISMATCH = 'mismatch'
+AMBIGUOUS = 'ambiguous'
+UNKNOWN = 'unknown'
+
+
+def text_mask(gray):
+    """标题栏灰度图中名称文字的二值图（文字为1.0），裁剪到文字所在的最小矩形；没有文字时返回None"""
+    import numpy as np
+    zone = gray[:, :max(int(gray.shape[1] * NAME_ZONE), 1)]
+    mask = np.abs(zone.astype(np.int16) - int(np.median(zone))) > TEXT_DELTA
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        return None
+    y0, y1 = max(rows[0] - TEXT_PADDING, 0), min(rows[-1] + TEXT_PADDING + 1, zone.shape[0])
+    x0, x1 = max(cols[0] - TEXT_PADDING, 0), min(cols[-1] + TEXT_PADDING + 1, zone.shape[1])
+    return mask[y0:y1, x0:x1].astype(np.float32)
+
+
+def name_hash(frame):
+    """计算标题栏名称文字的指纹；标题栏没有文字时返回0"""
+    import cv2
+    import numpy as np
+    from wechat_locator import to_gray
+    mask = text_mask(to_gray(np.asarray(frame)))
+    if mask is None:
+        return 0
+    density = cv2.resize(mask, (HASH_WIDTH, HASH_HEIGHT), interpolation=cv2.INTER_AREA)
+    bits = density > density.mean()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    """两个哈希的汉明距离"""
+    return bin(a ^ b).count('1')
+
+
+class FingerprintCache:
+    """联系人 -> 标题栏指纹的磁盘缓存"""
+
+    def __init__(self, path=FINGERPRINT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # 旧版本的指纹（整条标题栏的64位哈希）不可比较，丢弃后重新学习
+                if isinstance(data, dict) and data.get('version') == FINGERPRINT_VERSION:
+                    self._entries = {name: [int(h, 16) for h in hashes]
+                                     for name, hashes in data['contacts'].items()}
+            except (OSError, ValueError, KeyError, AttributeError):
+                self._entries = {}
+
+    def __contains__(self, contact):
+        return contact in self._entries
+
+    def verify(self, contact, fingerprint):
+        """返回 (结果, 最小汉明距离)，结果为 MATCH / MISMATCH / AMBIGUOUS / UNKNOWN"""
+        hashes = self._entries.get(contact)
+        if not hashes:
+            return UNKNOWN, None
+        distance = min(hamming(fingerprint, h) for h in hashes)
+        if distance <= MATCH_DISTANCE:
+            return MATCH, distance
+        if distance >= MISMATCH_DISTANCE:
+            return MISMATCH, distance
+        return AMBIGUOUS, distance
+
+    def remember(self, contact, fingerprint):
+        """记录确认通过的指纹"""
+        with self._lock:
+            hashes = self._entries.setdefault(contact, [])
+            if any(hamming(fingerprint, h) <= MATCH_DISTANCE for h in hashes):
+                return
+            hashes.append(fingerprint)
+            del hashes[:-MAX_FINGERPRINTS]
+            self._dirty = True
+
+    def owner(self, fingerprint, exclude=None):
+        """已缓存指纹与fingerprint匹配的其他联系人（exclude除外），没有时返回None"""
+        for contact, hashes in self._entries.items():
+            if contact != exclude and any(hamming(fingerprint, h) <= MATCH_DISTANCE for h in hashes):
+                return contact
+        return None
+
+    def forget(self, contact):
+        with self._lock:
+            if self._entries.pop(contact, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """有变化时写回磁盘（先写临时文件再替换）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            contacts = {name: [f'{h:x}' for h in hashes] for name, hashes in self._entries.items()}
+            data = {'version': FINGERPRINT_VERSION, 'contacts': contacts}
+            self._dirty = False
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class ContactVerifier:
+    """联系人确认：优先比较缓存指纹，必要时调用较慢的确认函数
+
+    slow_check(contact, frame) 返回 True（确认是目标联系人）、False（确认不是）或
+    None（无法确认，按旧版行为视为目标联系人）。True 时立即记录指纹；None 时先保留为候选，
+    发送全部确认成功后由调用方 learn() 记录，发送失败或跳过时不记录。
+    """
+
+    def __init__(self, cache=None, slow_check=None):
+        self.cache = cache or FingerprintCache()
+        self.slow_check = slow_check
+        self.stats = {MATCH: 0, MISMATCH: 0, AMBIGUOUS: 0, UNKNOWN: 0}
+        self._candidates = {}
+
+    def verify(self, contact, frame):
+        """返回 (是否是目标联系人, 结果, 汉明距离)"""
+        self._candidates.pop(contact, None)
+        fingerprint = name_hash(frame)
+        if fingerprint:
+            result, distance = self.cache.verify(contact, fingerprint)
+        else:
+            # 标题栏没有文字（例如还没有打开聊天），指纹没有意义
+            result, distance = UNKNOWN, None
+        self.stats[result] += 1
+        if result == MATCH:
+            return True, result, distance
+        if result == MISMATCH:
+            return False, result, distance
+        confirmed = self.slow_check(contact, frame) if self.slow_check else None
+        if confirmed is True and fingerprint:
+            self.cache.remember(contact, fingerprint)
+        elif confirmed is None and fingerprint:
+            self._candidates[contact] = fingerprint
+        return confirmed is not False, result, distance
+
+    def learn(self, contact):
+        """在该联系人的聊天窗口中发送确认成功后，记录本次未能确认的指纹；返回是否记录"""
+        fingerprint = self._candidates.pop(contact, None)
+        if not fingerprint or self.cache.owner(fingerprint, exclude=contact) is not None:
+            return False
+        self.cache.remember(contact, fingerprint)
+        return True
+
+    def save(self):
+        self.cache.save()
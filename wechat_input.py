@@ -0,0 +1,155 @@
+"""
+输入驱动层：把快捷键编译成按键事件序列，一次批量提交
+
+- Win32InputDriver：一次 SendInput 调用提交整个序列（Windows）
+- RecordingInputDriver：只在内存中记录，不触发真实按键，可在Linux上测试和基准测试
+
+主脚本通过 press('ctrl', 'v') 发送快捷键，具体驱动由 set_input_driver 决定。
+"""
+import sys
+from functools import lru_cache
+
+# 虚拟键码
+VK_CODES = {
+    'ctrl': 0x11,
+    'shift': 0x10,
+    'alt': 0x12,
+    'enter': 0x0D,
+    'tab': 0x09,
+    'esc': 0x1B,
+    'backspace': 0x08,
+    'delete': 0x2E,
+}
+# 字母和数字的虚拟键码等于其大写ASCII码
+for _ch in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789':
+    VK_CODES[_ch.lower()] = ord(_ch)
+
+VK_NAMES = {code: name for name, code in VK_CODES.items()}
+
+KEYEVENTF_KEYUP = 0x0002
+INPUT_KEYBOARD = 1
+
+
+@lru_cache(maxsize=None)
+def compile_hotkey(*keys):
+    """把快捷键编译成按键事件序列
+
+    例如 compile_hotkey('ctrl', 'v') 返回
+    ((0x11, False), (0x56, False), (0x56, True), (0x11, True))，
+    每项为(虚拟键码, 是否抬起)：按顺序按下，逆序抬起。
+    """
+    if not keys:
+        raise ValueError("快捷键不能为空")
+    try:
+        codes = [VK_CODES[key.lower()] for key in keys]
+    except KeyError as e:
+        raise ValueError(f"未知按键: {e.args[0]}")
+    down = tuple((code, False) for code in codes)
+    up = tuple((code, True) for code in reversed(codes))
+    return down + up
+
+
+def hotkey_name(events):
+    """把按键事件序列还原成快捷键名称，例如 'ctrl+v'"""
+    return '+'.join(VK_NAMES.get(code, hex(code)) for code, up in events if not up)
+
+
+class Win32InputDriver:
+    """Win32输入驱动：一次SendInput调用提交整个按键序列"""
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [('wVk', wintypes.WORD),
+                        ('wScan', wintypes.WORD),
+                        ('dwFlags', wintypes.DWORD),
+                        ('time', wintypes.DWORD),
+                        ('dwExtraInfo', ctypes.c_size_t)]
+
+        class MOUSEINPUT(ctypes.Structure):
+            # 只用于撑开联合体，保证INPUT结构大小与系统一致
+            _fields_ = [('dx', wintypes.LONG),
+                        ('dy', wintypes.LONG),
+                        ('mouseData', wintypes.DWORD),
+                        ('dwFlags', wintypes.DWORD),
+                        ('time', wintypes.DWORD),
+                        ('dwExtraInfo', ctypes.c_size_t)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [('ki', KEYBDINPUT), ('mi', MOUSEINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [('type', wintypes.DWORD), ('union', _INPUTUNION)]
+
+        self._ctypes = ctypes
+        self._INPUT = INPUT
+        self._user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self._user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        self._user32.SendInput.restype = wintypes.UINT
+        # 已编译序列对应的INPUT数组缓存，重复的快捷键不再重新构造
+        self._arrays = {}
+
+    def _build(self, events):
+        array = (self._INPUT * len(events))()
+        for item, (code, up) in zip(array, events):
+            item.type = INPUT_KEYBOARD
+            item.union.ki.wVk = code
+            item.union.ki.dwFlags = KEYEVENTF_KEYUP if up else 0
+        return array
+
+    def send(self, events):
+        """一次系统调用提交整个按键序列"""
+        array = self._arrays.get(events)
+        if array is None:
+            array = self._arrays[events] = self._build(events)
+        sent = self._user32.SendInput(len(events), array, self._ctypes.sizeof(self._INPUT))
+        if sent != len(events):
+            raise self._ctypes.WinError(self._ctypes.get_last_error())
+
+
+class RecordingInputDriver:
+    """内存记录驱动：不触发真实按键，只记录每次提交的按键序列
+
+    listener(name) 会在每次提交后以快捷键名称（如 'ctrl+v'）被调用，
+    模拟的微信界面据此推进状态。
+    """
+
+    def __init__(self, listener=None):
+        self.listener = listener
+        self.batches = []
+
+    def send(self, events):
+        self.batches.append(events)
+        if self.listener:
+            self.listener(hotkey_name(events))
+
+    def hotkeys(self):
+        """已提交的快捷键名称列表"""
+        return [hotkey_name(events) for events in self.batches]
+
+    def clear(self):
+        self.batches = []
+
+
+_driver = None
+
+
+def get_input_driver():
+    """获取当前输入驱动，未设置时Windows下使用Win32驱动，其他平台使用记录驱动"""
+    global _driver
+    if _driver is None:
+        _driver = Win32InputDriver() if sys.platform == 'win32' else RecordingInputDriver()
+    return _driver
+
+
+def set_input_driver(driver):
+    """设置输入驱动，传入None恢复默认"""
+    global _driver
+    _driver = driver
+
+
+def press(*keys):
+    """按下并释放快捷键，整个序列一次提交"""
+    get_input_driver().send(compile_hotkey(*keys))
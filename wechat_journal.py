@@ -0,0 +1,280 @@
+"""
+发送预写日志（write-ahead journal）
+
+发送记录库只在一个联系人全部发送完成后记录，联系人发送到一半时崩溃或断电，
+重启后会重复发送已经发出的消息。预写日志按步骤记录每个联系人的进度：
+
+    begin       开始处理联系人
+    searched    已打开聊天窗口
+    message_start / message / message_failed   第i条消息开始发送 / 已发送 / 校验失败
+    file_start / file / file_failed            第j个文件开始发送 / 已发送 / 校验失败
+    done        联系人全部完成（已写入发送记录库）
+
+日志为JSON Lines，追加写入，由后台线程合并提交：一批记录只调用一次fsync，
+发送循环不会因为刷盘而变慢（最多丢失最后 GROUP_COMMIT_INTERVAL 秒内的记录）。
+只有步骤的开始记录在返回前等待落盘：崩溃时丢失的只可能是之后的完成记录，该步骤按“不确定”处理，
+不会因为开始记录还在队列中就断电而重复发送。
+重启时重放日志，把已完成的联系人补写入发送记录库，未完成的联系人从中断的步骤继续；
+只有开始记录、没有完成记录的步骤视为“不确定”，默认按已发送处理，避免重复发送。
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+# 预写日志文件
+JOURNAL_FILE = 'wechat_send_journal.jsonl'
+
+# 合并提交的最长间隔（秒）
+GROUP_COMMIT_INTERVAL = 0.05
+# 不确定是否发出的步骤是否重新发送（False：按已发送处理，避免重复）
+RETRY_UNCERTAIN = False
+
+
+class ContactProgress:
+    """一个联系人在日志中的进度"""
+
+    def __init__(self):
+        self.searched = False
+        self.messages = set()
+        self.files = set()
+        self.uncertain = set()
+        self.done = False
+
+    def completed(self, kind, index):
+        """该步骤是否已经完成（或不确定且按已发送处理）"""
+        done = self.messages if kind == 'message' else self.files
+        if index in done:
+            return True
+        return not RETRY_UNCERTAIN and (kind, index) in self.uncertain
+
+    @property
+    def started(self):
+        return self.searched or bool(self.messages or self.files or self.uncertain)
+
+    def to_records(self, key):
+        campaign, contact, payload = key
+        base = {'c': campaign, 'n': contact, 'p': payload}
+        records = [dict(base, op='begin')]
+        if self.searched:
+            records.append(dict(base, op='searched'))
+        for kind, index in sorted(self.uncertain):
+            records.append(dict(base, op=f'{kind}_start', i=index))
+        records.extend(dict(base, op='message', i=i) for i in sorted(self.messages))
+        records.extend(dict(base, op='file', i=i) for i in sorted(self.files))
+        return records
+
+
+def replay(path):
+    """读取日志，返回 {(任务, 联系人, 内容哈希): ContactProgress}
+
+    最后一行可能只写了一半（断电），无法解析的行直接忽略。
+    """
+    state = {}
+    if not os.path.exists(path):
+        return state
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                key = (record['c'], record['n'], record['p'])
+                op = record['op']
+            except (ValueError, KeyError, TypeError):
+                continue
+            progress = state.get(key)
+            if progress is None:
+                progress = state[key] = ContactProgress()
+            index = record.get('i')
+            if op == 'searched':
+                progress.searched = True
+            elif op in ('message_start', 'file_start'):
+                progress.uncertain.add((op[:-6], index))
+            elif op in ('message', 'file'):
+                progress.uncertain.discard((op, index))
+                (progress.messages if op == 'message' else progress.files).add(index)
+            elif op in ('message_failed', 'file_failed'):
+                progress.uncertain.discard((op[:-7], index))
+            elif op == 'done':
+                progress.done = True
+    return state
+
+
+class SendJournal:
+    """预写日志：记录发送步骤，后台线程合并fsync"""
+
+    def __init__(self, path=JOURNAL_FILE, interval=GROUP_COMMIT_INTERVAL):
+        self.path = os.path.abspath(path)
+        self.interval = interval
+        self.state = replay(self.path)
+        self.stats = {'records': 0, 'commits': 0}
+        self._queue = queue.SimpleQueue()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._closed = False
+        self._last_commit = 0.0
+        # 有调用方在等待落盘时不再等满合并间隔
+        self._urgent = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='wechat-journal', daemon=True)
+        self._thread.start()
+
+    # ---------- 重放与恢复 ----------
+
+    def recover(self, records):
+        """把日志中已完成的联系人补写入发送记录库，返回 (补写数, 未完成的联系人数)"""
+        done = [key for key, progress in self.state.items() if progress.done]
+        if done and records:
+            records.mark_many(done)
+        for key in done:
+            del self.state[key]
+        self.checkpoint()
+        return len(done), sum(1 for progress in self.state.values() if progress.started)
+
+    def progress(self, campaign, contact, payload):
+        """该联系人上次中断时的进度，没有未完成记录时返回None"""
+        progress = self.state.get((campaign, contact, payload))
+        return progress if progress and progress.started else None
+
+    def checkpoint(self):
+        """重写日志，只保留未完成联系人的进度（调用前发送记录库应已提交）"""
+        if self._closed:
+            return
+        self.sync()
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n'
+                       for key, progress in self.state.items() if progress.started
+                       for record in progress.to_records(key))
+        self._queue.put(('checkpoint', data))
+        self.sync()
+
+    # ---------- 写入 ----------
+
+    def _append(self, op, campaign, contact, payload, index=None):
+        if self._closed:
+            return
+        key = (campaign, contact, payload)
+        progress = self.state.get(key)
+        if progress is None:
+            progress = self.state[key] = ContactProgress()
+        if op == 'searched':
+            progress.searched = True
+        elif op.endswith('_start'):
+            progress.uncertain.add((op[:-6], index))
+        elif op in ('message', 'file'):
+            progress.uncertain.discard((op, index))
+            (progress.messages if op == 'message' else progress.files).add(index)
+        elif op.endswith('_failed'):
+            progress.uncertain.discard((op[:-7], index))
+        elif op == 'done':
+            self.state.pop(key, None)
+        record = {'op': op, 'c': campaign, 'n': contact, 'p': payload}
+        if index is not None:
+            record['i'] = index
+        self._queue.put(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def begin(self, campaign, contact, payload):
+        self._append('begin', campaign, contact, payload)
+
+    def searched(self, campaign, contact, payload):
+        self._append('searched', campaign, contact, payload)
+
+    def start(self, campaign, contact, payload, kind, index):
+        """kind 为 'message' 或 'file'，在实际发送之前调用，返回时开始记录已经落盘"""
+        self._append(f'{kind}_start', campaign, contact, payload, index)
+        self.sync()
+
+    def sent(self, campaign, contact, payload, kind, index):
+        self._append(kind, campaign, contact, payload, index)
+
+    def failed(self, campaign, contact, payload, kind, index):
+        """发送校验失败：该步骤确定没有发出，重启后会重新发送"""
+        self._append(f'{kind}_failed', campaign, contact, payload, index)
+
+    def done(self, campaign, contact, payload):
+        self._append('done', campaign, contact, payload)
+
+    def sync(self, timeout=5.0):
+        """等待已写入的记录全部fsync到磁盘"""
+        if self._closed:
+            return True
+        event = threading.Event()
+        self._queue.put(event)
+        self._urgent.set()
+        return event.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # ---------- 后台线程 ----------
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            # 距上次提交不足一个间隔时先等一会，让这段时间内的记录合并成一次提交（有人等待落盘时立即提交）
+            if isinstance(item, str):
+                delay = self._last_commit + self.interval - time.monotonic()
+                if delay > 0:
+                    self._urgent.wait(delay)
+            self._urgent.clear()
+            lines = []
+            waiters = []
+            stop = False
+            # 合并队列中已有的记录，一次写入、一次fsync
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                elif isinstance(item, tuple):
+                    self._commit(lines)
+                    lines = []
+                    self._rewrite(item[1])
+                else:
+                    lines.append(item)
+                if stop:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._commit(lines)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                self._file.close()
+                return
+
+    def _commit(self, lines):
+        if not lines:
+            return
+        try:
+            self._file.write(''.join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_commit = time.monotonic()
+            self.stats['records'] += len(lines)
+            self.stats['commits'] += 1
+        except Exception as e:
+            # 日志写入失败不能影响发送流程
+            print(f"写入发送日志失败: {e}")
+
+    def _rewrite(self, data):
+        """原子替换日志文件内容"""
+        try:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        except Exception as e:
+            print(f"整理发送日志失败: {e}")
+            if self._file.closed:
+                self._file = open(self.path, 'a', encoding='utf-8')
@@ -0,0 +1,232 @@
+"""
+基于OpenCV模板匹配的微信界面元素定位
+
+在微信窗口推算出的感兴趣区域内做多尺度模板匹配，定位搜索框、输入框、
+发送按钮和文件对话框。模板按DPI预先缩放并缓存，先在降采样图上粗匹配，
+再在原分辨率的小邻域内精匹配，单次定位通常只需几毫秒。
+
+模板图片放在 templates/ 目录（100%缩放下截取）：
+    search_box.png  input_box.png  send_button.png  file_dialog.png
+发送确认检测的错误提示（可选）：
+    send_failed.png  cannot_send.png  file_missing.png
+
+离线基准测试（使用保存的截图，可在Linux上运行）：
+    python wechat_locator.py shot1.png shot2.png --window 0,0,1000,800
+"""
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+
+# 模板目录
+TEMPLATE_DIR = 'templates'
+
+# 界面元素：模板文件和感兴趣区域（相对微信窗口的比例 left, top, width, height）
+ELEMENTS = {
+    'search_box':  {'file': 'search_box.png',  'roi': (0.0, 0.0, 0.45, 0.2)},
+    'input_box':   {'file': 'input_box.png',   'roi': (0.25, 0.65, 0.75, 0.35)},
+    'send_button': {'file': 'send_button.png', 'roi': (0.55, 0.8, 0.45, 0.2)},
+    'file_dialog': {'file': 'file_dialog.png', 'roi': (0.0, 0.0, 1.0, 1.0)},
+    # 发送确认用的错误提示（可选，见 wechat_confirm.ERROR_BANNERS）
+    'send_failed':  {'file': 'send_failed.png',  'roi': (0.33, 0.05, 0.67, 0.75)},
+    'cannot_send':  {'file': 'cannot_send.png',  'roi': (0.33, 0.05, 0.67, 0.75)},
+    'file_missing': {'file': 'file_missing.png', 'roi': (0.33, 0.05, 0.67, 0.75)},
+}
+
+# 模板相对DPI缩放的额外尺度，覆盖窗口缩放和主题差异
+DEFAULT_SCALES = (0.9, 1.0, 1.1)
+# 匹配得分阈值（TM_CCOEFF_NORMED）
+DEFAULT_THRESHOLD = 0.8
+# 粗匹配的降采样比例
+COARSE_FACTOR = 0.5
+
+# 定位结果：中心点坐标为屏幕坐标
+Match = namedtuple('Match', ['name', 'x', 'y', 'width', 'height', 'score', 'scale'])
+
+
+def get_dpi_scale():
+    """当前系统DPI缩放比例，非Windows平台返回1.0"""
+    if sys.platform != 'win32':
+        return 1.0
+    try:
+        import ctypes
+        return ctypes.windll.user32.GetDpiForSystem() / 96.0
+    except Exception:
+        return 1.0
+
+
+def roi_region(rect, roi):
+    """根据窗口区域和比例计算感兴趣区域 (left, top, width, height)"""
+    left, top, width, height = rect
+    rl, rt, rw, rh = roi
+    return (left + int(width * rl), top + int(height * rt),
+            max(int(width * rw), 1), max(int(height * rh), 1))
+
+
+def to_gray(frame):
+    """RGB/RGBA/灰度帧转灰度"""
+    import cv2
+    if frame.ndim == 2:
+        return frame
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+
+
+class TemplateLocator:
+    """多尺度模板匹配定位器"""
+
+    def __init__(self, template_dir=TEMPLATE_DIR, scales=DEFAULT_SCALES, threshold=DEFAULT_THRESHOLD):
+        self.template_dir = template_dir
+        self.scales = scales
+        self.threshold = threshold
+        self._raw = {}
+        # (元素名, DPI缩放) -> [(尺度, 原分辨率模板, 降采样模板)]
+        self._scaled = {}
+
+    def has_template(self, name):
+        return self._load(name) is not None
+
+    def _load(self, name):
+        if name not in self._raw:
+            path = os.path.join(self.template_dir, ELEMENTS[name]['file'])
+            image = None
+            if os.path.exists(path):
+                import cv2
+                image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            self._raw[name] = image
+        return self._raw[name]
+
+    def templates(self, name, dpi_scale=1.0):
+        """按DPI预缩放的模板，首次使用时生成并缓存"""
+        key = (name, round(dpi_scale, 2))
+        if key not in self._scaled:
+            import cv2
+            raw = self._load(name)
+            scaled = []
+            if raw is not None:
+                for scale in self.scales:
+                    factor = scale * dpi_scale
+                    size = (max(int(raw.shape[1] * factor), 1), max(int(raw.shape[0] * factor), 1))
+                    full = cv2.resize(raw, size, interpolation=cv2.INTER_AREA if factor < 1 else cv2.INTER_LINEAR)
+                    coarse_size = (max(int(size[0] * COARSE_FACTOR), 1), max(int(size[1] * COARSE_FACTOR), 1))
+                    coarse = cv2.resize(full, coarse_size, interpolation=cv2.INTER_AREA)
+                    scaled.append((scale, full, coarse))
+            self._scaled[key] = scaled
+        return self._scaled[key]
+
+    def locate(self, name, frame, origin=(0, 0), dpi_scale=1.0):
+        """在帧中定位元素，origin为帧左上角的屏幕坐标，未找到返回None"""
+        import cv2
+        templates = self.templates(name, dpi_scale)
+        if not templates:
+            return None
+        gray = to_gray(frame)
+        coarse_frame = cv2.resize(gray, None, fx=COARSE_FACTOR, fy=COARSE_FACTOR, interpolation=cv2.INTER_AREA)
+
+        # 粗匹配：在降采样图上找出最可能的尺度和位置
+        best = None
+        for scale, full, coarse in templates:
+            if coarse.shape[0] > coarse_frame.shape[0] or coarse.shape[1] > coarse_frame.shape[1]:
+                continue
+            result = cv2.matchTemplate(coarse_frame, coarse, cv2.TM_CCOEFF_NORMED)
+            _, score, _, loc = cv2.minMaxLoc(result)
+            if best is None or score > best[0]:
+                best = (score, scale, full, loc)
+        if best is None:
+            return None
+
+        # 精匹配：在原分辨率的小邻域内确定位置和得分
+        _, scale, full, (cx, cy) = best
+        th, tw = full.shape
+        margin = max(4, int(2 / COARSE_FACTOR))
+        x0 = max(int(cx / COARSE_FACTOR) - margin, 0)
+        y0 = max(int(cy / COARSE_FACTOR) - margin, 0)
+        x1 = min(x0 + tw + 2 * margin, gray.shape[1])
+        y1 = min(y0 + th + 2 * margin, gray.shape[0])
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < th or window.shape[1] < tw:
+            return None
+        result = cv2.matchTemplate(window, full, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (fx, fy) = cv2.minMaxLoc(result)
+        if score < self.threshold:
+            return None
+        return Match(name, origin[0] + x0 + fx + tw // 2, origin[1] + y0 + fy + th // 2, tw, th, score, scale)
+
+    def locate_in_window(self, name, rect, dpi_scale=None):
+        """在微信窗口的感兴趣区域内截图并定位元素"""
+        from wechat_capture import capture_region
+        if not self.has_template(name):
+            return None
+        region = roi_region(rect, ELEMENTS[name]['roi'])
+        frame = capture_region(f'locate_{name}', region)
+        return self.locate(name, frame, origin=region[:2],
+                           dpi_scale=get_dpi_scale() if dpi_scale is None else dpi_scale)
+
+
+_locator = None
+
+
+def get_locator():
+    """获取共享的定位器（模板缓存在整个运行期间复用）"""
+    global _locator
+    if _locator is None:
+        _locator = TemplateLocator()
+    return _locator
+
+
+def set_locator(locator):
+    global _locator
+    _locator = locator
+
+
+def benchmark_locator(screenshot_paths, window_rect=None, elements=None, repeat=20, locator=None, dpi_scale=1.0):
+    """用保存的截图离线测试定位耗时和命中情况
+
+    window_rect为截图中微信窗口的位置，默认整张截图。返回每个元素的统计。
+    """
+    import cv2
+    locator = locator or TemplateLocator()
+    elements = elements or [name for name in ELEMENTS if locator.has_template(name)]
+    stats = {}
+    for path in screenshot_paths:
+        image = cv2.cvtColor(cv2.imread(path, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+        rect = window_rect or (0, 0, image.shape[1], image.shape[0])
+        for name in elements:
+            left, top, width, height = roi_region(rect, ELEMENTS[name]['roi'])
+            frame = image[top:top + height, left:left + width]
+            # 预热模板缓存，不计入耗时
+            match = locator.locate(name, frame, (left, top), dpi_scale)
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                locator.locate(name, frame, (left, top), dpi_scale)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            entry = stats.setdefault(name, {'hits': 0, 'misses': 0, 'ms': []})
+            entry['hits' if match else 'misses'] += 1
+            entry['ms'].extend(timings)
+            print(f"{os.path.basename(path)}  {name:<12} "
+                  f"{'命中' if match else '未找到'}  {match.score if match else 0:.3f}  "
+                  f"p50 {timings[len(timings) // 2]:.2f}ms  max {timings[-1]:.2f}ms"
+                  + (f"  中心 ({match.x}, {match.y})" if match else ''))
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='微信界面元素定位离线基准测试')
+    parser.add_argument('screenshots', nargs='+', help='保存的微信截图')
+    parser.add_argument('--templates', default=TEMPLATE_DIR, help='模板目录')
+    parser.add_argument('--window', help='截图中微信窗口位置 left,top,width,height，默认整张截图')
+    parser.add_argument('--repeat', type=int, default=20, help='每个元素重复定位次数')
+    parser.add_argument('--dpi', type=float, default=1.0, help='截图的DPI缩放比例')
+    args = parser.parse_args(argv)
+
+    rect = tuple(int(v) for v in args.window.split(',')) if args.window else None
+    locator = TemplateLocator(args.templates)
+    return benchmark_locator(args.screenshots, rect, repeat=args.repeat, locator=locator, dpi_scale=args.dpi)
+
+
+if __name__ == '__main__':
+    main()
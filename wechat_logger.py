@@ -0,0 +1,254 @@
+"""
+缓冲、非阻塞的日志子系统
+
+write_log(message, level) 只把日志放入内存队列并输出到控制台，
+由后台线程批量写入磁盘，发送循环不会阻塞在文件读写上。
+支持按大小轮转并gzip压缩旧日志，可选JSON Lines格式输出。
+"""
+import atexit
+import functools
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+# 日志文件路径
+LOG_FILE = 'wechat_auto_send.log'
+
+# 默认配置
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024   # 单个日志文件上限，超过后轮转
+DEFAULT_BACKUP_COUNT = 5               # 保留的压缩备份数量
+DEFAULT_FLUSH_INTERVAL = 0.5           # 最长刷盘间隔（秒）
+DEFAULT_BATCH_SIZE = 512               # 单次批量写入的最大条数
+
+
+def format_text(timestamp, level, message):
+    """文本格式：[时间] [级别] 消息"""
+    ts = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+    return f"[{ts}] [{level}] {message}\n"
+
+
+def format_json(timestamp, level, message):
+    """JSON Lines格式：每行一个JSON对象"""
+    record = {
+        'ts': datetime.fromtimestamp(timestamp).isoformat(timespec='milliseconds'),
+        'level': level,
+        'msg': message,
+    }
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def parse_line(line):
+    """解析一行日志（文本或JSON Lines格式），返回 (时间戳, 级别, 消息)，无法解析时返回None
+
+    文本格式的时间精确到秒，JSON Lines格式精确到毫秒。
+    """
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+            return datetime.fromisoformat(record['ts']).timestamp(), record['level'], record['msg']
+        except (ValueError, KeyError, TypeError):
+            return None
+    if not line.startswith('[') or line[20:23] != '] [':
+        return None
+    end = line.find('] ', 23)
+    if end < 0:
+        return None
+    timestamp = _parse_text_time(line[1:20])
+    if timestamp is None:
+        return None
+    return timestamp, line[23:end], line[end + 2:].rstrip('\n')
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_text_time(text):
+    # 同一秒内的日志很多，缓存解析结果
+    try:
+        return datetime.strptime(text, '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        return None
+
+
+def log_files(path=LOG_FILE):
+    """日志文件及其轮转备份，按时间从旧到新排列"""
+    backups = []
+    i = 1
+    while os.path.exists(f"{path}.{i}.gz"):
+        backups.append(f"{path}.{i}.gz")
+        i += 1
+    files = backups[::-1]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def iter_log(path):
+    """逐行读取日志文件（支持.gz备份），产出 (时间戳, 级别, 消息)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            record = parse_line(line)
+            if record:
+                yield record
+
+
+class AsyncLogWriter:
+    """后台日志写入线程：批量刷盘、按大小轮转并压缩"""
+
+    def __init__(self, path=LOG_FILE, json_lines=False, max_bytes=DEFAULT_MAX_BYTES,
+                 backup_count=DEFAULT_BACKUP_COUNT, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.path = os.path.abspath(path)
+        self.formatter = format_json if json_lines else format_text
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # SimpleQueue无上限，put永不阻塞
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='wechat-log-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, level, message, timestamp=None):
+        """放入一条日志，立即返回"""
+        if self._closed:
+            return
+        self._queue.put((time.time() if timestamp is None else timestamp, level, message))
+
+    def flush(self, timeout=5.0):
+        """等待队列中已有的日志全部写入磁盘"""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """写完剩余日志并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # ---------- 后台线程 ----------
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = []
+            waiters = []
+            stop = False
+            # 一次取出队列中已有的日志，合并成一次写入
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _write_batch(self, batch):
+        data = ''.join(self.formatter(ts, level, message) for ts, level, message in batch)
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(data)
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            # 日志写入失败不能影响发送流程
+            print(f"写入日志失败: {e}")
+            self._file = None
+
+    def _rotate(self):
+        """轮转日志：当前文件压缩为 .1.gz，旧备份依次后移"""
+        self._file.close()
+        self._file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}.gz"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}.gz")
+        rotated = f"{self.path}.rotating"
+        os.replace(self.path, rotated)
+        with open(rotated, 'rb') as src, gzip.open(f"{self.path}.1.gz", 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+_console = True
+
+
+def configure_logging(path=LOG_FILE, json_lines=False, console=True, **options):
+    """配置日志输出；已有的写入线程会先写完再替换"""
+    global _writer, _console
+    with _writer_lock:
+        if _writer:
+            _writer.close()
+        _writer = AsyncLogWriter(path, json_lines=json_lines, **options)
+        _console = console
+    return _writer
+
+
+def get_log_writer():
+    """获取当前日志写入线程，未配置时按默认配置创建"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AsyncLogWriter()
+    return _writer
+
+
+def write_log(message, level='INFO'):
+    """写入日志"""
+    timestamp = time.time()
+    if _console:
+        print(format_text(timestamp, level, message).strip())
+    get_log_writer().write(level, message, timestamp)
+
+
+def flush_logs(timeout=5.0):
+    """等待已提交的日志写入磁盘"""
+    if _writer:
+        return _writer.flush(timeout)
+    return True
+
+
+def shutdown_logging():
+    """写完剩余日志并关闭写入线程"""
+    global _writer
+    with _writer_lock:
+        if _writer:
+            _writer.close()
+            _writer = None
+
+
+atexit.register(shutdown_logging)
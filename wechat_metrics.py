@@ -0,0 +1,354 @@
+"""
+发送流程指标：步骤计时、直方图、指标文件和采样分析器
+
+- span(name) / timed(name)：用单调时钟给发送流程的一个步骤计时，结果计入该步骤的直方图，
+  同时按返回值统计成功/失败/异常次数
+- 直方图使用固定的桶边界，每次记录只做一次二分查找和几次加法，开销可以忽略
+- MetricsExporter：后台线程每隔一段时间把指标原子写入文件，扩展名为 .json 时写JSON，
+  否则写Prometheus文本格式（可以直接交给node_exporter的textfile收集器）
+- SamplingProfiler：可选的采样分析器，定时采样发送线程的调用栈，输出折叠栈格式（可生成火焰图），
+  长时间运行时不需要挂调试器也能看到时间花在哪里
+
+    from wechat_metrics import configure_metrics
+    configure_metrics('wechat_metrics.json', interval=30, profile=True)
+"""
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# 指标文件，None表示不写文件
+METRICS_FILE = 'wechat_metrics.prom'
+# 指标文件刷新间隔（秒）
+METRICS_INTERVAL = 15.0
+# 采样分析器输出文件和采样间隔（秒）
+PROFILE_FILE = 'wechat_profile.txt'
+PROFILE_INTERVAL = 0.01
+# 采样的最大栈深度
+PROFILE_MAX_DEPTH = 40
+
+# 直方图桶上界（秒），覆盖从剪贴板写入到大文件上传
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Histogram:
+    """固定桶边界的直方图"""
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """按桶内线性插值估计分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+                return min(lower, upper) + (upper - min(lower, upper)) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class Metrics:
+    """指标集合：步骤直方图、步骤结果计数和仪表值，线程安全"""
+
+    def __init__(self, clock=None):
+        self.clock = clock or time.perf_counter
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.steps = {}
+        self.outcomes = Counter()
+        self.gauges = {}
+
+    def observe(self, step, seconds, outcome='ok'):
+        """记录一次步骤耗时；seconds为None时只计结果次数（例如步骤被跳过）"""
+        with self._lock:
+            if seconds is not None:
+                histogram = self.steps.get(step)
+                if histogram is None:
+                    histogram = self.steps[step] = Histogram()
+                histogram.observe(seconds)
+            self.outcomes[(step, outcome)] += 1
+
+    def gauge(self, name, value):
+        """设置仪表值，例如任务进度"""
+        self.gauges[name] = value
+
+    def span(self, step):
+        """计时上下文：with metrics.span('search'): ...，抛出异常时结果记为error"""
+        return _Span(self, step)
+
+    def snapshot(self):
+        """当前指标的JSON友好副本"""
+        with self._lock:
+            steps = {}
+            for step, histogram in self.steps.items():
+                steps[step] = {
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'mean': histogram.sum / histogram.count if histogram.count else 0.0,
+                    'p50': histogram.quantile(0.5),
+                    'p90': histogram.quantile(0.9),
+                    'p99': histogram.quantile(0.99),
+                    'max': histogram.max,
+                    'outcomes': {outcome: n for (name, outcome), n in self.outcomes.items() if name == step},
+                }
+            return {
+                'updated': datetime.now().isoformat(timespec='seconds'),
+                'uptime': time.time() - self.started,
+                'steps': steps,
+                'gauges': dict(self.gauges),
+            }
+
+    def to_prometheus(self):
+        """Prometheus文本格式"""
+        lines = [
+            '# HELP wechat_step_seconds 发送流程各步骤耗时',
+            '# TYPE wechat_step_seconds histogram',
+        ]
+        with self._lock:
+            for step, histogram in sorted(self.steps.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'wechat_step_seconds_bucket{{step="{step}",le="{bound}"}} {cumulative}')
+                lines.append(f'wechat_step_seconds_sum{{step="{step}"}} {histogram.sum:.6f}')
+                lines.append(f'wechat_step_seconds_count{{step="{step}"}} {histogram.count}')
+            lines.append('# HELP wechat_step_outcomes_total 发送流程各步骤的结果次数')
+            lines.append('# TYPE wechat_step_outcomes_total counter')
+            for (step, outcome), count in sorted(self.outcomes.items()):
+                lines.append(f'wechat_step_outcomes_total{{step="{step}",outcome="{outcome}"}} {count}')
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f'# TYPE wechat_{name} gauge')
+                lines.append(f'wechat_{name} {value}')
+        lines.append('# TYPE wechat_uptime_seconds gauge')
+        lines.append(f'wechat_uptime_seconds {time.time() - self.started:.1f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """原子写入指标文件，.json 写JSON，其他扩展名写Prometheus文本"""
+        if path.endswith('.json'):
+            data = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        else:
+            data = self.to_prometheus()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class _Span:
+    __slots__ = ('metrics', 'step', 'start', 'outcome')
+
+    def __init__(self, metrics, step):
+        self.metrics = metrics
+        self.step = step
+        self.outcome = 'ok'
+
+    def __enter__(self):
+        self.start = self.metrics.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.step, self.metrics.clock() - self.start,
+                             'error' if exc_type else self.outcome)
+        return False
+
+
+def timed(step, judge=True):
+    """函数计时装饰器：抛出异常时结果记为error
+
+    judge 为 True 时按返回值判断结果：False 记为fail，None 记为skipped（不计入耗时），其他记为ok；
+    返回值不表示成败的函数（例如查询）传入 judge=False，正常返回都记为ok；
+    也可以传入函数，由返回值得到 'ok'、'fail' 或 'skipped'。
+    每次调用时才取当前的指标集合，替换指标集合（set_metrics）后立即生效。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = get_metrics()
+            start = metrics.clock()
+            seconds, outcome = None, 'error'
+            try:
+                result = func(*args, **kwargs)
+                seconds = metrics.clock() - start
+                if callable(judge):
+                    outcome = judge(result)
+                elif not judge:
+                    outcome = 'ok'
+                elif result is None:
+                    outcome = 'skipped'
+                else:
+                    outcome = 'fail' if result is False else 'ok'
+                if outcome == 'skipped':
+                    seconds = None
+                return result
+            finally:
+                if outcome == 'error':
+                    seconds = metrics.clock() - start
+                metrics.observe(step, seconds, outcome)
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """采样分析器：后台线程定时采样目标线程的调用栈，按“函数;函数;函数 次数”的折叠栈格式统计"""
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL, max_depth=PROFILE_MAX_DEPTH):
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='wechat-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, n=10):
+        """采样次数最多的叶子函数：[(函数, 占比), ...]"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = self.samples or 1
+        return [(name, count / total) for name, count in leaves.most_common(n)]
+
+    def write(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """后台线程：定期写入指标文件（开启分析器时同时写入采样结果）"""
+
+    def __init__(self, metrics, path=METRICS_FILE, interval=METRICS_INTERVAL, profiler=None,
+                 profile_path=PROFILE_FILE):
+        self.metrics = metrics
+        self.path = os.path.abspath(path)
+        self.interval = interval
+        self.profiler = profiler
+        self.profile_path = os.path.abspath(profile_path)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='wechat-metrics', daemon=True)
+
+    def start(self):
+        if self.profiler:
+            self.profiler.start()
+        self._thread.start()
+
+    def stop(self):
+        """停止刷新并写入最终结果"""
+        self._stop.set()
+        self._thread.join()
+        if self.profiler:
+            self.profiler.stop()
+        self.flush()
+
+    def flush(self):
+        try:
+            self.metrics.write(self.path)
+            if self.profiler:
+                self.profiler.write(self.profile_path)
+        except Exception as e:
+            # 指标写入失败不能影响发送流程
+            print(f"写入指标文件失败: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+_metrics = Metrics()
+_settings = {'path': METRICS_FILE, 'interval': METRICS_INTERVAL, 'profile': False,
+             'profile_path': PROFILE_FILE, 'profile_interval': PROFILE_INTERVAL}
+_exporter = None
+
+
+def get_metrics():
+    """获取共享的指标集合"""
+    return _metrics
+
+
+def set_metrics(metrics):
+    """替换指标集合，传入None恢复为新的空集合"""
+    global _metrics
+    _metrics = metrics or Metrics()
+
+
+def configure_metrics(path=METRICS_FILE, interval=METRICS_INTERVAL, profile=False,
+                      profile_path=PROFILE_FILE, profile_interval=PROFILE_INTERVAL):
+    """设置指标文件（None不写文件）、刷新间隔，以及是否开启采样分析器
+
+    在发送会话开始之前调用，下一次 start_export 时生效。
+    """
+    _settings.update(path=path, interval=interval, profile=profile,
+                     profile_path=profile_path, profile_interval=profile_interval)
+
+
+def start_export():
+    """按配置开始定期写入指标文件，已经在写入时不重复启动"""
+    global _exporter
+    if _exporter or not _settings['path']:
+        return _exporter
+    profiler = SamplingProfiler(interval=_settings['profile_interval']) if _settings['profile'] else None
+    _exporter = MetricsExporter(_metrics, _settings['path'], _settings['interval'], profiler,
+                                _settings['profile_path'])
+    _exporter.start()
+    return _exporter
+
+
+def stop_export():
+    """停止写入并输出最终结果，返回采样分析器（未开启时为None）"""
+    global _exporter
+    exporter, _exporter = _exporter, None
+    if exporter is None:
+        return None
+    exporter.stop()
+    return exporter.profiler
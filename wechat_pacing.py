@@ -0,0 +1,261 @@
+"""
+发送节奏控制：令牌桶限速 + 失败自适应退避
+
+每类操作（消息、文件、联系人）各有一个令牌桶，按 PACING_LIMITS 中的
+速率补充令牌，允许一定的突发；发送前取令牌，令牌不足时等待。
+发送校验失败时只把失败类别的补充速率按倍数降低（并清空该类别已积累的突发额度），
+连续成功后逐步恢复，使吞吐量保持在账号可以安全承受的水平。
+联系人限额（QUOTA_KINDS）是按天计算的配额，不参与退避。
+
+默认限速是账号可以长期安全承受的保守值。需要更高的限速时显式覆盖：
+在 wechat_pacing.json（PACING_FILE）中按类别设置，或在任务文件的 pacing 中、
+用 get_pacer().configure() 设置。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from wechat_logger import write_log
+from wechat_metrics import get_metrics
+
+# 默认限速：rate 次 / period 秒，burst 为允许的突发次数
+PACING_LIMITS = {
+    'message': {'rate': 20, 'period': 60, 'burst': 5},        # 每分钟消息数
+    'file': {'rate': 30, 'period': 3600, 'burst': 3},         # 每小时文件数
+    'contact': {'rate': 500, 'period': 86400, 'burst': 500},  # 每天联系人数
+}
+
+# 限速覆盖文件：{类别: {rate, period, burst}}，按类别替换默认值，某类别为null时该类别不限速
+PACING_FILE = 'wechat_pacing.json'
+
+# 配额类别：只限制总量，发送失败时不降速也不清空额度
+QUOTA_KINDS = ('contact',)
+
+# 自适应退避：失败时速率除以BACKOFF_FACTOR，成功时减速倍数乘以RECOVERY_FACTOR，最多降速MAX_SLOWDOWN倍
+BACKOFF_FACTOR = 2.0
+RECOVERY_FACTOR = 0.8
+MAX_SLOWDOWN = 16.0
+
+# 统计最近吞吐量的时间窗口（秒）
+STATS_WINDOW = 300.0
+# 每发送多少个联系人把节奏统计写入一次日志
+STATS_LOG_EVERY = 10
+
+
+class TokenBucket:
+    """令牌桶：容量burst，每秒补充rate/period个令牌"""
+
+    def __init__(self, rate, period, burst=None, clock=time.monotonic):
+        if rate <= 0 or period <= 0:
+            raise ValueError(f"限速参数必须为正数: {rate}/{period}")
+        self.rate = float(rate)
+        self.period = float(period)
+        self.capacity = float(burst if burst else rate)
+        self.tokens = self.capacity
+        self.scale = 1.0
+        self._clock = clock
+        self._updated = clock()
+
+    @property
+    def fill_rate(self):
+        """当前每秒补充的令牌数（已计入退避）"""
+        return self.rate / self.period * self.scale
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.fill_rate)
+        self._updated = now
+
+    def delay(self, n=1):
+        """取n个令牌需要等待的秒数"""
+        self._refill()
+        if self.tokens >= n:
+            return 0.0
+        return (n - self.tokens) / self.fill_rate
+
+    def take(self, n=1):
+        """取出n个令牌（允许为负，表示已预支）"""
+        self._refill()
+        self.tokens -= n
+
+    def drain(self):
+        """清空突发额度，下一次必须按当前速率等待"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class Pacer:
+    """按操作类别限速，并根据发送结果自适应调整速率
+
+    clock/sleep 可以替换为模拟时钟；limits 为空字典时不限速。
+    """
+
+    def __init__(self, limits=None, clock=None, sleep=None):
+        self._clock = clock or time.monotonic
+        self._sleep = sleep or time.sleep
+        self._lock = threading.Lock()
+        self.slowdowns = {}
+        self.buckets = {}
+        self._counters = {}
+        self._recent = {}
+        self.configure(PACING_LIMITS if limits is None else limits)
+
+    def configure(self, limits):
+        """设置限速，limits 为 {类别: {'rate', 'period', 'burst'}}，未出现的类别不限速"""
+        with self._lock:
+            self.buckets = {kind: TokenBucket(spec['rate'], spec['period'], spec.get('burst'), self._clock)
+                            for kind, spec in limits.items() if spec}
+            for kind, bucket in self.buckets.items():
+                bucket.scale = 1.0 / self.slowdowns.get(kind, 1.0)
+
+    @property
+    def slowdown(self):
+        """各类别中最大的降速倍数"""
+        return max(self.slowdowns.values(), default=1.0)
+
+    def _counter(self, kind):
+        if kind not in self._counters:
+            self._counters[kind] = {'sent': 0, 'failed': 0, 'waits': 0, 'waited': 0.0}
+            self._recent[kind] = deque()
+        return self._counters[kind]
+
+    def seed(self, kind, count):
+        """预先扣除已使用的额度（例如今天已经发送过的联系人数）"""
+        with self._lock:
+            bucket = self.buckets.get(kind)
+            if bucket and count:
+                bucket.take(count)
+
+    def wait_time(self, kind, n=1):
+        with self._lock:
+            bucket = self.buckets.get(kind)
+            return bucket.delay(n) if bucket else 0.0
+
+    def acquire(self, kind, n=1):
+        """等待到可以执行n次kind操作并取出令牌，返回等待的秒数"""
+        with self._lock:
+            bucket = self.buckets.get(kind)
+            counter = self._counter(kind)
+            if bucket is None:
+                return 0.0
+            delay = bucket.delay(n)
+            bucket.take(n)
+            if delay > 0:
+                counter['waits'] += 1
+                counter['waited'] += delay
+        if delay > 0:
+            if delay >= 1:
+                write_log(f"节奏控制：{kind} 等待{delay:.1f}秒")
+            get_metrics().observe(f'pacing_{kind}', delay)
+            self._sleep(delay)
+        return delay
+
+    def record(self, kind, success):
+        """记录一次kind操作的发送结果：失败时只降低该类别的速率，成功时逐步恢复；返回该类别的降速倍数"""
+        with self._lock:
+            counter = self._counter(kind)
+            recent = self._recent[kind]
+            now = self._clock()
+            recent.append(now)
+            while recent and recent[0] < now - STATS_WINDOW:
+                recent.popleft()
+            counter['sent' if success else 'failed'] += 1
+            current = self.slowdowns.get(kind, 1.0)
+            if kind in QUOTA_KINDS:
+                return current
+            if success:
+                slowdown = max(1.0, current * RECOVERY_FACTOR)
+            else:
+                slowdown = min(MAX_SLOWDOWN, current * BACKOFF_FACTOR)
+            self.slowdowns[kind] = slowdown
+            bucket = self.buckets.get(kind)
+            if bucket:
+                bucket.scale = 1.0 / slowdown
+                if not success:
+                    bucket.drain()
+        if slowdown != current and not success:
+            write_log(f"{kind} 发送校验失败，降低该类别的发送速率为原来的 1/{slowdown:g}", "WARNING")
+        return slowdown
+
+    def stats(self):
+        """当前节奏统计：每类的发送/失败/等待次数和时长、剩余令牌、当前速率、最近吞吐量"""
+        with self._lock:
+            now = self._clock()
+            result = {'slowdown': self.slowdown}
+            for kind in sorted(set(self.buckets) | set(self._counters)):
+                info = dict(self._counter(kind))
+                info['slowdown'] = self.slowdowns.get(kind, 1.0)
+                recent = [t for t in self._recent[kind] if t >= now - STATS_WINDOW]
+                info['recent_per_minute'] = len(recent) * 60.0 / STATS_WINDOW
+                bucket = self.buckets.get(kind)
+                if bucket:
+                    bucket._refill()
+                    info['tokens'] = round(bucket.tokens, 2)
+                    info['rate_per_period'] = round(bucket.fill_rate * bucket.period, 2)
+                    info['period'] = bucket.period
+                result[kind] = info
+            return result
+
+    def summary(self):
+        """单行统计文本，用于日志"""
+        stats = self.stats()
+        parts = [f"降速倍数 {stats['slowdown']:g}"]
+        for kind, info in stats.items():
+            if kind == 'slowdown':
+                continue
+            text = f"{kind} 成功{info['sent']}/失败{info['failed']} 等待{info['waited']:.0f}秒"
+            if 'rate_per_period' in info:
+                text += f" 当前限速{info['rate_per_period']:g}/{info['period']:g}秒"
+            parts.append(text)
+        return '，'.join(parts)
+
+
+def _valid_spec(spec):
+    if spec is None:
+        return True
+    if not isinstance(spec, dict):
+        return False
+    try:
+        return float(spec['rate']) > 0 and float(spec['period']) > 0 and float(spec.get('burst') or 1) > 0
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def load_limits(path=PACING_FILE):
+    """默认限速加上覆盖文件中显式设置的类别；文件不存在时返回默认限速，格式错误的部分忽略"""
+    limits = dict(PACING_LIMITS)
+    if not os.path.exists(path):
+        return limits
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        if not isinstance(overrides, dict):
+            raise ValueError("应为 {类别: {rate, period, burst}} 形式的对象")
+    except (OSError, ValueError) as e:
+        write_log(f"读取限速设置 {path} 失败，使用默认限速: {e}", "WARNING")
+        return limits
+    for kind, spec in overrides.items():
+        if not _valid_spec(spec):
+            write_log(f"限速设置 {path} 中 {kind} 的格式错误，使用默认值", "WARNING")
+            continue
+        limits[kind] = spec
+        write_log(f"限速设置 {path}：{kind} 为 " + (f"{spec['rate']}/{spec['period']}秒" if spec else "不限速"))
+    return limits
+
+
+_pacer = None
+
+
+def get_pacer():
+    """获取共享的节奏控制器（默认限速，存在 PACING_FILE 时按其覆盖）"""
+    global _pacer
+    if _pacer is None:
+        _pacer = Pacer(load_limits())
+    return _pacer
+
+
+def set_pacer(pacer):
+    global _pacer
+    _pacer = pacer
@@ -0,0 +1,514 @@
+"""
+发送任务时长规划
+
+从历史日志中提取每个步骤的耗时（搜索、定位、联系人确认、消息检查、发送消息、发送文件），
+拟合每个步骤的耗时分布（与文件大小有关的步骤按MB线性拟合），据此预测一个联系人列表、
+消息数和文件大小组合的总时长及置信区间，并给出在截止时间前完成需要把列表分成几个会话。
+
+步骤耗时取自 write_log 已经写入的时间戳：每个步骤从它的开始日志算起，到下一个步骤或
+下一个联系人的日志为止。文本格式日志的时间只精确到秒，单个样本误差较大，但样本足够多时
+均值仍然可信；需要更精确的数据时用 configure_logging(json_lines=True) 输出毫秒精度的日志。
+节奏控制的等待单独计算，预测时按限速取下限。
+
+用法：
+    python wechat_planner.py customers.csv --messages 2 --files 说明.pdf --deadline 18:00
+    python wechat_planner.py 5000 --file-size 2 --file-size 10 --deadline 8h --split-out parts
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from statistics import NormalDist
+
+from wechat_logger import LOG_FILE, iter_log, log_files
+from wechat_pacing import PACING_LIMITS
+
+# 步骤开始日志的前缀 -> 步骤名
+STEP_MARKERS = [
+    ('开始搜索联系人: ', 'search'),
+    ('开始定位微信界面元素', 'locate'),
+    ('确认当前聊天窗口的联系人是否是 ', 'confirm'),
+    ('检查是否已经给联系人 ', 'check'),
+    ('开始发送消息: ', 'message'),
+    ('开始发送文件: ', 'file'),
+    ('开始批量发送', 'files_bulk'),
+]
+# 结束当前步骤、但不开始新步骤的日志前缀
+END_MARKERS = ('=== ', '开始发送', '发送第', '节奏控制：', '节奏统计', '程序退出')
+RUN_START = '=== 开始执行发送任务: '
+CONTACT_START = '=== 开始向联系人 '
+CONTACT_DONE = re.compile(r'^=== 联系人 .* 发送完成 ===$')
+PACING_WAIT = re.compile(r'^节奏控制：\w+ 等待([\d.]+)秒')
+BULK_SIZE = re.compile(r'共([\d.]+)MB')
+
+# 耗时与数据量有关的步骤（按MB线性拟合）
+SIZED_STEPS = ('file', 'files_bulk')
+# 超过该时长的样本视为中断（程序退出、电脑休眠等），不计入
+MAX_STEP_SECONDS = 600
+# 没有历史数据时使用的默认耗时：(固定耗时秒数, 每MB秒数)
+DEFAULT_STEP_SECONDS = {
+    'search': (0.7, 0.0),
+    'locate': (0.1, 0.0),
+    'confirm': (0.3, 0.0),
+    'check': (0.2, 0.0),
+    'message': (0.5, 0.0),
+    'file': (2.0, 0.05),
+    'files_bulk': (1.0, 0.05),
+    'overhead': (0.1, 0.0),
+}
+STEP_NAMES = list(DEFAULT_STEP_SECONDS)
+
+DEFAULT_CONFIDENCE = 0.9
+MAX_SESSIONS = 50
+
+
+class StepSample:
+    """一个步骤耗时样本：秒数、数据量（MB，未知为None）、所属运行的序号"""
+    __slots__ = ('seconds', 'mb', 'run')
+
+    def __init__(self, seconds, mb, run):
+        self.seconds = seconds
+        self.mb = mb
+        self.run = run
+
+
+def _file_mb(path):
+    try:
+        return os.path.getsize(path) / 1024 / 1024
+    except OSError:
+        return None
+
+
+class StepTimer:
+    """按日志标记计算步骤耗时的状态机
+
+    可以分多次喂入日志（例如每次只读取日志新增的部分），未结束的步骤和联系人保存在状态中。
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.run = state.get('run', 0)
+        self.step = state.get('step')          # [步骤名, 开始时间, MB]
+        self.contact = state.get('contact')    # [开始时间, 步骤合计, 等待合计]
+
+    def state(self):
+        """可以保存为JSON的状态"""
+        return {'run': self.run, 'step': self.step, 'contact': self.contact}
+
+    def reset(self):
+        """换到另一个日志文件时不延续未结束的步骤"""
+        self.step = None
+        self.contact = None
+
+    def _close_step(self, ts, done):
+        if self.step:
+            name, start, mb = self.step
+            seconds = ts - start
+            if 0 <= seconds <= MAX_STEP_SECONDS:
+                done.append((name, seconds, mb))
+                if self.contact:
+                    self.contact[1] += seconds
+            self.step = None
+
+    def feed(self, ts, message):
+        """处理一条日志，返回这条日志结束的步骤 [(步骤名, 秒数, MB), ...]
+
+        overhead 为每个完成的联系人中，总耗时减去各步骤和节奏控制等待之后剩下的部分。
+        """
+        done = []
+        for prefix, name in STEP_MARKERS:
+            if message.startswith(prefix):
+                self._close_step(ts, done)
+                mb = None
+                if name == 'file':
+                    mb = _file_mb(message[len(prefix):])
+                elif name == 'files_bulk':
+                    match = BULK_SIZE.search(message)
+                    mb = float(match.group(1)) if match else None
+                self.step = [name, ts, mb]
+                return done
+        if not message.startswith(END_MARKERS):
+            return done
+        self._close_step(ts, done)
+        contact = self.contact
+        if message.startswith(RUN_START):
+            self.run += 1
+            self.contact = None
+        elif message.startswith(CONTACT_START):
+            self.contact = [ts, 0.0, 0.0]
+        elif CONTACT_DONE.match(message) and contact:
+            if 0 <= ts - contact[0] <= MAX_STEP_SECONDS:
+                done.append(('overhead', max(0.0, ts - contact[0] - contact[1] - contact[2]), None))
+            self.contact = None
+        elif contact:
+            match = PACING_WAIT.match(message)
+            if match:
+                contact[2] += float(match.group(1))
+        return done
+
+
+def mine_logs(paths):
+    """逐行读取日志，返回 {步骤名: [StepSample, ...]}"""
+    samples = {name: [] for name in STEP_NAMES}
+    timer = StepTimer()
+    for path in paths:
+        for ts, level, message in iter_log(path):
+            for name, seconds, mb in timer.feed(ts, message):
+                samples[name].append(StepSample(seconds, mb, timer.run))
+        timer.reset()
+    return samples
+
+
+class StepModel:
+    """一个步骤的耗时分布
+
+    mean/std/分位数来自经验分布，同时拟合对数正态参数（mu, sigma）；
+    与数据量有关的步骤按 耗时 = base + per_mb * MB 做最小二乘拟合，方差取残差方差。
+    """
+
+    def __init__(self, name, samples):
+        self.name = name
+        self.count = len(samples)
+        self.default = not samples
+        base, per_mb = DEFAULT_STEP_SECONDS[name]
+        if self.default:
+            self.base, self.per_mb = base, per_mb
+            self.mean = self.p50 = self.p90 = base
+            # 没有数据时假定变异系数为0.5
+            self.variance = (base * 0.5) ** 2
+            self.mu = self.sigma = None
+            return
+
+        values = sorted(sample.seconds for sample in samples)
+        n = len(values)
+        self.mean = sum(values) / n
+        self.p50 = values[min(n - 1, int(0.5 * n))]
+        self.p90 = values[min(n - 1, int(0.9 * n))]
+        self.variance = sum((v - self.mean) ** 2 for v in values) / n
+        logs = [math.log(v) for v in values if v > 0]
+        self.mu = sum(logs) / len(logs) if logs else None
+        self.sigma = math.sqrt(sum((x - self.mu) ** 2 for x in logs) / len(logs)) if logs else None
+
+        self.base, self.per_mb = self.mean, 0.0
+        if name in SIZED_STEPS:
+            self.per_mb = per_mb
+            sized = [(s.mb, s.seconds) for s in samples if s.mb is not None]
+            if len(sized) >= 2:
+                mean_x = sum(x for x, _ in sized) / len(sized)
+                mean_y = sum(y for _, y in sized) / len(sized)
+                sxx = sum((x - mean_x) ** 2 for x, _ in sized)
+                if sxx > 0:
+                    slope = sum((x - mean_x) * (y - mean_y) for x, y in sized) / sxx
+                    self.per_mb = max(0.0, slope)
+                self.base = max(0.0, mean_y - self.per_mb * mean_x)
+                self.variance = sum((y - self.expect(x)) ** 2 for x, y in sized) / len(sized)
+
+    def expect(self, mb=0.0):
+        """数据量为mb时的期望耗时"""
+        return self.base + self.per_mb * mb
+
+
+def _run_variation(samples):
+    """各运行之间整体快慢的相对方差（变异系数的平方）
+
+    同一次运行中的步骤受同样的网络和电脑负载影响，不是相互独立的；
+    按步骤比较各运行的平均耗时，扣除抽样误差后剩下的部分作为运行之间的差异。
+    """
+    weighted = 0.0
+    weight = 0
+    for name, items in samples.items():
+        if name in SIZED_STEPS:
+            continue
+        by_run = {}
+        for sample in items:
+            by_run.setdefault(sample.run, []).append(sample.seconds)
+        runs = [values for values in by_run.values() if len(values) >= 3]
+        if len(runs) < 2:
+            continue
+        values = [v for run in runs for v in run]
+        mean = sum(values) / len(values)
+        if mean <= 0:
+            continue
+        within = sum((v - mean) ** 2 for v in values) / len(values)
+        run_means = [sum(run) / len(run) for run in runs]
+        between = sum((m - mean) ** 2 for m in run_means) / (len(runs) - 1)
+        average_size = len(values) / len(runs)
+        excess = max(0.0, between - within / average_size)
+        weighted += excess / mean ** 2 * len(values)
+        weight += len(values)
+    return weighted / weight if weight else 0.0
+
+
+def pacing_bounds(counts, limits):
+    """按限速完成各类操作至少需要的秒数：{类别: 秒数}"""
+    bounds = {}
+    for kind, count in counts.items():
+        spec = limits.get(kind) if limits else None
+        if not spec or not count:
+            continue
+        burst = spec.get('burst') or spec['rate']
+        bounds[kind] = max(0, count - burst) * spec['period'] / spec['rate']
+    return bounds
+
+
+class Planner:
+    """根据历史步骤耗时预测发送任务时长"""
+
+    def __init__(self, samples=None):
+        samples = samples or {}
+        self.models = {name: StepModel(name, samples.get(name, [])) for name in STEP_NAMES}
+        self.run_variation = _run_variation(samples)
+
+    @classmethod
+    def from_logs(cls, paths=None):
+        return cls(mine_logs(log_files(LOG_FILE) if paths is None else paths))
+
+    def contact_cost(self, messages=1, file_sizes=(), file_mode='bulk'):
+        """一个联系人的期望耗时、方差和按步骤的明细
+
+        file_sizes 为每个文件的大小（MB）；批量模式下没有批量发送的历史数据时按逐个文件估计。
+        """
+        models = self.models
+        parts = {
+            'search': (models['search'].mean, models['search'].variance),
+            'locate': (models['locate'].mean, models['locate'].variance),
+            'confirm': (models['confirm'].mean, models['confirm'].variance),
+            'overhead': (models['overhead'].mean, models['overhead'].variance),
+        }
+        if messages:
+            parts['check'] = (models['check'].mean * messages, models['check'].variance * messages)
+            parts['message'] = (models['message'].mean * messages, models['message'].variance * messages)
+        if file_sizes:
+            bulk = models['files_bulk']
+            if file_mode == 'bulk' and (not bulk.default or models['file'].default):
+                parts['files_bulk'] = (bulk.expect(sum(file_sizes)), bulk.variance)
+            else:
+                model = models['file']
+                parts['file'] = (sum(model.expect(mb) for mb in file_sizes), model.variance * len(file_sizes))
+        mean = sum(m for m, _ in parts.values())
+        variance = sum(v for _, v in parts.values())
+        return mean, variance, {name: m for name, (m, _) in parts.items()}
+
+    def predict(self, contacts, messages=1, file_sizes=(), file_mode='bulk', limits=PACING_LIMITS,
+                confidence=DEFAULT_CONFIDENCE):
+        """预测contacts个联系人的总时长（秒）及置信区间
+
+        总时长近似正态：方差为各联系人方差之和，加上运行之间整体快慢差异；
+        限速要求的最短时长大于发送耗时时以限速为准。
+        """
+        per_contact, variance, breakdown = self.contact_cost(messages, file_sizes, file_mode)
+        mean = per_contact * contacts
+        std = math.sqrt(variance * contacts + self.run_variation * mean ** 2)
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        low, high = max(0.0, mean - z * std), mean + z * std
+
+        bounds = pacing_bounds({'contact': contacts, 'message': contacts * messages,
+                                'file': contacts * len(file_sizes)}, limits)
+        limited_by = None
+        if bounds:
+            kind, bound = max(bounds.items(), key=lambda item: item[1])
+            if bound > mean:
+                limited_by = kind
+            mean, low, high = max(mean, bound), max(low, bound), max(high, bound)
+        return {
+            'contacts': contacts,
+            'messages': messages,
+            'files': len(file_sizes),
+            'file_mb': sum(file_sizes),
+            'per_contact': per_contact,
+            'mean': mean,
+            'low': low,
+            'high': high,
+            'confidence': confidence,
+            'limited_by': limited_by,
+            'pacing_bounds': bounds,
+            'breakdown': {name: seconds * contacts for name, seconds in breakdown.items()},
+            'defaults': [name for name, model in self.models.items() if model.default and name in breakdown],
+        }
+
+    def plan_sessions(self, contacts, available, messages=1, file_sizes=(), file_mode='bulk',
+                      limits=PACING_LIMITS, confidence=DEFAULT_CONFIDENCE, max_sessions=MAX_SESSIONS):
+        """找出在available秒内（按置信区间上限）完成所需的最少会话数
+
+        每个会话是一个独立的微信账号，有自己的限速额度。返回 (会话数, 每个会话的预测)，
+        max_sessions 个会话仍然来不及时会话数为None。
+        """
+        prediction = None
+        for sessions in range(1, max(1, min(max_sessions, contacts)) + 1):
+            size = math.ceil(contacts / sessions)
+            prediction = self.predict(size, messages, file_sizes, file_mode, limits, confidence)
+            if prediction['high'] <= available:
+                return sessions, prediction
+        return None, prediction
+
+
+def part_sizes(total, sessions):
+    """把total个联系人平均分成sessions份时每份的数量（与 wechat_scheduler.split_part 一致）"""
+    size, extra = divmod(total, sessions)
+    return [size + (1 if part < extra else 0) for part in range(sessions)]
+
+
+def write_parts(source_path, total, sessions, out_dir):
+    """把联系人文件流式拆分成sessions个文件，保留原文件的列，返回文件路径列表
+
+    total 为文件中的联系人数（count_contacts），逐行读取、逐行写出，不把联系人列表读入内存。
+    """
+    from wechat_contacts import iter_contacts
+    os.makedirs(out_dir, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(source_path))
+    rows = iter_contacts(source_path)
+    first = next(rows, None)
+    if first is None:
+        return []
+    ext = ext.lower() if ext.lower() in ('.csv', '.jsonl', '.ndjson') and first.fields else '.txt'
+    pending = [first]
+    paths = []
+    for index, size in enumerate(part_sizes(total, sessions), 1):
+        path = os.path.join(out_dir, f'{stem}.part{index}of{sessions}{ext}')
+        with open(path, 'w', encoding='utf-8-sig' if ext == '.csv' else 'utf-8', newline='') as f:
+            writer = None
+            if ext == '.csv':
+                writer = csv.DictWriter(f, fieldnames=list(first.fields), extrasaction='ignore')
+                writer.writeheader()
+            for _ in range(size):
+                row = pending.pop() if pending else next(rows, None)
+                if row is None:
+                    break
+                if writer:
+                    writer.writerow(row.fields)
+                elif ext == '.txt':
+                    f.write(row.name + '\n')
+                else:
+                    f.write(json.dumps(row.fields, ensure_ascii=False) + '\n')
+        paths.append(path)
+    return paths
+
+
+def format_duration(seconds):
+    hours, rest = divmod(int(round(seconds)), 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f'{hours}小时{minutes:02d}分'
+    return f'{minutes}分{secs:02d}秒'
+
+
+def parse_deadline(text, now=None):
+    """解析截止时间：HH:MM、YYYY-mm-dd HH:MM 或时长（8h、90m），返回时间戳"""
+    from wechat_scheduler import OnceTrigger, ScheduleError, parse_duration, parse_trigger
+
+    now = time.time() if now is None else now
+    try:
+        return now + parse_duration(text)
+    except ScheduleError:
+        pass
+    trigger = parse_trigger(text, now)
+    if not isinstance(trigger, OnceTrigger):
+        raise ScheduleError(f"截止时间格式错误: {text}")
+    return trigger.at
+
+
+def print_models(planner):
+    print(f"{'步骤':<12}{'样本':>8}{'mean':>9}{'p50':>9}{'p90':>9}{'每MB':>9}")
+    for name, model in planner.models.items():
+        if model.default:
+            print(f"{name:<12}{'默认值':>6}{model.mean:>9.2f}{'-':>9}{'-':>9}{model.per_mb:>9.3f}")
+        else:
+            print(f"{name:<12}{model.count:>8}{model.mean:>9.2f}{model.p50:>9.2f}{model.p90:>9.2f}{model.per_mb:>9.3f}")
+    if planner.run_variation:
+        print(f"运行之间的整体差异：变异系数 {math.sqrt(planner.run_variation):.0%}")
+    print()
+
+
+def print_prediction(prediction, start):
+    level = f"{prediction['confidence']:.0%}"
+    print(f"联系人 {prediction['contacts']}，每个联系人 {prediction['messages']} 条消息、"
+          f"{prediction['files']} 个文件（共{prediction['file_mb']:.1f}MB）")
+    print(f"每个联系人约 {prediction['per_contact']:.1f} 秒")
+    print(f"预计总时长 {format_duration(prediction['mean'])}（{level}置信区间 "
+          f"{format_duration(prediction['low'])} ~ {format_duration(prediction['high'])}）")
+    finish = datetime.fromtimestamp(start + prediction['high']).strftime('%Y-%m-%d %H:%M')
+    print(f"从 {datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M')} 开始，最晚约 {finish} 完成")
+    if prediction['limited_by']:
+        print(f"受限速限制：{prediction['limited_by']} 限额至少需要 "
+              f"{format_duration(prediction['pacing_bounds'][prediction['limited_by']])}")
+    if prediction['defaults']:
+        print(f"以下步骤没有历史数据，使用默认值：{'、'.join(prediction['defaults'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='根据历史日志预测发送任务时长并规划分会话发送')
+    parser.add_argument('contacts', help='联系人文件，或联系人数量')
+    parser.add_argument('--messages', type=int, default=1, help='每个联系人的消息数')
+    parser.add_argument('--files', nargs='*', default=[], help='要发送的文件（按实际大小估计）')
+    parser.add_argument('--file-size', type=float, action='append', default=[], metavar='MB',
+                        help='要发送的文件大小（MB），可重复')
+    parser.add_argument('--file-mode', choices=['bulk', 'dialog'], default='bulk', help='文件发送方式')
+    parser.add_argument('--log', action='append', help=f'历史日志文件，默认读取 {LOG_FILE} 及其轮转备份')
+    parser.add_argument('--deadline', help='截止时间：HH:MM、YYYY-mm-dd HH:MM 或时长（8h）')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE, help='置信水平')
+    parser.add_argument('--no-pacing', action='store_true', help='不考虑限速')
+    parser.add_argument('--split-out', metavar='DIR', help='按规划的会话数把联系人文件拆分到该目录')
+    parser.add_argument('--json', help='把预测结果写入JSON文件')
+    args = parser.parse_args(argv)
+
+    contact_file = None
+    if args.contacts.isdigit():
+        contacts = int(args.contacts)
+    else:
+        from wechat_contacts import count_contacts
+        contact_file = args.contacts
+        contacts = count_contacts(contact_file)
+    file_sizes = [_file_mb(path) or 0.0 for path in args.files] + args.file_size
+    limits = {} if args.no_pacing else PACING_LIMITS
+
+    paths = args.log or log_files(LOG_FILE)
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"日志文件不存在，忽略: {path}")
+    paths = [path for path in paths if os.path.exists(path)]
+    planner = Planner.from_logs(paths)
+    print(f"历史日志: {'、'.join(paths) if paths else '无'}")
+    print_models(planner)
+
+    start = time.time()
+    prediction = planner.predict(contacts, args.messages, file_sizes, args.file_mode, limits, args.confidence)
+    print_prediction(prediction, start)
+    result = {'prediction': prediction}
+
+    if args.deadline:
+        deadline = parse_deadline(args.deadline, start)
+        available = deadline - start
+        print(f"\n截止时间 {datetime.fromtimestamp(deadline).strftime('%Y-%m-%d %H:%M')}，可用 {format_duration(available)}")
+        sessions, session_prediction = planner.plan_sessions(contacts, available, args.messages, file_sizes,
+                                                             args.file_mode, limits, args.confidence)
+        result['sessions'] = sessions
+        result['session_prediction'] = session_prediction
+        if sessions is None:
+            print(f"{MAX_SESSIONS}个会话也无法在截止时间前完成，请推迟截止时间或减少联系人")
+            if session_prediction['limited_by']:
+                print(f"瓶颈是 {session_prediction['limited_by']} 限速，可以在任务文件的 pacing 中调整")
+        elif sessions == 1:
+            print("单个会话可以在截止时间前完成")
+        else:
+            print(f"建议分成 {sessions} 个会话（不同的微信账号）同时发送，每个约 {session_prediction['contacts']} 个联系人，"
+                  f"预计 {format_duration(session_prediction['mean'])}（最长 {format_duration(session_prediction['high'])}）")
+            if args.split_out:
+                if contact_file is None:
+                    print("拆分联系人需要传入联系人文件")
+                else:
+                    for path in write_parts(contact_file, contacts, sessions, args.split_out):
+                        print(f"  {path}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+联系人预处理流水线：在后台线程中提前准备下一个联系人
+
+发送循环在界面操作之间要为每个联系人渲染个性化消息、计算内容哈希、查询发送记录库、
+检查待发送的文件。这些工作都不需要操作界面，放到后台线程中提前完成：
+第N个联系人在界面上发送时，第N+1个联系人已经准备好放在有界队列中，
+发送线程取出后只执行界面操作。
+
+    with ContactPrefetcher(chat_list, messages, files, campaign, contact_fields, records) as plans:
+        for plan in plans:
+            ...
+
+队列长度有上限（PREFETCH_DEPTH），准备工作不会远远跑在发送前面，
+发送记录库的查询结果也不会过期太久。后台线程中的异常在发送线程取到该联系人时重新抛出。
+"""
+import queue
+import threading
+from collections import namedtuple
+
+from wechat_preflight import get_file_cache
+from wechat_records import payload_hash
+from wechat_template import RenderError, has_templates, render_messages
+
+# 提前准备的联系人数
+PREFETCH_DEPTH = 2
+# 后台线程放入队列时检查是否已停止的间隔（秒）
+PUT_TIMEOUT = 0.2
+
+# 一个准备好的联系人：序号（从1开始）、名称、渲染后的消息、内容哈希、
+# 是否已发送过、渲染错误（RenderError，没有时为None）、各文件的检查结果（wechat_preflight.FileInfo）
+ContactPlan = namedtuple('ContactPlan', ['index', 'name', 'messages', 'payload', 'sent', 'error', 'files'])
+
+_DONE = object()
+
+
+def prepare_contact(index, name, message_info, files_info, campaign, contact_fields, records, file_cache,
+                    payload=None):
+    """准备一个联系人；payload 为非个性化消息预先算好的内容哈希
+
+    文件在这里检查（stat），发送期间文件被删除或改动时按最新状态处理，不占用发送线程。
+    """
+    messages = message_info
+    if payload is None:
+        try:
+            messages = render_messages(message_info, name, contact_fields.get(name))
+        except RenderError as e:
+            return ContactPlan(index, name, message_info, None, False, e, [])
+        payload = payload_hash(messages, files_info)
+    sent = bool(records and records.is_sent(campaign, name, payload))
+    files = [] if sent else [file_cache.inspect(path) for path in files_info]
+    return ContactPlan(index, name, messages, payload, sent, None, files)
+
+
+class ContactPrefetcher:
+    """后台线程按顺序准备联系人，放入有界队列；迭代时按顺序取出 ContactPlan"""
+
+    def __init__(self, chat_list, message_info, files_info, campaign, contact_fields=None, records=None,
+                 file_cache=None, depth=PREFETCH_DEPTH):
+        self.chat_list = chat_list
+        self.message_info = message_info
+        self.files_info = files_info
+        self.campaign = campaign
+        self.contact_fields = contact_fields or {}
+        self.records = records
+        self.file_cache = file_cache or get_file_cache()
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='wechat-prefetch', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        # 非个性化消息的内容哈希对所有联系人相同，只算一次
+        payload = None if has_templates(self.message_info) else payload_hash(self.message_info, self.files_info)
+        try:
+            for index, name in enumerate(self.chat_list, 1):
+                plan = prepare_contact(index, name, self.message_info, self.files_info, self.campaign,
+                                       self.contact_fields, self.records, self.file_cache, payload)
+                if not self._put(plan):
+                    return
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(_DONE)
+
+    def close(self):
+        """停止后台线程（发送循环提前结束时，不再准备剩下的联系人）"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
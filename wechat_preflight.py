@@ -0,0 +1,137 @@
+"""
+文件预检：发送前检查附件，按文件大小和实测上传速度计算等待时长
+
+- FileCache.inspect：只读取文件的元数据（一次stat），不读取文件内容
+- check_files：一次性检查全部附件，不存在、不是文件、空文件或超过微信上限的文件
+  在启动微信之前就报告出来（main 和批量任务的校验在打开会话之前调用），而不是发送时才失败
+- 上传速度：记录之前发送的文件从按下Enter到出现在聊天记录所用的时间，估计每MB耗时
+  （包含界面响应时间，估计偏保守），上传等待的超时按文件大小和该速度计算；
+  没有实测数据时使用等待步骤的默认值
+"""
+import json
+import os
+import threading
+from collections import namedtuple
+
+# 实测上传速度的缓存
+FILE_CACHE_FILE = 'wechat_file_cache.json'
+
+# 微信电脑版单个文件的大小上限
+MAX_FILE_SIZE = 1024 * 1024 * 1024
+
+# 小于这个大小的文件上传时间主要是界面响应时间，不用于估计上传速度
+MIN_SAMPLE_BYTES = 1024 * 1024
+# 上传速度的指数滑动平均系数（越大越偏向最近的发送）
+THROUGHPUT_ALPHA = 0.3
+# 上传等待按估计耗时的倍数留出余量
+UPLOAD_SAFETY = 2.0
+# 每MB上传耗时估计值的范围（秒），排除异常的测量
+MIN_SECONDS_PER_MB = 0.01
+MAX_SECONDS_PER_MB = 30.0
+
+# 一个附件的检查结果：路径、字节数、修改时间（纳秒）、问题（没有问题时为None）
+FileInfo = namedtuple('FileInfo', ['path', 'size', 'mtime', 'problem'])
+
+
+def file_problem(size):
+    """按文件大小判断微信能否发送，可以发送时返回None"""
+    if size == 0:
+        return '是空文件，微信不能发送'
+    if size > MAX_FILE_SIZE:
+        return f'大小{size / 1024 / 1024:.1f}MB，超过微信单个文件上限{MAX_FILE_SIZE // 1024 // 1024}MB'
+    return None
+
+
+class FileCache:
+    """附件检查和上传速度估计（保存在磁盘上），线程安全"""
+
+    def __init__(self, path=FILE_CACHE_FILE):
+        self.path = path
+        self.seconds_per_mb = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.seconds_per_mb = data.get('seconds_per_mb')
+        except (OSError, ValueError, AttributeError):
+            # 缓存损坏时重新测量，不影响发送
+            self.seconds_per_mb = None
+
+    def save(self):
+        """有变化时原子写回磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'seconds_per_mb': self.seconds_per_mb}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def inspect(self, path):
+        """检查一个附件，返回FileInfo"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return FileInfo(path, None, None, '不存在')
+        if not os.path.isfile(path):
+            return FileInfo(path, None, None, '不是文件')
+        return FileInfo(path, st.st_size, st.st_mtime_ns, file_problem(st.st_size))
+
+    def observe_upload(self, size, seconds, confirmed=True):
+        """记录一次上传（从按下Enter到文件出现在聊天记录）的耗时，更新每MB耗时的估计
+
+        confirmed 为False表示等待超时，耗时只是实际上传时间的下限：估计值至少提高到这个下限，
+        网络比默认估计慢时，后面的文件等待时间随之变长，而不是一直超时。
+        """
+        if size < MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        sample = min(max(seconds / (size / 1024 / 1024), MIN_SECONDS_PER_MB), MAX_SECONDS_PER_MB)
+        with self._lock:
+            if not confirmed:
+                self.seconds_per_mb = max(self.seconds_per_mb or 0.0, sample)
+            elif self.seconds_per_mb is None:
+                self.seconds_per_mb = sample
+            else:
+                self.seconds_per_mb += THROUGHPUT_ALPHA * (sample - self.seconds_per_mb)
+            self._dirty = True
+
+    def upload_per_mb(self):
+        """上传等待每MB增加的时长（含余量），没有实测数据时返回None（使用等待步骤的默认值）"""
+        if self.seconds_per_mb is None:
+            return None
+        return self.seconds_per_mb * UPLOAD_SAFETY
+
+
+def check_files(paths, cache=None):
+    """检查全部附件，返回 (全部检查结果, 有问题的结果)"""
+    cache = cache or get_file_cache()
+    infos = [cache.inspect(path) for path in paths]
+    return infos, [info for info in infos if info.problem]
+
+
+_file_cache = None
+_file_cache_lock = threading.Lock()
+
+
+def get_file_cache():
+    """获取共享的附件检查和上传速度缓存"""
+    global _file_cache
+    if _file_cache is None:
+        with _file_cache_lock:
+            if _file_cache is None:
+                _file_cache = FileCache()
+    return _file_cache
+
+
+def set_file_cache(cache):
+    """替换附件检查和上传速度缓存，传入None时下次使用重新加载"""
+    global _file_cache
+    _file_cache = cache
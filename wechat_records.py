@@ -0,0 +1,156 @@
+"""
+发送记录库：按 (任务, 联系人, 内容哈希) 记录已发送的联系人
+
+默认使用SQLite WAL模式存储，主键即索引，打开时不需要读入全部记录，
+百万级历史也能立即打开；写入按批提交。只有同一任务、同一内容才会跳过，
+换任务名或换消息内容后，之前发送过的联系人可以再次收到。
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# 发送记录库路径
+RECORDS_DB = 'wechat_sent_records.db'
+# 旧版发送记录文件（每行一个联系人名称）
+LEGACY_RECORDS_FILE = 'wechat_sent_records.txt'
+
+# 默认任务名
+DEFAULT_CAMPAIGN = 'default'
+# 旧版记录没有内容哈希，导入时先记为ANY_PAYLOAD，第一次被查询时绑定到查询的内容
+ANY_PAYLOAD = '*'
+
+# 默认每累计多少条记录提交一次
+DEFAULT_COMMIT_EVERY = 16
+
+# SQLite日志模式：WAL只能在同一台机器上多进程共享，
+# 记录库放在网络共享目录上供多台机器使用时改为 'DELETE'（回滚日志，依赖文件锁）
+JOURNAL_MODE = 'WAL'
+
+
+def payload_hash(messages, files=()):
+    """计算发送内容的哈希：消息文本和文件路径"""
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(b'M')
+        digest.update(message.encode('utf-8'))
+        digest.update(b'\0')
+    for file_path in files:
+        digest.update(b'F')
+        digest.update(os.path.normpath(file_path).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class RecordStoreError(Exception):
+    """发送记录库无法使用（没有记录库时无法去重，不能继续发送）"""
+
+
+class SentRecordStore:
+    """已发送记录库"""
+
+    def __init__(self, path=RECORDS_DB, commit_every=DEFAULT_COMMIT_EVERY, journal_mode=None):
+        self.path = path
+        self.commit_every = commit_every
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(f'PRAGMA journal_mode={journal_mode or JOURNAL_MODE}')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS sent_records (
+                campaign TEXT NOT NULL,
+                contact TEXT NOT NULL,
+                payload_hash TEXT NOT NULL,
+                sent_at REAL NOT NULL,
+                PRIMARY KEY (campaign, contact, payload_hash)
+            ) WITHOUT ROWID
+        ''')
+        self._conn.commit()
+
+    def is_sent(self, campaign, contact, payload):
+        """该任务是否已给联系人发送过相同内容
+
+        旧版导入的记录不知道当时发送的内容：第一次被查询时绑定到本次查询的内容
+        （升级后第一次运行的通常就是旧版没有发完的那次发送），之后换了内容的发送不再跳过该联系人。
+        """
+        with self._lock:
+            found = {row[0] for row in self._conn.execute(
+                'SELECT payload_hash FROM sent_records WHERE campaign = ? AND contact = ? AND payload_hash IN (?, ?)',
+                (campaign, contact, payload, ANY_PAYLOAD))}
+            if payload in found:
+                return True
+            if ANY_PAYLOAD not in found:
+                return False
+            self._conn.execute(
+                'UPDATE sent_records SET payload_hash = ? WHERE campaign = ? AND contact = ? AND payload_hash = ?',
+                (payload, campaign, contact, ANY_PAYLOAD))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit_locked()
+            return True
+
+    def mark_sent(self, campaign, contact, payload, sent_at=None):
+        """记录一次发送，累计到commit_every条时提交"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sent_records (campaign, contact, payload_hash, sent_at) VALUES (?, ?, ?, ?)',
+                (campaign, contact, payload, time.time() if sent_at is None else sent_at))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit_locked()
+
+    def mark_many(self, records, sent_at=None):
+        """批量记录 (campaign, contact, payload) 并立即提交"""
+        now = time.time() if sent_at is None else sent_at
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO sent_records (campaign, contact, payload_hash, sent_at) VALUES (?, ?, ?, ?)',
+                ((campaign, contact, payload, now) for campaign, contact, payload in records))
+            self._commit_locked()
+
+    def count(self, campaign, payload=None):
+        """任务内已发送的联系人数"""
+        with self._lock:
+            if payload is None:
+                sql, args = 'SELECT COUNT(DISTINCT contact) FROM sent_records WHERE campaign = ?', (campaign,)
+            else:
+                sql = 'SELECT COUNT(*) FROM sent_records WHERE campaign = ? AND payload_hash IN (?, ?)'
+                args = (campaign, payload, ANY_PAYLOAD)
+            return self._conn.execute(sql, args).fetchone()[0]
+
+    def count_since(self, since):
+        """since时间戳之后实际发送的记录数（导入的旧版记录发送时间记为0，不计入）"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM sent_records WHERE sent_at >= ? AND payload_hash != ?',
+                (since, ANY_PAYLOAD)).fetchone()[0]
+
+    def import_legacy(self, path=LEGACY_RECORDS_FILE, campaign=DEFAULT_CAMPAIGN):
+        """导入旧版记录文件，导入后改名为 .imported 避免重复导入，返回导入条数
+
+        旧版记录没有内容和发送时间，记为ANY_PAYLOAD（见 is_sent）、发送时间记为0。
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            contacts = {line.strip() for line in f if line.strip()}
+        self.mark_many(((campaign, contact, ANY_PAYLOAD) for contact in contacts), sent_at=0)
+        os.replace(path, path + '.imported')
+        return len(contacts)
+
+    def commit(self):
+        """提交未提交的记录"""
+        with self._lock:
+            self._commit_locked()
+
+    def _commit_locked(self):
+        if self._pending or self._conn.in_transaction:
+            self._conn.commit()
+        self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._commit_locked()
+            self._conn.close()
@@ -0,0 +1,401 @@
+"""
+发送日志分析与投递报告
+
+流式读取 wechat_auto_send.log（二进制逐行读取，不把整个日志读入内存），按任务运行和联系人建立索引，
+输出每个联系人的投递结果、失败原因分类、等待超时统计和各步骤耗时汇总（CSV或JSON）。
+
+索引和每个日志文件已处理到的字节偏移量保存在 wechat_report_state.json 中，
+日志继续增长后再次运行只处理新增的字节；日志轮转后从压缩备份中读完上次剩下的部分。
+
+用法：
+    python wechat_report.py                         # 更新索引并输出报告到 wechat_report/
+    python wechat_report.py --format json --latest  # 每个联系人只保留最后一次尝试
+    python wechat_report.py --rebuild               # 丢弃索引，重新读取全部日志
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import Counter
+from datetime import datetime
+
+from wechat_logger import LOG_FILE, parse_line
+from wechat_metrics import BUCKETS, Histogram
+from wechat_planner import StepTimer
+
+# 索引状态文件和默认输出目录
+REPORT_STATE_FILE = 'wechat_report_state.json'
+REPORT_DIR = 'wechat_report'
+STATE_VERSION = 1
+# 识别日志文件用的开头字节数（日志轮转后开头内容会变化）
+SIGNATURE_BYTES = 4096
+# 失败明细中保留的不同错误信息条数
+TOP_ERRORS = 20
+
+# 失败和跳过的原因
+REASONS = {
+    'recorded': '发送记录中已发送',
+    'on_screen': '聊天记录中已有相同消息',
+    'render': '个性化消息缺少字段',
+    'search': '搜索联系人失败',
+    'not_target': '当前联系人不是目标联系人',
+    'send': '消息或文件发送失败',
+    'error': '发送异常',
+    'incomplete': '发送中断，未完成',
+}
+
+RUN_START = re.compile(r'^=== 开始执行发送任务: (.*) ===$')
+CONTACT_START = re.compile(r'^=== 开始向联系人 (\d+)/(\d+): (.*) 发送 ===$')
+CONTACT_DONE = re.compile(r'^=== 联系人 (.*) 发送完成 ===$')
+OUTCOMES = [
+    (re.compile(r'^联系人 .* 已发送过消息，跳过$'), 'skipped', 'recorded'),
+    (re.compile(r'^屏幕视觉识别：已给联系人 .* 发送过相同消息，跳过$'), 'skipped', 'on_screen'),
+    (re.compile(r'^联系人 .* 缺少字段 .*，跳过$'), 'failed', 'render'),
+    (re.compile(r'^搜索联系人 .* 失败，跳过$'), 'failed', 'search'),
+    (re.compile(r'^屏幕视觉识别：当前联系人不是 .*，跳过$'), 'failed', 'not_target'),
+]
+SEND_ERROR = re.compile(r'^向联系人 .* 发送失败: (.*)$')
+BULK_RESULT = re.compile(r'^批量发送文件(成功|失败): (\d+)个$')
+RESUMED = re.compile(r'^第\d+(条消息|个文件)在上次运行中已发送，跳过$')
+WAIT_TIMEOUT = re.compile(r'^等待步骤 (\S+) 超时')
+
+CONTACT_COLUMNS = ['run', 'campaign', 'index', 'contact', 'status', 'reason', 'messages_ok', 'messages_failed',
+                   'files_ok', 'files_failed', 'timeouts', 'started', 'finished', 'seconds', 'detail']
+
+
+def _format_ts(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts is not None else ''
+
+
+class DeliveryIndex:
+    """按任务运行和联系人建立的索引，可以分多次喂入日志，状态保存为JSON"""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.runs = state.get('runs', [])
+        self.contacts = state.get('contacts', [])
+        self.current = state.get('current')
+        self.timeouts = Counter(state.get('timeouts', {}))
+        self.errors = Counter(state.get('errors', {}))
+        self.steps = {}
+        for name, data in state.get('steps', {}).items():
+            histogram = Histogram()
+            histogram.counts, histogram.count, histogram.sum, histogram.max = (
+                data['counts'], data['count'], data['sum'], data['max'])
+            self.steps[name] = histogram
+        self.timer = StepTimer(state.get('timer'))
+
+    def state(self):
+        return {
+            'runs': self.runs,
+            'contacts': self.contacts,
+            'current': self.current,
+            'timeouts': dict(self.timeouts),
+            'errors': dict(self.errors),
+            'steps': {name: {'counts': h.counts, 'count': h.count, 'sum': h.sum, 'max': h.max}
+                      for name, h in self.steps.items()},
+            'timer': self.timer.state(),
+        }
+
+    # ---------- 联系人 ----------
+
+    def _finish(self, ts, status, reason=None, detail=''):
+        row = self.current
+        if row is None:
+            return
+        row['status'] = status
+        row['reason'] = reason or ''
+        row['finished'] = ts
+        row['seconds'] = round(ts - row['started'], 3)
+        if detail:
+            row['detail'] = detail
+        self.contacts.append(row)
+        run = self.runs[-1] if self.runs else None
+        if run is not None:
+            run[status] = run.get(status, 0) + 1
+        self.current = None
+
+    def feed(self, ts, level, message):
+        for name, seconds, mb in self.timer.feed(ts, message):
+            histogram = self.steps.get(name)
+            if histogram is None:
+                histogram = self.steps[name] = Histogram()
+            histogram.observe(seconds)
+
+        if self.runs:
+            self.runs[-1]['finished'] = ts
+        if not message.startswith(('===', '联系人 ', '屏幕视觉识别', '搜索联系人 ', '向联系人 ', '消息发送',
+                                   '文件发送', '批量发送文件', '第', '等待步骤')):
+            return
+
+        match = RUN_START.match(message)
+        if match:
+            self._finish(ts, 'incomplete', 'incomplete')
+            self.runs.append({'run': len(self.runs) + 1, 'campaign': match.group(1), 'started': ts,
+                              'finished': ts, 'contacts': 0})
+            return
+        match = CONTACT_START.match(message)
+        if match:
+            self._finish(ts, 'incomplete', 'incomplete')
+            if not self.runs:
+                # 日志从任务中间开始（例如只剩下轮转后的部分）
+                self.runs.append({'run': 1, 'campaign': '', 'started': ts, 'finished': ts, 'contacts': 0})
+            run = self.runs[-1]
+            run['contacts'] = int(match.group(2))
+            self.current = {
+                'run': run['run'], 'campaign': run['campaign'], 'index': int(match.group(1)),
+                'contact': match.group(3), 'status': '', 'reason': '', 'messages_ok': 0,
+                'messages_failed': 0, 'files_ok': 0, 'files_failed': 0, 'timeouts': 0,
+                'started': ts, 'finished': None, 'seconds': None, 'detail': '',
+            }
+            return
+
+        match = WAIT_TIMEOUT.match(message)
+        if match:
+            self.timeouts[match.group(1)] += 1
+            if self.current:
+                self.current['timeouts'] += 1
+            return
+
+        row = self.current
+        if row is None:
+            return
+        if message.startswith('消息发送成功'):
+            row['messages_ok'] += 1
+        elif message.startswith('消息发送失败'):
+            row['messages_failed'] += 1
+        elif message.startswith('文件发送成功'):
+            row['files_ok'] += 1
+        elif message.startswith('文件发送失败'):
+            row['files_failed'] += 1
+        elif BULK_RESULT.match(message):
+            result, count = BULK_RESULT.match(message).groups()
+            row['files_ok' if result == '成功' else 'files_failed'] += int(count)
+        elif RESUMED.match(message):
+            row['messages_ok' if '消息' in message else 'files_ok'] += 1
+        elif CONTACT_DONE.match(message):
+            if row['messages_ok'] + row['files_ok'] > 0:
+                self._finish(ts, 'sent')
+            else:
+                self._finish(ts, 'failed', 'send')
+        elif level == 'ERROR' and SEND_ERROR.match(message):
+            error = SEND_ERROR.match(message).group(1)
+            self.errors[error] += 1
+            self._finish(ts, 'failed', 'error', error)
+        else:
+            for pattern, status, reason in OUTCOMES:
+                if pattern.match(message):
+                    self._finish(ts, status, reason, message if reason == 'render' else '')
+                    break
+
+    # ---------- 报告 ----------
+
+    def contact_rows(self, latest=False):
+        """每个联系人的投递结果，latest为True时每个（任务, 联系人）只保留最后一次尝试"""
+        rows = self.contacts + ([dict(self.current, status='in_progress')] if self.current else [])
+        if latest:
+            last = {}
+            for row in rows:
+                last[(row['campaign'], row['contact'])] = row
+            rows = list(last.values())
+        return [dict(row, started=_format_ts(row['started']), finished=_format_ts(row['finished']))
+                for row in rows]
+
+    def failure_rows(self):
+        """失败和跳过原因分类、等待超时和最常见的异常信息"""
+        reasons = Counter(row['reason'] for row in self.contacts if row['reason'])
+        rows = [{'kind': 'reason', 'name': reason, 'label': REASONS.get(reason, reason), 'count': count}
+                for reason, count in reasons.most_common()]
+        rows += [{'kind': 'timeout', 'name': step, 'label': f'等待步骤 {step} 超时', 'count': count}
+                 for step, count in self.timeouts.most_common()]
+        rows += [{'kind': 'error', 'name': '', 'label': error, 'count': count}
+                 for error, count in self.errors.most_common(TOP_ERRORS)]
+        return rows
+
+    def step_rows(self):
+        rows = []
+        for name, histogram in sorted(self.steps.items()):
+            rows.append({
+                'step': name,
+                'count': histogram.count,
+                'mean': round(histogram.sum / histogram.count, 3) if histogram.count else 0.0,
+                'p50': round(histogram.quantile(0.5), 3),
+                'p90': round(histogram.quantile(0.9), 3),
+                'p99': round(histogram.quantile(0.99), 3),
+                'max': round(histogram.max, 3),
+            })
+        return rows
+
+    def run_rows(self):
+        return [dict(run, started=_format_ts(run['started']), finished=_format_ts(run['finished']))
+                for run in self.runs]
+
+
+# ---------- 增量读取 ----------
+
+def _signature(path, length):
+    """文件开头length个字节的哈希，文件不足length字节时返回None"""
+    with _open(path) as f:
+        head = f.read(length)
+    return hashlib.sha1(head).hexdigest() if len(head) == length else None
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def _read_from(path, offset, index, complete_only=True):
+    """从offset开始逐行读取，只处理完整的行，返回新的偏移量和处理的行数"""
+    lines = 0
+    with _open(path) as f:
+        f.seek(offset)
+        for raw in f:
+            if complete_only and not raw.endswith(b'\n'):
+                break
+            offset += len(raw)
+            record = parse_line(raw.decode('utf-8', errors='replace'))
+            if record:
+                index.feed(*record)
+                lines += 1
+    return offset, lines
+
+
+def update_index(index, log_state, path=LOG_FILE):
+    """把日志新增的部分加入索引，返回 (处理的行数, 提示信息列表)
+
+    log_state 为该日志的 {'offset', 'signature'}，原地更新。轮转备份和当前日志是连续的，
+    跨文件未结束的步骤照常计时。
+    """
+    notes = []
+    lines = 0
+    offset = log_state.get('offset', 0)
+    saved = log_state.get('signature')
+    length = log_state.get('signature_size', 0)
+    exists = os.path.exists(path)
+
+    backups = []
+    i = 1
+    while os.path.exists(f"{path}.{i}.gz"):
+        backups.append(f"{path}.{i}.gz")
+        i += 1
+
+    if 'offset' not in log_state:
+        # 第一次运行：先按时间顺序读完所有轮转备份
+        for backup in reversed(backups):
+            lines += _read_from(backup, 0, index, complete_only=False)[1]
+        offset = 0
+    elif saved and (not exists or os.path.getsize(path) < offset or _signature(path, length) != saved):
+        # 日志已轮转：找到上次读取的文件，读完剩下的部分和之后的备份
+        newer = None
+        for position, backup in enumerate(backups):
+            if _signature(backup, length) == saved:
+                newer = backups[:position + 1]
+                break
+        if newer is None:
+            notes.append("日志已轮转，找不到上次读取的文件，部分内容未能读取")
+        else:
+            lines += _read_from(newer[-1], offset, index, complete_only=False)[1]
+            for backup in reversed(newer[:-1]):
+                lines += _read_from(backup, 0, index, complete_only=False)[1]
+        offset = 0
+
+    if exists:
+        offset, count = _read_from(path, offset, index)
+        lines += count
+    # 只用已经读过的字节做签名，日志继续增长时签名不变
+    length = min(SIGNATURE_BYTES, offset)
+    log_state['offset'] = offset
+    log_state['signature'] = _signature(path, length) if exists and length else None
+    log_state['signature_size'] = length
+    return lines, notes
+
+
+def new_state():
+    return {'version': STATE_VERSION, 'buckets': list(BUCKETS), 'logs': {}, 'index': {}}
+
+
+def load_state(path=REPORT_STATE_FILE):
+    """读取索引状态，不存在或版本不符时返回空状态（重新读取全部日志）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') == STATE_VERSION and state.get('buckets') == list(BUCKETS):
+            return state
+    except (OSError, ValueError):
+        pass
+    return new_state()
+
+
+def save_state(state, path=REPORT_STATE_FILE):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def write_table(rows, path, columns=None):
+    """按扩展名写CSV或JSON"""
+    if path.endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        return
+    columns = columns or (list(rows[0]) if rows else [])
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_report(index, out_dir=REPORT_DIR, fmt='csv', latest=False):
+    """输出 contacts / failures / steps / runs 四张表，返回文件路径列表"""
+    os.makedirs(out_dir, exist_ok=True)
+    tables = [
+        ('contacts', index.contact_rows(latest), CONTACT_COLUMNS),
+        ('failures', index.failure_rows(), ['kind', 'name', 'label', 'count']),
+        ('steps', index.step_rows(), ['step', 'count', 'mean', 'p50', 'p90', 'p99', 'max']),
+        ('runs', index.run_rows(), ['run', 'campaign', 'started', 'finished', 'contacts',
+                                    'sent', 'skipped', 'failed', 'incomplete']),
+    ]
+    paths = []
+    for name, rows, columns in tables:
+        path = os.path.join(out_dir, f'{name}.{fmt}')
+        write_table(rows, path, columns)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='增量分析发送日志，输出每个联系人的投递报告')
+    parser.add_argument('--log', default=LOG_FILE, help='日志文件')
+    parser.add_argument('--state', default=REPORT_STATE_FILE, help='索引状态文件')
+    parser.add_argument('--out', default=REPORT_DIR, help='报告输出目录')
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv', help='报告格式')
+    parser.add_argument('--latest', action='store_true', help='每个联系人只保留最后一次尝试')
+    parser.add_argument('--rebuild', action='store_true', help='丢弃已有索引，重新读取全部日志')
+    args = parser.parse_args(argv)
+
+    state = new_state() if args.rebuild else load_state(args.state)
+    log_path = os.path.abspath(args.log)
+    log_state = state['logs'].setdefault(log_path, {})
+    index = DeliveryIndex(state['index'])
+    lines, notes = update_index(index, log_state, log_path)
+    for note in notes:
+        print(note)
+    state['index'] = index.state()
+    save_state(state, args.state)
+
+    print(f"本次处理 {lines} 行日志，已读取到第 {log_state['offset']} 字节")
+    statuses = Counter(row['status'] for row in index.contacts)
+    print(f"共 {len(index.runs)} 次任务运行，{len(index.contacts)} 次联系人发送：" +
+          "，".join(f"{status} {count}" for status, count in statuses.most_common()))
+    for path in write_report(index, args.out, args.format, args.latest):
+        print(f"  {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,509 @@
+"""
+持久化定时任务调度
+
+定时任务保存在磁盘上（JSON），程序重启后继续按计划执行。触发器支持：
+- cron表达式（分 时 日 月 周，支持 * , - / 和 @daily 等别名）
+- 一次性时间（HH:MM 或 YYYY-mm-dd HH:MM）
+
+调度器用按时间排序的堆保存下一次触发，每次最多休眠 MAX_SLEEP 秒后重新读取墙上时钟，
+系统休眠、时钟调整都不会造成漂移。错过的触发按补偿策略处理：
+- skip：跳过错过的触发，等下一次
+- once：只补执行一次（默认）
+- all：每个错过的触发都补执行
+
+大批量任务可以设置 spread，把联系人平均分成若干份，在时间窗口内均匀发送。
+时钟和休眠函数可以替换，便于用模拟时钟测试。
+
+用法：
+    python wechat_scheduler.py add "0 9 * * 1-5" jobs.json --spread 2h
+    python wechat_scheduler.py add "2026-11-11 08:00" jobs.json --catch-up skip
+    python wechat_scheduler.py list
+    python wechat_scheduler.py remove <任务ID>
+    python wechat_scheduler.py run
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from wechat_logger import flush_logs, write_log
+
+# 定时任务文件
+SCHEDULE_FILE = 'wechat_schedule.json'
+
+# 单次最长休眠（秒），醒来后重新读取墙上时钟
+MAX_SLEEP = 30.0
+# 实际休眠比预期多出这么多秒时视为系统休眠/时钟跳变
+SUSPEND_TOLERANCE = 5.0
+# 超过触发时间这么多秒才算错过，按补偿策略处理
+MISFIRE_GRACE = 60.0
+# 补偿策略
+CATCH_UP_POLICIES = ('skip', 'once', 'all')
+# 设置spread但未指定份数时，每份之间的默认间隔（秒）
+SPREAD_STEP = 600.0
+# 补执行全部错过的触发时最多补几次
+MAX_CATCH_UP = 100
+
+_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+# (名称, 最小值, 最大值)
+_FIELDS = [('分', 0, 59), ('时', 0, 23), ('日', 1, 31), ('月', 1, 12), ('周', 0, 7)]
+
+
+class ScheduleError(ValueError):
+    """触发器格式错误或定时任务不存在"""
+
+
+def _parse_field(text, name, low, high):
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            if not step_text.isdigit() or int(step_text) < 1:
+                raise ScheduleError(f"{name}字段步长错误: {text}")
+            step = int(step_text)
+        try:
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(v) for v in part.split('-', 1))
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+        except ValueError:
+            raise ScheduleError(f"{name}字段格式错误: {text}")
+        if not low <= start <= end <= high:
+            raise ScheduleError(f"{name}字段超出范围 {low}-{high}: {text}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronTrigger:
+    """cron表达式触发器：分 时 日 月 周（周日为0或7）"""
+
+    def __init__(self, expression):
+        self.spec = expression.strip()
+        fields = _ALIASES.get(self.spec.lower(), self.spec).split()
+        if len(fields) != 5:
+            raise ScheduleError(f"cron表达式需要5个字段: {expression}")
+        parsed = [_parse_field(text, *field) for text, field in zip(fields, _FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {d % 7 for d in weekdays}
+        # 与标准cron一致：日和周都有限制时，满足任意一个即可
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _day_matches(self, dt):
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, ts):
+        """严格晚于时间戳ts的下一次触发时间戳"""
+        dt = datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt.year + 5
+        while dt.year <= limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        raise ScheduleError(f"cron表达式没有可触发的时间: {self.spec}")
+
+    def to_dict(self):
+        return {'cron': self.spec}
+
+
+class OnceTrigger:
+    """一次性触发器"""
+
+    def __init__(self, at):
+        self.at = float(at)
+        self.spec = datetime.fromtimestamp(self.at).strftime('%Y-%m-%d %H:%M')
+
+    def next_after(self, ts):
+        return self.at if self.at > ts else None
+
+    def to_dict(self):
+        return {'at': self.at}
+
+
+def parse_trigger(text, now=None):
+    """解析触发器：HH:MM（下一次该时刻）、YYYY-mm-dd HH:MM 或cron表达式"""
+    text = text.strip()
+    now = time.time() if now is None else now
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return OnceTrigger(datetime.strptime(text, fmt).timestamp())
+        except ValueError:
+            pass
+    try:
+        clock_time = datetime.strptime(text, '%H:%M')
+    except ValueError:
+        return CronTrigger(text)
+    current = datetime.fromtimestamp(now)
+    target = current.replace(hour=clock_time.hour, minute=clock_time.minute, second=0, microsecond=0)
+    # 如果目标时间已过，设置为明天
+    if target.timestamp() <= now:
+        target += timedelta(days=1)
+    return OnceTrigger(target.timestamp())
+
+
+def trigger_from_dict(data):
+    if 'cron' in data:
+        return CronTrigger(data['cron'])
+    return OnceTrigger(data['at'])
+
+
+def parse_duration(text):
+    """解析时长：秒数，或带 s/m/h/d 后缀"""
+    text = str(text).strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    try:
+        if text and text[-1] in units:
+            return float(text[:-1]) * units[text[-1]]
+        return float(text)
+    except ValueError:
+        raise ScheduleError(f"时长格式错误: {text}")
+
+
+def split_part(items, part, parts):
+    """把列表平均分成parts份，返回第part份"""
+    size, extra = divmod(len(items), parts)
+    start = part * size + min(part, extra)
+    return items[start:start + size + (1 if part < extra else 0)]
+
+
+def sleep_until(target, clock=None, sleep=None, max_sleep=MAX_SLEEP):
+    """休眠到墙上时钟的target时间戳，每次最多休眠max_sleep秒后重新读取时钟
+
+    单次长休眠在系统休眠后会比预期更晚醒来，分段休眠则在唤醒后立即校正。
+    """
+    clock = clock or time.time
+    sleep = sleep or time.sleep
+    while True:
+        remaining = target - clock()
+        if remaining <= 0:
+            return
+        sleep(min(remaining, max_sleep))
+
+
+class JobStore:
+    """定时任务的磁盘存储：任务ID -> 任务字典"""
+
+    def __init__(self, path=SCHEDULE_FILE):
+        self.path = path
+        self.jobs = {}
+        self._mtime = None
+        self.load()
+
+    def load(self):
+        self.jobs = {}
+        self._mtime = None
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.jobs = {job['id']: job for job in json.load(f).get('jobs', [])}
+            self._mtime = os.path.getmtime(self.path)
+        except (OSError, ValueError, KeyError) as e:
+            write_log(f"读取定时任务文件失败: {e}", "WARNING")
+
+    def changed_on_disk(self):
+        """文件是否被其他进程修改过（例如在调度运行时用命令行添加任务）"""
+        try:
+            return os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return False
+
+    def save(self):
+        """写回磁盘（先写临时文件再替换）"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'jobs': list(self.jobs.values())}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+
+def run_scheduled_job(job, part=0, parts=1):
+    """默认执行函数：按任务文件批量发送，spread时只发送每个任务的第part份联系人"""
+    from wechat_batch import load_jobs, run_batch
+
+    jobs, options = load_jobs(job['jobs_file'])
+    if parts > 1:
+        jobs = [j._replace(chat_list=split_part(j.chat_list, part, parts)) for j in jobs]
+        jobs = [j for j in jobs if j.chat_list]
+    if jobs:
+        run_batch(jobs, options['wechat_path'], options['lock'] and job.get('lock', True), options['pacing'])
+
+
+class Scheduler:
+    """定时任务调度器
+
+    runner(job, part, parts) 执行一次任务；clock 返回墙上时钟时间戳，sleep 用于休眠，
+    两者都可以替换为模拟时钟。
+    """
+
+    def __init__(self, store=None, runner=None, clock=None, sleep=None,
+                 max_sleep=MAX_SLEEP, misfire_grace=MISFIRE_GRACE):
+        self.store = store if store is not None else JobStore()
+        self.runner = runner or run_scheduled_job
+        self.clock = clock or time.time
+        self.sleep = sleep or time.sleep
+        self.max_sleep = max_sleep
+        self.misfire_grace = misfire_grace
+        self._heap = []
+        self._seq = itertools.count()
+        self._stop = threading.Event()
+        self.stats = {'runs': 0, 'failures': 0, 'missed': 0, 'suspends': 0}
+        self._rebuild()
+
+    # ---------- 任务管理 ----------
+
+    def _rebuild(self):
+        self._heap = []
+        for job in self.store.jobs.values():
+            self._push_job(job)
+
+    def _push_job(self, job):
+        if job.get('next_run') is not None:
+            heapq.heappush(self._heap, (job['next_run'], next(self._seq), job['id'], None))
+        for ts, part in job.get('pending', []):
+            heapq.heappush(self._heap, (ts, next(self._seq), job['id'], part))
+
+    def add_job(self, trigger, jobs_file, catch_up='once', spread=0, parts=None, job_id=None, lock=True):
+        """添加定时任务，返回任务字典"""
+        if isinstance(trigger, str):
+            trigger = parse_trigger(trigger, self.clock())
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ScheduleError(f"未知的补偿策略: {catch_up}")
+        spread = float(spread or 0)
+        if parts is None:
+            parts = max(1, int(spread // SPREAD_STEP)) if spread else 1
+        next_run = trigger.next_after(self.clock())
+        if next_run is None:
+            raise ScheduleError(f"触发时间已过: {trigger.spec}")
+        job_id = job_id or f"job-{int(self.clock())}-{len(self.store.jobs) + 1}"
+        if job_id in self.store.jobs:
+            raise ScheduleError(f"定时任务已存在: {job_id}")
+        job = {
+            'id': job_id,
+            'trigger': trigger.to_dict(),
+            'jobs_file': os.path.abspath(jobs_file),
+            'catch_up': catch_up,
+            'spread': spread,
+            'parts': int(parts),
+            'lock': lock,
+            'next_run': next_run,
+            'pending': [],
+            'last_run': None,
+            'runs': 0,
+        }
+        self.store.jobs[job_id] = job
+        self.store.save()
+        self._push_job(job)
+        write_log(f"添加定时任务 {job_id}: {trigger.spec}，下次执行 {_format_ts(next_run)}")
+        return job
+
+    def remove_job(self, job_id):
+        if self.store.jobs.pop(job_id, None) is None:
+            raise ScheduleError(f"定时任务不存在: {job_id}")
+        self.store.save()
+        write_log(f"删除定时任务 {job_id}")
+
+    def next_wake(self):
+        """下一次有任务到期的时间戳，没有任务时返回None"""
+        while self._heap and not self._valid(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _valid(self, entry):
+        ts, _, job_id, part = entry
+        job = self.store.jobs.get(job_id)
+        if job is None:
+            return False
+        if part is None:
+            return job.get('next_run') == ts
+        return [ts, part] in job.get('pending', [])
+
+    # ---------- 执行 ----------
+
+    def _run(self, job, part, parts):
+        label = job['id'] if parts == 1 else f"{job['id']} ({part + 1}/{parts})"
+        write_log(f"=== 执行定时任务 {label} ===")
+        try:
+            self.runner(job, part, parts)
+            self.stats['runs'] += 1
+        except Exception as e:
+            self.stats['failures'] += 1
+            write_log(f"定时任务 {label} 执行失败: {e}", "ERROR")
+
+    def _fire(self, job, slot, now):
+        """处理一次到期的触发：补偿错过的触发，安排spread分片，计算下一次触发"""
+        trigger = trigger_from_dict(job['trigger'])
+        slots = [slot]
+        if now - slot > self.misfire_grace:
+            policy = job.get('catch_up', 'once')
+            write_log(f"定时任务 {job['id']} 错过了 {_format_ts(slot)} 的触发，补偿策略: {policy}", "WARNING")
+            self.stats['missed'] += 1
+            if policy == 'skip':
+                slots = []
+            elif policy == 'all':
+                ts = trigger.next_after(slot)
+                while ts is not None and ts <= now and len(slots) < MAX_CATCH_UP:
+                    slots.append(ts)
+                    ts = trigger.next_after(ts)
+
+        # 下一次触发总是从当前墙上时钟往后计算，不会因为补偿而重复触发
+        job['next_run'] = trigger.next_after(max(slot, now))
+        parts = job.get('parts', 1)
+        for _ in slots:
+            job['last_run'] = now
+            job['runs'] = job.get('runs', 0) + 1
+            if parts > 1:
+                # 把spread窗口平均分给各份，从当前时间开始，第一份立即执行
+                start = max(slot, now)
+                step = job.get('spread', 0) / parts
+                for part in range(parts):
+                    entry = [start + part * step, part]
+                    job.setdefault('pending', []).append(entry)
+                    heapq.heappush(self._heap, (entry[0], next(self._seq), job['id'], part))
+        if job['next_run'] is not None:
+            heapq.heappush(self._heap, (job['next_run'], next(self._seq), job['id'], None))
+        self.store.save()
+
+        if parts == 1:
+            for _ in slots:
+                self._run(job, 0, 1)
+        self._finish_if_done(job)
+
+    def _finish_if_done(self, job):
+        if job.get('next_run') is None and not job.get('pending'):
+            write_log(f"定时任务 {job['id']} 已全部完成")
+            self.store.jobs.pop(job['id'], None)
+            self.store.save()
+
+    def run_pending(self):
+        """执行所有已到期的触发，返回执行的次数"""
+        if self.store.changed_on_disk():
+            self.store.load()
+            self._rebuild()
+        executed = 0
+        while True:
+            wake = self.next_wake()
+            now = self.clock()
+            if wake is None or wake > now:
+                return executed
+            ts, _, job_id, part = heapq.heappop(self._heap)
+            job = self.store.jobs[job_id]
+            if part is None:
+                runs = self.stats['runs'] + self.stats['failures']
+                self._fire(job, ts, now)
+                executed += self.stats['runs'] + self.stats['failures'] - runs
+            else:
+                job['pending'].remove([ts, part])
+                self._run(job, part, job.get('parts', 1))
+                self.store.save()
+                self._finish_if_done(job)
+                executed += 1
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self, until=None):
+        """循环执行到期任务，直到stop()、没有任务或到达until时间戳"""
+        self._stop.clear()
+        while not self._stop.is_set():
+            self.run_pending()
+            wake = self.next_wake()
+            if wake is None and not self.store.jobs:
+                write_log("没有待执行的定时任务")
+                return
+            before = self.clock()
+            if until is not None and before >= until:
+                return
+            targets = [t for t in (wake, until) if t is not None]
+            delay = min([self.max_sleep] + [t - before for t in targets])
+            delay = max(delay, 0.0)
+            self.sleep(delay)
+            after = self.clock()
+            # 实际经过的时间明显多于预期：系统休眠或时钟被调整，重新按墙上时钟检查到期任务
+            if after - before > delay + SUSPEND_TOLERANCE or after < before - SUSPEND_TOLERANCE:
+                self.stats['suspends'] += 1
+                write_log(f"检测到系统休眠或时钟跳变（预期休眠{delay:.0f}秒，实际{after - before:.0f}秒）", "WARNING")
+
+
+def _format_ts(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M') if ts is not None else '-'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='微信自动发送定时任务')
+    parser.add_argument('--file', default=SCHEDULE_FILE, help='定时任务文件')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='添加定时任务')
+    add.add_argument('trigger', help='cron表达式、HH:MM 或 YYYY-mm-dd HH:MM')
+    add.add_argument('jobs', help='批量任务文件（JSON，格式见 wechat_batch.py）')
+    add.add_argument('--id', help='任务ID')
+    add.add_argument('--catch-up', choices=CATCH_UP_POLICIES, default='once', help='错过触发时的补偿策略')
+    add.add_argument('--spread', default='0', help='在该时长内均匀发送，例如 2h、30m')
+    add.add_argument('--parts', type=int, help='spread时分成的份数')
+    add.add_argument('--no-lock', action='store_true', help='每次执行后不锁定微信')
+
+    commands.add_parser('list', help='列出定时任务')
+    remove = commands.add_parser('remove', help='删除定时任务')
+    remove.add_argument('id')
+    commands.add_parser('run', help='运行调度器')
+    args = parser.parse_args(argv)
+
+    scheduler = Scheduler(JobStore(args.file))
+    try:
+        if args.command == 'add':
+            job = scheduler.add_job(args.trigger, args.jobs, args.catch_up, parse_duration(args.spread),
+                                    args.parts, args.id, lock=not args.no_lock)
+            print(f"已添加定时任务 {job['id']}，下次执行 {_format_ts(job['next_run'])}")
+        elif args.command == 'list':
+            for job in scheduler.store.jobs.values():
+                trigger = trigger_from_dict(job['trigger'])
+                print(f"{job['id']}  {trigger.spec}  下次 {_format_ts(job['next_run'])}  "
+                      f"已执行 {job.get('runs', 0)} 次  待发送分片 {len(job.get('pending', []))}  {job['jobs_file']}")
+        elif args.command == 'remove':
+            scheduler.remove_job(args.id)
+            print(f"已删除定时任务 {args.id}")
+        else:
+            write_log("=== 定时任务调度器启动 ===")
+            scheduler.run_forever()
+    except ScheduleError as e:
+        print(e)
+        return 1
+    except KeyboardInterrupt:
+        write_log("定时任务调度器已停止")
+    finally:
+        flush_logs()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
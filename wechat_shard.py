@@ -0,0 +1,562 @@
+"""
+多会话分片发送：把联系人分给多个工作进程，每个工作进程驱动自己的微信会话
+
+一个微信窗口同一时间只能给一个联系人发送，吞吐量有上限。多个账号分别登录在不同的
+桌面会话或虚拟机上时，把任务文件中的联系人放入共享的领取队列，各工作进程按租约领取：
+
+- 领取队列（SQLite）：每个联系人一行。工作进程每次领取一小批并获得租约，心跳线程定期续约；
+  领取时在一个写事务中完成查询和更新，同一个联系人不会同时被两个工作进程领取
+- 再平衡：工作进程退出时归还未完成的联系人；进程崩溃或所在机器失联时租约过期，
+  其他工作进程重新领取。队列中还有被领取的联系人时，空闲的工作进程继续等待而不退出
+- 发送记录库共用：所有工作进程写同一个发送记录库，已发送的联系人在任何会话中都会被跳过
+- 发送失败（例如该账号搜索不到联系人）的联系人放回队列，可能由其他账号重试，
+  领取超过 MAX_ATTEMPTS 次仍未成功时标记为失败
+- 租约过期后重新领取的联系人可能已经在原工作进程中发送了一部分（发送日志各进程独立），
+  这种情况下是至少一次投递
+
+每个工作进程在自己的目录（wechat_shard/<名称>/）中运行，日志、发送日志、联系人指纹和指标文件互不干扰。
+队列和记录库默认使用WAL模式，只能被同一台机器上的进程共享（例如同一台服务器上的多个远程桌面会话）；
+放在网络共享目录上供多台虚拟机使用时，所有工作进程都要加 --network 改用回滚日志。
+租约按各机器的墙上时钟判断，跨机器运行时需要同步时钟。
+
+用法：
+    python wechat_shard.py run jobs.json --workers 4 --simulate      # 本机用模拟微信运行4个工作进程
+    python wechat_shard.py run jobs.json                              # 在本桌面会话中运行一个工作进程
+    python wechat_shard.py worker jobs.json --name B --wechat-path D:/WeChat/Weixin.exe   # 在其他会话中加入
+    python wechat_shard.py status
+"""
+import argparse
+import contextlib
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from itertools import groupby
+
+from wechat_logger import LOG_FILE, configure_logging, flush_logs, write_log
+from wechat_records import RECORDS_DB
+
+# 领取队列库
+SHARD_QUEUE_DB = 'wechat_shard_queue.db'
+# 工作进程的工作目录（每个工作进程一个子目录）
+SHARD_DIR = 'wechat_shard'
+
+# 租约时长（秒）：工作进程失联超过这么久，它领取的联系人由其他工作进程重新领取
+LEASE_SECONDS = 60.0
+# 每次领取的联系人数
+CLAIM_BATCH = 5
+# 单个联系人最多领取几次（失败重试和租约过期都计入）
+MAX_ATTEMPTS = 3
+# 队列暂时领取不到联系人（其他工作进程还持有租约）时的等待间隔（秒）
+IDLE_POLL = 2.0
+# 协调器检查工作进程的间隔和输出进度的间隔（秒）
+MONITOR_INTERVAL = 1.0
+PROGRESS_INTERVAL = 30.0
+
+# 队列中联系人的状态
+STATES = ('pending', 'leased', 'done', 'failed')
+
+
+class ShardError(RuntimeError):
+    """分片发送无法进行（例如共享的发送记录库打不开）"""
+
+
+class ShardQueue:
+    """共享的联系人领取队列，按 (任务, 联系人) 一行，线程安全，可被多个进程同时打开"""
+
+    def __init__(self, path=SHARD_QUEUE_DB, max_attempts=MAX_ATTEMPTS, journal_mode='WAL'):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # 自己管理事务：领取必须在 BEGIN IMMEDIATE 写事务中完成
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute(f'PRAGMA journal_mode={journal_mode}')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._write() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS shard_queue (
+                    campaign TEXT NOT NULL,
+                    contact TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    worker TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (campaign, contact)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS shard_queue_state ON shard_queue (state, position)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS shard_workers (
+                    name TEXT PRIMARY KEY,
+                    host TEXT,
+                    pid INTEGER,
+                    started REAL,
+                    heartbeat REAL,
+                    state TEXT
+                )
+            ''')
+
+    @contextlib.contextmanager
+    def _write(self):
+        """写事务：开始时即取得写锁，其他进程的写事务排队等待"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def enqueue(self, items):
+        """按顺序加入 (任务, 联系人)，已在队列中的联系人保持原状态，返回新加入的数量"""
+        now = time.time()
+        with self._write() as conn:
+            position = conn.execute('SELECT COALESCE(MAX(position), 0) FROM shard_queue').fetchone()[0]
+            before = conn.total_changes
+            for campaign, contact in items:
+                position += 1
+                conn.execute(
+                    "INSERT OR IGNORE INTO shard_queue (campaign, contact, position, state, updated) "
+                    "VALUES (?, ?, ?, 'pending', ?)", (campaign, contact, position, now))
+            return conn.total_changes - before
+
+    def reset(self, campaigns):
+        """清除这些任务在队列中的全部联系人（重新分发前使用）"""
+        with self._write() as conn:
+            conn.executemany('DELETE FROM shard_queue WHERE campaign = ?', ((c,) for c in campaigns))
+
+    def claim(self, worker, count=CLAIM_BATCH, lease=LEASE_SECONDS):
+        """领取最多count个联系人并获得租约，优先领取租约已过期的联系人
+
+        返回 [(任务, 联系人, 上一个持有者), ...]，上一个持有者为None表示第一次领取。
+        """
+        now = time.time()
+        with self._write() as conn:
+            # 反复在租约内失联的联系人不再分发
+            conn.execute(
+                "UPDATE shard_queue SET state = 'failed', updated = ? "
+                "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts))
+            rows = conn.execute(
+                "SELECT campaign, contact, worker FROM shard_queue "
+                "WHERE state = 'leased' AND lease_until < ? ORDER BY position LIMIT ?",
+                (now, count)).fetchall()
+            if len(rows) < count:
+                # 在本工作进程失败过的联系人优先留给其他账号，只剩这些时才自己重试
+                rows += conn.execute(
+                    "SELECT campaign, contact, NULL FROM shard_queue "
+                    "WHERE state = 'pending' AND worker IS NOT ? ORDER BY position LIMIT ?",
+                    (worker, count - len(rows))).fetchall()
+            if not rows:
+                rows = conn.execute(
+                    "SELECT campaign, contact, NULL FROM shard_queue "
+                    "WHERE state = 'pending' ORDER BY position LIMIT ?", (count,)).fetchall()
+            conn.executemany(
+                "UPDATE shard_queue SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                "updated = ? WHERE campaign = ? AND contact = ?",
+                ((worker, now + lease, now, campaign, contact) for campaign, contact, _ in rows))
+        return rows
+
+    def renew(self, worker, lease=LEASE_SECONDS):
+        """续约该工作进程持有的全部联系人并更新心跳，返回续约的联系人数"""
+        now = time.time()
+        with self._write() as conn:
+            renewed = conn.execute(
+                "UPDATE shard_queue SET lease_until = ? WHERE worker = ? AND state = 'leased'",
+                (now + lease, worker)).rowcount
+            conn.execute('UPDATE shard_workers SET heartbeat = ? WHERE name = ?', (now, worker))
+        return renewed
+
+    def complete(self, worker, campaign, contact, ok):
+        """结束一个联系人：成功标记为done，失败时放回队列（记住失败的工作进程），达到领取上限时标记为failed
+
+        租约已被其他工作进程接管时不修改，返回False。
+        """
+        now = time.time()
+        with self._write() as conn:
+            if ok:
+                cursor = conn.execute(
+                    "UPDATE shard_queue SET state = 'done', lease_until = NULL, updated = ? "
+                    "WHERE campaign = ? AND contact = ? AND worker = ? AND state = 'leased'",
+                    (now, campaign, contact, worker))
+            else:
+                cursor = conn.execute(
+                    "UPDATE shard_queue SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                    "lease_until = NULL, updated = ? "
+                    "WHERE campaign = ? AND contact = ? AND worker = ? AND state = 'leased'",
+                    (self.max_attempts, now, campaign, contact, worker))
+        return cursor.rowcount > 0
+
+    def release(self, worker):
+        """归还该工作进程持有的全部联系人（已计入的领取次数保留），返回归还数量"""
+        with self._write() as conn:
+            return conn.execute(
+                "UPDATE shard_queue SET state = 'pending', worker = NULL, lease_until = NULL, updated = ? "
+                "WHERE worker = ? AND state = 'leased'", (time.time(), worker)).rowcount
+
+    def register(self, worker):
+        """登记工作进程；同名的工作进程重新加入时先归还上一次残留的租约"""
+        now = time.time()
+        self.release(worker)
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO shard_workers (name, host, pid, started, heartbeat, state) "
+                "VALUES (?, ?, ?, ?, ?, 'running')", (worker, socket.gethostname(), os.getpid(), now, now))
+
+    def unregister(self, worker, state='exited'):
+        with self._write() as conn:
+            conn.execute('UPDATE shard_workers SET state = ?, heartbeat = ? WHERE name = ?',
+                         (state, time.time(), worker))
+
+    def remaining(self):
+        """还没有结束的联系人数（待领取和已领取）"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM shard_queue WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def stats(self):
+        """各状态的联系人数，以及 {工作进程: {状态: 数量}}（待领取的按上一次失败的工作进程计）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT worker, state, COUNT(*) FROM shard_queue GROUP BY worker, state').fetchall()
+        totals = dict.fromkeys(STATES, 0)
+        per_worker = {}
+        for worker, state, count in rows:
+            totals[state] = totals.get(state, 0) + count
+            if worker:
+                per_worker.setdefault(worker, {})[state] = count
+        return totals, per_worker
+
+    def workers(self):
+        """已登记的工作进程：[(名称, 主机, 进程号, 开始时间, 最近心跳, 状态), ...]"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT name, host, pid, started, heartbeat, state FROM shard_workers ORDER BY name').fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Heartbeat:
+    """后台线程：每隔租约的三分之一续约一次，工作进程卡死或退出后租约自然过期"""
+
+    def __init__(self, queue, worker, lease=LEASE_SECONDS):
+        self.queue = queue
+        self.worker = worker
+        self.lease = lease
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='wechat-heartbeat', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.lease / 3):
+            try:
+                self.queue.renew(self.worker, self.lease)
+            except sqlite3.Error as e:
+                write_log(f"工作进程 {self.worker} 续约失败: {e}", "WARNING")
+
+
+def run_worker(jobs, name, queue_path=SHARD_QUEUE_DB, wechat_path=None, lock=True, pacing=None,
+               lease=LEASE_SECONDS, batch=CLAIM_BATCH, journal_mode='WAL'):
+    """工作进程：在自己的微信会话中循环领取联系人并发送，队列中没有未结束的联系人时退出
+
+    发送记录库使用 wechat_auto_send.RECORDS_DB（调用方设置为共享路径）。
+    返回本工作进程的统计 {'claimed', 'done', 'retry', 'lost'}。
+    """
+    import wechat_auto_send as app
+    from wechat_pacing import get_pacer, load_limits
+
+    if pacing is not None:
+        get_pacer().configure(dict(load_limits(), **pacing))
+
+    by_campaign = {job.campaign: job for job in jobs}
+    stats = {'claimed': 0, 'done': 0, 'retry': 0, 'lost': 0}
+    queue = ShardQueue(queue_path, journal_mode=journal_mode)
+    queue.register(name)
+    heartbeat = Heartbeat(queue, name, lease)
+    heartbeat.start()
+    write_log(f"=== 工作进程 {name} 开始领取联系人，队列: {os.path.abspath(queue_path)} ===")
+    session = None
+    try:
+        session = app.open_session(wechat_path)
+        records = session.get('records')
+        if records is None:
+            raise ShardError("共享的发送记录库打不开，为避免重复发送不领取联系人")
+
+        while True:
+            claimed = queue.claim(name, batch, lease)
+            if not claimed:
+                left = queue.remaining()
+                if not left:
+                    break
+                # 其他工作进程还持有租约，等它们完成或租约过期
+                time.sleep(IDLE_POLL)
+                continue
+            stats['claimed'] += len(claimed)
+            for campaign, contact, previous in claimed:
+                if previous and previous != name:
+                    write_log(f"接管工作进程 {previous} 租约过期的联系人 {contact}", "WARNING")
+
+            for campaign, group in groupby(claimed, key=lambda row: row[0]):
+                names = [contact for _, contact, _ in group]
+                job = by_campaign.get(campaign)
+                outcomes = {}
+                if job is None:
+                    write_log(f"队列中的任务 {campaign} 不在任务文件中，归还{len(names)}个联系人", "WARNING")
+                else:
+                    try:
+                        result = app.run_campaign(session, names, job.messages, job.files,
+                                                  job.campaign, job.contact_fields)
+                        outcomes = result['outcomes']
+                    except Exception as e:
+                        write_log(f"任务 {campaign} 的一批联系人发送失败: {e}", "ERROR")
+
+                for contact in names:
+                    ok = outcomes.get(contact) in ('sent', 'skipped')
+                    if not queue.complete(name, campaign, contact, ok):
+                        write_log(f"联系人 {contact} 的租约已被其他工作进程接管", "WARNING")
+                        stats['lost'] += 1
+                    elif ok:
+                        stats['done'] += 1
+                    else:
+                        stats['retry'] += 1
+    finally:
+        heartbeat.stop()
+        # 中断时把还没发送的联系人还给其他工作进程
+        released = queue.release(name)
+        if released:
+            write_log(f"工作进程 {name} 归还{released}个未完成的联系人")
+        if session is not None:
+            app.close_session(session, lock)
+        queue.unregister(name)
+        queue.close()
+
+    write_log(f"=== 工作进程 {name} 结束：领取{stats['claimed']}个，完成{stats['done']}个，"
+              f"放回队列{stats['retry']}个，被接管{stats['lost']}个 ===")
+    return stats
+
+
+def worker_dir(name, base=SHARD_DIR):
+    return os.path.abspath(os.path.join(base, name))
+
+
+def worker_process(config):
+    """工作进程入口（可被multiprocessing以spawn方式启动）：切换到工作目录后加载任务并运行"""
+    from wechat_batch import load_jobs
+    import wechat_records
+
+    workdir = config['workdir']
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    configure_logging(os.path.abspath(LOG_FILE), console=not config['quiet'])
+    jobs, options = load_jobs(config['jobs'])
+    if config['network']:
+        wechat_records.JOURNAL_MODE = 'DELETE'
+    kwargs = {
+        'name': config['name'],
+        'queue_path': config['queue'],
+        'lock': options['lock'] and config['lock'],
+        'lease': config['lease'],
+        'batch': config['batch'],
+        'journal_mode': 'DELETE' if config['network'] else 'WAL',
+    }
+    output = open(os.devnull, 'w', encoding='utf-8') if config['quiet'] else None
+    try:
+        with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+            if config['simulate']:
+                # 模拟微信：各工作进程使用各自的模拟界面，按倍速真实等待
+                from wechat_bench import FakeWeChat, SimClock, simulated_wechat
+                clock = SimClock(config['speed'])
+                fake = FakeWeChat(clock, jitter=0.2, seed=config['seed'])
+                with simulated_wechat(fake, clock, True if options['pacing'] is None else options['pacing']) as app:
+                    app.RECORDS_DB = config['records']
+                    run_worker(jobs, **kwargs)
+            else:
+                import wechat_auto_send as app
+                app.RECORDS_DB = config['records']
+                run_worker(jobs, wechat_path=config['wechat_path'] or options['wechat_path'],
+                           pacing=options['pacing'], **kwargs)
+    finally:
+        if output:
+            output.close()
+        flush_logs()
+
+
+def print_status(queue):
+    """输出队列进度和各工作进程的状态"""
+    totals, per_worker = queue.stats()
+    total = sum(totals.values())
+    print(f"队列: 共{total}个联系人，待领取{totals['pending']}，发送中{totals['leased']}，"
+          f"完成{totals['done']}，失败{totals['failed']}")
+    now = time.time()
+    for name, host, pid, started, heartbeat, state in queue.workers():
+        counts = per_worker.get(name, {})
+        print(f"  {name:<12} {state:<8} {host}:{pid}  心跳 {now - heartbeat:.0f}秒前  "
+              f"完成{counts.get('done', 0)}，发送中{counts.get('leased', 0)}，失败{counts.get('failed', 0)}")
+    return totals
+
+
+def run_shard(jobs_path, jobs, workers, queue_path, records_path, simulate=False, speed=None,
+              lease=LEASE_SECONDS, batch=CLAIM_BATCH, lock=True, network=False, reset=False, quiet=True):
+    """协调器：把任务放入队列，启动本机工作进程并监视，工作进程退出时立即归还它的租约
+
+    返回队列最终各状态的联系人数。
+    """
+    import multiprocessing
+
+    queue = ShardQueue(queue_path, journal_mode='DELETE' if network else 'WAL')
+    if reset:
+        queue.reset(job.campaign for job in jobs)
+    added = queue.enqueue((job.campaign, contact) for job in jobs for contact in job.chat_list)
+    write_log(f"=== 分片发送：{len(jobs)}个任务，新加入队列{added}个联系人，{len(workers)}个本机工作进程 ===")
+
+    # spawn：各平台行为一致，工作进程不继承协调器的模块状态
+    context = multiprocessing.get_context('spawn')
+    processes = {}
+    for index, name in enumerate(workers):
+        config = {
+            'name': name, 'jobs': os.path.abspath(jobs_path), 'queue': os.path.abspath(queue_path),
+            'records': os.path.abspath(records_path), 'workdir': worker_dir(name), 'wechat_path': None,
+            'simulate': simulate, 'speed': speed, 'seed': index, 'lease': lease, 'batch': batch,
+            'lock': lock, 'network': network, 'quiet': quiet,
+        }
+        process = context.Process(target=worker_process, args=(config,), name=f'wechat-shard-{name}')
+        process.start()
+        processes[name] = process
+        write_log(f"启动工作进程 {name}（进程号 {process.pid}，目录 {config['workdir']}）")
+
+    running = set(processes)
+    last_progress = time.monotonic()
+    try:
+        while running:
+            time.sleep(MONITOR_INTERVAL)
+            for name in sorted(running):
+                process = processes[name]
+                if process.is_alive():
+                    continue
+                running.discard(name)
+                released = queue.release(name)
+                if process.exitcode:
+                    queue.unregister(name, 'crashed')
+                    write_log(f"工作进程 {name} 异常退出（退出码 {process.exitcode}），"
+                              f"归还{released}个联系人给其他工作进程", "WARNING")
+                else:
+                    write_log(f"工作进程 {name} 已结束")
+            if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                totals, _ = queue.stats()
+                write_log(f"分片进度：待领取{totals['pending']}，发送中{totals['leased']}，"
+                          f"完成{totals['done']}，失败{totals['failed']}")
+    except KeyboardInterrupt:
+        write_log("收到中断，停止全部工作进程", "WARNING")
+        for name in running:
+            processes[name].terminate()
+        for name in running:
+            processes[name].join()
+            queue.release(name)
+            queue.unregister(name, 'stopped')
+
+    totals, _ = queue.stats()
+    left = totals['pending'] + totals['leased']
+    write_log(f"=== 分片发送结束：完成{totals['done']}，失败{totals['failed']}，未完成{left} ===")
+    if left:
+        write_log(f"还有{left}个联系人未完成，可以重新运行或用 worker 子命令加入工作进程继续", "WARNING")
+    print_status(queue)
+    queue.close()
+    return totals
+
+
+def main(argv=None):
+    from wechat_batch import BatchError, load_jobs
+
+    parser = argparse.ArgumentParser(description='把联系人分片给多个微信会话并行发送')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(p):
+        p.add_argument('--queue', default=SHARD_QUEUE_DB, help='共享的领取队列库')
+        p.add_argument('--records', default=RECORDS_DB, help='共享的发送记录库')
+        p.add_argument('--lease', type=float, default=LEASE_SECONDS, help='租约时长（秒）')
+        p.add_argument('--batch', type=int, default=CLAIM_BATCH, help='每次领取的联系人数')
+        p.add_argument('--network', action='store_true', help='队列和记录库在网络共享目录上（改用回滚日志）')
+        p.add_argument('--no-lock', action='store_true', help='完成后不锁定微信')
+
+    p_run = sub.add_parser('run', help='加入任务并启动本机工作进程')
+    p_run.add_argument('jobs', help='任务文件（格式同 wechat_batch）')
+    p_run.add_argument('--workers', type=int, default=1, help='本机工作进程数（真实微信只能为1）')
+    p_run.add_argument('--simulate', action='store_true', help='使用模拟微信（可在Linux上测试）')
+    p_run.add_argument('--speed', type=float, help='模拟时的倍速，不设置时不真实等待')
+    p_run.add_argument('--reset', action='store_true', help='先清除这些任务在队列中的状态')
+    p_run.add_argument('--verbose', action='store_true', help='在控制台显示工作进程的输出')
+    add_common(p_run)
+
+    p_worker = sub.add_parser('worker', help='在当前桌面会话中运行一个工作进程，加入已有的队列')
+    p_worker.add_argument('jobs', help='任务文件（格式同 wechat_batch）')
+    p_worker.add_argument('--name', default=socket.gethostname(), help='工作进程名称，各会话不能重复')
+    p_worker.add_argument('--wechat-path', help='本会话的微信路径')
+    p_worker.add_argument('--workdir', help=f'工作目录，默认 {SHARD_DIR}/<名称>')
+    add_common(p_worker)
+
+    p_status = sub.add_parser('status', help='查看队列进度和工作进程')
+    p_status.add_argument('--queue', default=SHARD_QUEUE_DB, help='共享的领取队列库')
+    args = parser.parse_args(argv)
+
+    if args.command == 'status':
+        if not os.path.exists(args.queue):
+            print(f"队列不存在: {args.queue}")
+            return 1
+        queue = ShardQueue(args.queue)
+        print_status(queue)
+        queue.close()
+        return 0
+
+    try:
+        jobs, options = load_jobs(args.jobs)
+    except BatchError as e:
+        write_log(f"任务文件校验失败: {e}", "ERROR")
+        flush_logs()
+        return 1
+
+    if args.command == 'worker':
+        # 先把任务加入队列（已在队列中的联系人不变），工作进程可以先于协调器启动
+        queue = ShardQueue(args.queue, journal_mode='DELETE' if args.network else 'WAL')
+        queue.enqueue((job.campaign, contact) for job in jobs for contact in job.chat_list)
+        queue.close()
+        worker_process({
+            'name': args.name, 'jobs': os.path.abspath(args.jobs), 'queue': os.path.abspath(args.queue),
+            'records': os.path.abspath(args.records), 'workdir': os.path.abspath(args.workdir or worker_dir(args.name)),
+            'wechat_path': args.wechat_path, 'simulate': False, 'speed': None, 'seed': 0, 'lease': args.lease,
+            'batch': args.batch, 'lock': not args.no_lock, 'network': args.network, 'quiet': False,
+        })
+        return 0
+
+    if args.workers < 1:
+        parser.error('--workers 至少为1')
+    if args.workers > 1 and not args.simulate:
+        # 同一个桌面会话只有一套键盘鼠标和剪贴板，多个真实工作进程会互相干扰
+        print("真实微信在同一个桌面会话中只能运行一个工作进程，其他会话请使用 worker 子命令加入")
+        return 1
+    workers = [f'worker-{i}' for i in range(1, args.workers + 1)]
+    try:
+        totals = run_shard(args.jobs, jobs, workers, args.queue, args.records, args.simulate, args.speed,
+                           args.lease, args.batch, options['lock'] and not args.no_lock, args.network,
+                           args.reset, quiet=not args.verbose)
+    finally:
+        write_log("程序退出")
+        flush_logs()
+    return 0 if not (totals['pending'] or totals['leased'] or totals['failed']) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
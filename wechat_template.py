@@ -0,0 +1,101 @@
+"""
+个性化消息模板
+
+消息中用 {列名} 引用联系人列表（CSV/JSONL）中的列，{name} 为联系人名称，
+{{ 和 }} 表示字面的大括号。模板只解析一次，编译成字面文本和字段的序列，
+每个联系人渲染时只做拼接。运行前先用列名校验模板，缺列时不会开始发送；
+运行中某一行缺值只跳过该联系人，不会中断整个任务。
+"""
+from string import Formatter
+
+# 始终可用的字段：联系人名称
+NAME_FIELD = 'name'
+
+
+class TemplateError(ValueError):
+    """模板语法错误或引用了不存在的列"""
+
+
+class RenderError(ValueError):
+    """某个联系人缺少模板需要的值"""
+
+
+class MessageTemplate:
+    """编译后的消息模板"""
+
+    def __init__(self, source):
+        self.source = source
+        self._parts = []
+        fields = []
+        try:
+            parsed = list(Formatter().parse(source))
+        except ValueError as e:
+            raise TemplateError(f"模板格式错误: {e}")
+        for literal, field, spec, conversion in parsed:
+            if literal:
+                self._parts.append((literal, None))
+            if field is None:
+                continue
+            field = field.strip()
+            if not field:
+                raise TemplateError("模板中有空的占位符 {}，字面大括号请写成 {{ }}")
+            if spec or conversion:
+                raise TemplateError(f"占位符 {{{field}}} 不支持格式说明")
+            self._parts.append((None, field))
+            if field not in fields:
+                fields.append(field)
+        self.fields = tuple(fields)
+
+    def missing_fields(self, columns):
+        """模板引用但列中不存在的字段"""
+        available = set(columns) | {NAME_FIELD}
+        return [field for field in self.fields if field not in available]
+
+    def render(self, name, values=None):
+        """用联系人名称和该行的列渲染消息"""
+        values = values or {}
+        out = []
+        for literal, field in self._parts:
+            if field is None:
+                out.append(literal)
+                continue
+            value = name if field == NAME_FIELD else values.get(field)
+            if value is None or value == '':
+                raise RenderError(f"联系人 {name} 缺少字段 {field}")
+            out.append(value)
+        return ''.join(out)
+
+    def __str__(self):
+        return self.source
+
+    def __repr__(self):
+        return f"MessageTemplate({self.source!r})"
+
+
+def compile_message(text):
+    """编译消息：包含占位符时返回MessageTemplate，否则原样返回字符串"""
+    template = MessageTemplate(text)
+    if not template.fields:
+        # 只有 {{ }} 转义时按模板渲染，保证输出的是单个大括号
+        return template.render('') if '{{' in text or '}}' in text else text
+    return template
+
+
+def validate_messages(messages, columns):
+    """校验所有模板引用的列都存在，返回缺失的字段列表"""
+    missing = []
+    for message in messages:
+        if isinstance(message, MessageTemplate):
+            for field in message.missing_fields(columns):
+                if field not in missing:
+                    missing.append(field)
+    return missing
+
+
+def render_messages(messages, name, values=None):
+    """渲染一个联系人的全部消息，缺值时抛出RenderError"""
+    return [m.render(name, values) if isinstance(m, MessageTemplate) else m for m in messages]
+
+
+def has_templates(messages):
+    return any(isinstance(m, MessageTemplate) for m in messages)
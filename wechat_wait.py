@@ -0,0 +1,158 @@
+"""
+等待引擎：用条件轮询替代固定时长的 time.sleep
+
+每个等待点都是一个命名步骤（见 WAIT_STEPS）。条件策略下轮询就绪探针，
+条件满足立即返回，超时前按退避逐步拉长轮询间隔；固定策略下保持旧版的
+固定延时，作为探针不可靠时的兜底方案。
+"""
+import time
+
+# 等待策略：'condition' 条件轮询，'fixed' 固定延时（旧版行为）
+WAIT_POLICY = 'condition'
+
+# 轮询参数：初始间隔、退避倍数、最大间隔（秒）
+POLL_INTERVAL = 0.05
+POLL_BACKOFF = 1.5
+POLL_MAX_INTERVAL = 0.5
+
+# 命名等待步骤
+# fixed: 旧版固定延时；timeout: 条件等待超时；settle: 无探针时的最小稳定等待
+# per_mb: 与数据量相关的步骤，每MB额外增加的等待（同时加到以上三项）
+WAIT_STEPS = {
+    'wechat_startup':     {'fixed': 5.0, 'timeout': 15.0, 'settle': 1.0},
+    'search_box_open':    {'fixed': 1.0, 'timeout': 2.0, 'settle': 0.3},
+    'search_clipboard':   {'fixed': 0.5, 'timeout': 1.0, 'settle': 0.05},
+    'search_paste':       {'fixed': 1.0, 'timeout': 2.0, 'settle': 0.3},
+    'search_result':      {'fixed': 3.0, 'timeout': 5.0, 'settle': 1.0},
+    'locate_hover':       {'fixed': 1.0, 'timeout': 1.0, 'settle': 0.05},
+    'textbox_focus':      {'fixed': 1.0, 'timeout': 1.0, 'settle': 0.1},
+    'message_clipboard':  {'fixed': 0.5, 'timeout': 1.0, 'settle': 0.05},
+    'message_paste':      {'fixed': 2.0, 'timeout': 3.0, 'settle': 0.3},
+    'message_enter':      {'fixed': 2.0, 'timeout': 3.0, 'settle': 0.3},
+    'file_textbox_focus': {'fixed': 0.5, 'timeout': 1.0, 'settle': 0.1},
+    'file_dialog_open':   {'fixed': 2.0, 'timeout': 5.0, 'settle': 0.8},
+    'content_clipboard':  {'fixed': 0.5, 'timeout': 1.0, 'settle': 0.05},
+    'content_paste':      {'fixed': 1.0, 'timeout': 2.0, 'settle': 0.2},
+    'content_enter':      {'fixed': 1.0, 'timeout': 2.0, 'settle': 0.2},
+    'file_dialog_close':  {'fixed': 2.0, 'timeout': 5.0, 'settle': 0.8},
+    'send_confirm':       {'fixed': 2.0, 'timeout': 3.0, 'settle': 0.5},
+    'files_paste':        {'fixed': 2.0, 'timeout': 5.0, 'settle': 0.3, 'per_mb': 0.05},
+    # 上传步骤的 per_mb 按1MB/s保守估计，有实测上传速度后改用实测值（见 wechat_preflight）
+    'files_send':         {'fixed': 2.0, 'timeout': 5.0, 'settle': 0.5, 'per_mb': 1.0},
+    'file_upload':        {'fixed': 2.0, 'timeout': 5.0, 'settle': 0.5, 'per_mb': 1.0},
+}
+
+# 时钟与休眠函数，可替换为模拟时钟（基准测试使用）
+_clock = time.monotonic
+_sleep = time.sleep
+
+
+def set_wait_policy(policy):
+    """设置等待策略：'condition' 或 'fixed'"""
+    global WAIT_POLICY
+    if policy not in ('condition', 'fixed'):
+        raise ValueError(f"未知的等待策略: {policy}")
+    WAIT_POLICY = policy
+
+
+def set_clock(clock=None, sleep=None):
+    """替换等待引擎使用的时钟和休眠函数，传入None恢复默认"""
+    global _clock, _sleep
+    _clock = clock or time.monotonic
+    _sleep = sleep or time.sleep
+
+
+def now():
+    """等待引擎使用的当前时间（基准测试中为模拟时钟）"""
+    return _clock()
+
+
+def wait_until(probe, timeout, interval=None, backoff=None, max_interval=None):
+    """轮询探针直到返回真值或超时，返回是否满足条件"""
+    interval = POLL_INTERVAL if interval is None else interval
+    backoff = POLL_BACKOFF if backoff is None else backoff
+    max_interval = POLL_MAX_INTERVAL if max_interval is None else max_interval
+
+    deadline = _clock() + timeout
+    while True:
+        try:
+            if probe():
+                return True
+        except Exception:
+            # 探针本身出错视为条件未满足，继续轮询直到超时
+            pass
+        remaining = deadline - _clock()
+        if remaining <= 0:
+            return False
+        _sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+def wait_step(name, probe=None, size=0, per_mb=None):
+    """执行命名等待步骤，返回条件是否在超时前满足
+
+    固定策略下按旧版时长休眠；条件策略下有探针则轮询探针，
+    无探针则只等待最小稳定时间。size 为本步骤处理的字节数，
+    按每MB时长（per_mb，未提供时使用步骤的默认值）增加等待时长。
+    """
+    step = WAIT_STEPS[name]
+    if per_mb is None:
+        per_mb = step.get('per_mb', 0.0)
+    extra = per_mb * size / (1024 * 1024)
+    if WAIT_POLICY == 'fixed':
+        _sleep(step['fixed'] + extra)
+        return True
+    if probe is None:
+        _sleep(step['settle'] + extra)
+        return True
+    return wait_until(probe, step['timeout'] + extra)
+
+
+# ---------------- 就绪探针 ----------------
+
+def window_focused(title='微信'):
+    """探针：标题包含title的窗口处于前台"""
+    import win32gui
+
+    def probe():
+        hwnd = win32gui.GetForegroundWindow()
+        return title in win32gui.GetWindowText(hwnd)
+    return probe
+
+
+def foreground_changed():
+    """探针：前台窗口发生变化（例如弹出文件对话框）
+
+    创建时记录当前前台窗口，之后前台窗口不同即视为满足。
+    """
+    import win32gui
+    baseline = win32gui.GetForegroundWindow()
+
+    def probe():
+        return win32gui.GetForegroundWindow() != baseline
+    return probe
+
+
+def region_changed(region):
+    """探针：屏幕区域内容发生变化
+
+    region为(left, top, width, height)，创建时截取基准画面，
+    之后截图与基准不同即视为满足。应在触发操作之前创建。
+    """
+    from wechat_capture import get_capture_source
+    source = get_capture_source()
+    baseline = source.grab(region).tobytes()
+
+    def probe():
+        return source.grab(region).tobytes() != baseline
+    return probe
+
+
+def clipboard_holds(text):
+    """探针：剪贴板内容已经是text（剪贴板往返确认）"""
+    from wechat_clipboard import get_clipboard
+    clipboard = get_clipboard()
+
+    def probe():
+        return clipboard.paste() == text
+    return probe
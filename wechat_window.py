@@ -0,0 +1,138 @@
+"""
+微信窗口跟踪
+
+只在第一次（或窗口关闭后）枚举窗口解析微信句柄，之后通过句柄直接读取窗口区域和前台状态。
+窗口区域和由它推算出的元素坐标都被缓存，只有窗口移动、缩放或失去焦点时才失效，
+每个联系人的定位步骤不再需要枚举窗口、移动鼠标和等待。
+"""
+import threading
+
+
+class WindowTracker:
+    """微信窗口跟踪器：缓存窗口区域和元素坐标，窗口变化时失效"""
+
+    def __init__(self, title='微信'):
+        self.title = title
+        self._window = None
+        self._hwnd = None
+        self._rect = None
+        self._focused = True
+        self._elements = {}
+        self._lock = threading.Lock()
+        self.stats = {'resolves': 0, 'hits': 0, 'invalidations': 0}
+
+    # ---------- 窗口句柄 ----------
+
+    def _resolve(self):
+        """枚举窗口查找微信，只在没有有效句柄时调用"""
+        import pyautogui
+        self.stats['resolves'] += 1
+        windows = pyautogui.getWindowsWithTitle(self.title)
+        if not windows:
+            self._window = self._hwnd = None
+            return False
+        self._window = windows[0]
+        self._hwnd = getattr(self._window, '_hWnd', None)
+        return True
+
+    def _alive(self):
+        if self._window is None:
+            return False
+        if self._hwnd is None:
+            return True
+        try:
+            import win32gui
+            return bool(win32gui.IsWindow(self._hwnd))
+        except ImportError:
+            return True
+
+    def _read_rect(self):
+        if self._hwnd is not None:
+            try:
+                import win32gui
+                left, top, right, bottom = win32gui.GetWindowRect(self._hwnd)
+                return (left, top, right - left, bottom - top)
+            except ImportError:
+                pass
+        w = self._window
+        return (w.left, w.top, w.width, w.height)
+
+    def _read_focused(self):
+        if self._hwnd is not None:
+            try:
+                import win32gui
+                return win32gui.GetForegroundWindow() == self._hwnd
+            except ImportError:
+                pass
+        return bool(getattr(self._window, 'isActive', True))
+
+    # ---------- 状态 ----------
+
+    @property
+    def window(self):
+        return self._window
+
+    def rect(self):
+        """当前窗口区域 (left, top, width, height)，找不到窗口时返回None
+
+        窗口移动、缩放或失去焦点时清空缓存的元素坐标。
+        """
+        with self._lock:
+            if not self._alive() and not self._resolve():
+                self._invalidate_locked()
+                self._rect = None
+                return None
+            rect = self._read_rect()
+            focused = self._read_focused()
+            if rect != self._rect or (self._focused and not focused):
+                self._invalidate_locked()
+            self._rect = rect
+            self._focused = focused
+            return rect
+
+    def is_focused(self):
+        return self._focused
+
+    def activate(self):
+        """把微信窗口切到前台"""
+        if self._window is not None:
+            self._window.activate()
+            self._focused = True
+
+    def invalidate(self):
+        """清空缓存的元素坐标"""
+        with self._lock:
+            self._invalidate_locked()
+
+    def _invalidate_locked(self):
+        if self._elements:
+            self.stats['invalidations'] += 1
+            self._elements = {}
+
+    # ---------- 元素坐标缓存 ----------
+
+    def get_element(self, name):
+        """缓存的元素坐标，没有或已失效时返回None"""
+        position = self._elements.get(name)
+        if position is not None:
+            self.stats['hits'] += 1
+        return position
+
+    def set_element(self, name, position):
+        self._elements[name] = position
+
+
+_tracker = None
+
+
+def get_window_tracker():
+    """获取共享的微信窗口跟踪器"""
+    global _tracker
+    if _tracker is None:
+        _tracker = WindowTracker()
+    return _tracker
+
+
+def set_window_tracker(tracker):
+    global _tracker
+    _tracker = tracker